@@ -1,5 +1,7 @@
 import React from "react";
 import { useScoreStore } from "../stores/scoreStore";
+import { usePrecomputedStats } from "../hooks/usePrecomputedStats";
+import type { PrecomputedStatistics, Statistics as StatisticsData } from "../types";
 
 interface StatisticsProps {
   courseFilter?: string;
@@ -7,11 +9,23 @@ interface StatisticsProps {
 
 export const Statistics: React.FC<StatisticsProps> = ({ courseFilter }) => {
   const { getStatistics, getCourseStatistics } = useScoreStore();
+  const precomputed = usePrecomputedStats();
 
-  const stats = courseFilter
+  const computed = courseFilter
     ? getCourseStatistics()[courseFilter] || getStatistics()
     : getStatistics();
 
+  // 集計済みの統計は、読み込んだスコアと件数が一致する（集計が古くない）場合だけ使う
+  const summary = precomputed
+    ? courseFilter
+      ? precomputed.courses[courseFilter]
+      : precomputed.total
+    : undefined;
+  const stats: StatisticsData | PrecomputedStatistics =
+    summary && summary.totalGames === computed.totalGames ? summary : computed;
+  const tpsPercentiles =
+    "tpsPercentiles" in stats ? stats.tpsPercentiles : undefined;
+
   if (stats.totalGames === 0) {
     return (
       <div className="statistics-container">
@@ -72,6 +86,15 @@ export const Statistics: React.FC<StatisticsProps> = ({ courseFilter }) => {
           <div className="stat-value">{formatNumber(stats.averageTPS)}</div>
         </div>
 
+        {tpsPercentiles && (
+          <div className="stat-item">
+            <div className="stat-label">TPS（中央値 / 上位10% / 上位1%）</div>
+            <div className="stat-value">
+              {tpsPercentiles.p50} / {tpsPercentiles.p90} / {tpsPercentiles.p99}
+            </div>
+          </div>
+        )}
+
         <div className="stat-item">
           <div className="stat-label">総正打数</div>
           <div className="stat-value">{stats.totalCorrectTypes}文字</div>
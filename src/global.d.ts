@@ -1,9 +1,6 @@
 // Viteの定義拡張
 declare global {
-  const __SCORE_DATA__: Array<{ 
-    data: import('./types').CLIScoreData; 
-    filename: string; 
-  }>;
+  const __SCORE_DATA__: Array<import('./types').CLIScoreFile>;
 }
 
 export {};
@@ -0,0 +1,31 @@
+import { useEffect, useState } from 'react';
+import type { StatsExport } from '../types';
+
+/**
+ * CLIで集計済みの統計（public/stats.json）を読み込むカスタムフック
+ * ファイルがない・読み込めない場合はnull（スコアデータから計算する）
+ */
+export const usePrecomputedStats = (): StatsExport | null => {
+  const [stats, setStats] = useState<StatsExport | null>(null);
+
+  useEffect(() => {
+    let cancelled = false;
+
+    fetch(`${import.meta.env.BASE_URL}stats.json`)
+      .then((response) => (response.ok ? response.json() : null))
+      .then((data: StatsExport | null) => {
+        if (!cancelled && data && data.total) {
+          setStats(data);
+        }
+      })
+      .catch(() => {
+        console.log('集計済みの統計（stats.json）はありません');
+      });
+
+    return () => {
+      cancelled = true;
+    };
+  }, []);
+
+  return stats;
+};
@@ -1,5 +1,5 @@
 import { create } from 'zustand';
-import type { GameScore, Statistics, CourseStatistics, CLIScoreData } from '../types';
+import type { GameScore, Statistics, CourseStatistics, CLIScoreFile } from '../types';
 import { mergeScoreData } from '../utils/cliDataUtils';
 
 interface ScoreStore {
@@ -8,7 +8,7 @@ interface ScoreStore {
   addScore: (score: Omit<GameScore, 'id'>) => void;
   updateScore: (id: string, score: Partial<GameScore>) => void;
   deleteScore: (id: string) => void;
-  loadCLIData: (cliDataWithFilenames: Array<{ data: CLIScoreData; filename: string }>) => void;
+  loadCLIData: (cliDataWithFilenames: CLIScoreFile[]) => void;
   getScoresByDateRange: (startDate: string, endDate: string) => GameScore[];
   getScoresByCourse: (course: string) => GameScore[];
   getStatistics: () => Statistics;
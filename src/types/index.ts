@@ -22,12 +22,20 @@ export interface GameScore {
 
 // CLIツールで生成されるJSONデータの型定義
 export interface CLIScoreData {
+  timestamp?: string; // 撮影時刻（EXIF・ファイル名・更新日時から取得）
   course: string;
   result: number;
   detail: ScoreDetail;
   typing: TypingDetail;
 }
 
+// ビルド時に埋め込まれるスコアファイル1件分（pathはscoreディレクトリからの相対パス）
+export interface CLIScoreFile {
+  data: CLIScoreData;
+  filename: string;
+  path?: string;
+}
+
 // グラフ用のデータ型
 export interface ChartDataPoint {
   x: string;
@@ -55,3 +63,26 @@ export interface Statistics {
 export interface CourseStatistics {
   [course: string]: Statistics;
 }
+
+// `python run.py stats` で生成される集計済みの統計（public/stats.json）
+export interface PrecomputedStatistics extends Statistics {
+  totalResult: number;
+  totalPayed: number;
+  totalGain: number;
+  missRate: number;
+  tpsPercentiles: Record<string, number>;
+}
+
+// 期間ごとの集計（日次はYYYY-MM-DD、週次はYYYY-Www）
+export interface PeriodStatistics extends PrecomputedStatistics {
+  period: string;
+}
+
+export interface StatsExport {
+  version: number;
+  generatedAt: string;
+  total: PrecomputedStatistics;
+  courses: Record<string, PrecomputedStatistics>;
+  daily: PeriodStatistics[];
+  weekly: PeriodStatistics[];
+}
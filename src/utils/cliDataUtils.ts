@@ -1,4 +1,4 @@
-import type { CLIScoreData, GameScore } from '../types';
+import type { CLIScoreData, CLIScoreFile, GameScore } from '../types';
 import { extractDateFromFilename } from './dateUtils';
 
 /**
@@ -6,13 +6,16 @@ import { extractDateFromFilename } from './dateUtils';
  */
 export const convertCLIDataToGameScore = (
   cliData: CLIScoreData, 
-  filename: string
+  filename: string,
+  path: string = filename
 ): GameScore => {
-  // ファイル名を除去してIDとして使用
-  const fileBaseName = filename.replace('.json', '');
+  // scoreディレクトリからの相対パスをIDとして使用（別のパーティションにある同名のファイルを区別する）
+  const fileBaseName = path.replace('.json', '');
   
-  // ファイル名から日付を抽出
-  const date = extractDateFromFilename(filename);
+  // 撮影時刻があればその日付を、なければファイル名から日付を抽出
+  const date = cliData.timestamp
+    ? cliData.timestamp.split('T')[0]
+    : extractDateFromFilename(filename);
   
   return {
     id: `cli-${fileBaseName}`, // CLIデータを識別するためのプレフィックス
@@ -28,10 +31,10 @@ export const convertCLIDataToGameScore = (
  * 複数のCLIデータを一括変換
  */
 export const convertMultipleCLIData = (
-  cliDataWithFilenames: Array<{ data: CLIScoreData; filename: string }>
+  cliDataWithFilenames: CLIScoreFile[]
 ): GameScore[] => {
-  return cliDataWithFilenames.map(({ data, filename }) => 
-    convertCLIDataToGameScore(data, filename)
+  return cliDataWithFilenames.map(({ data, filename, path }) => 
+    convertCLIDataToGameScore(data, filename, path)
   );
 };
 
@@ -52,7 +55,7 @@ export const findDuplicateByFileName = (
  */
 export const mergeScoreData = (
   existingScores: GameScore[],
-  cliDataWithFilenames: Array<{ data: CLIScoreData; filename: string }>
+  cliDataWithFilenames: CLIScoreFile[]
 ): GameScore[] => {
   const convertedScores = convertMultipleCLIData(cliDataWithFilenames);
   const mergedScores = [...existingScores];
@@ -6,6 +6,7 @@ setup(
     description="寿司打の結果画面からスコアデータを抽出するCLIツール",
     author="mishio",
     packages=find_packages(),
+    package_data={"src": ["data/*"]},
     install_requires=[
         "opencv-python>=4.8.0",
         "pytesseract>=0.3.10",
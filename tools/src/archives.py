@@ -0,0 +1,166 @@
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+import click
+import numpy as np
+
+from .ocr import SushidaOCR
+from .utils import IMAGE_EXTENSIONS, is_archive
+
+
+class ArchiveMember:
+    """アーカイブ内の画像1枚
+
+    メンバーのデータはアーカイブを先頭から読み進めながらメモリに取り出し、
+    一時ファイルを作らずに cv2.imdecode に渡す。出力ファイル名などには
+    ファイルと同じく name / stem / suffix を使う。
+    """
+
+    __slots__ = ('archive', 'member', 'data', 'size', 'mtime')
+
+    def __init__(self, archive: Path, member: str, data: bytes, mtime: float):
+        self.archive = archive
+        self.member = member
+        self.data: Optional[bytes] = data
+        self.size = len(data)
+        self.mtime = mtime
+
+    @property
+    def name(self) -> str:
+        return PurePosixPath(self.member).name
+
+    @property
+    def stem(self) -> str:
+        return PurePosixPath(self.member).stem
+
+    @property
+    def suffix(self) -> str:
+        return PurePosixPath(self.member).suffix
+
+    def open(self) -> io.BytesIO:
+        return io.BytesIO(self.data or b'')
+
+    def __str__(self) -> str:
+        return f"{self.archive}:{self.member}"
+
+    def __repr__(self) -> str:
+        return f"ArchiveMember({str(self)!r})"
+
+
+ImageSource = Union[Path, ArchiveMember]
+
+
+def _is_image_member(name: str) -> bool:
+    path = PurePosixPath(name)
+    # macOSのzipに入る __MACOSX/ や ._ で始まるリソースフォークは除く
+    if any(part.startswith('.') or part == '__MACOSX' for part in path.parts):
+        return False
+    return path.suffix.lower() in IMAGE_EXTENSIONS
+
+
+def _iter_zip_members(archive: Path) -> Iterator[ArchiveMember]:
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or not _is_image_member(info.filename):
+                continue
+            try:
+                mtime = datetime(*info.date_time).timestamp()
+            except ValueError:
+                mtime = 0.0
+            yield ArchiveMember(archive, info.filename, zf.read(info), mtime)
+
+
+def _iter_tar_members(archive: Path) -> Iterator[ArchiveMember]:
+    # ストリームモードで先頭から順に読む（圧縮されたtarでもシークしない）
+    with tarfile.open(archive, mode='r|*') as tf:
+        for info in tf:
+            if not info.isfile() or not _is_image_member(info.name):
+                continue
+            f = tf.extractfile(info)
+            if f is None:
+                continue
+            yield ArchiveMember(archive, info.name, f.read(), float(info.mtime))
+
+
+def iter_archive_members(archive: Path) -> Iterator[ArchiveMember]:
+    """アーカイブ内の画像をアーカイブ内の順に列挙（画像の拡張子のメンバーだけ）
+
+    データは列挙した時点で読み込むため、メモリに載るのは処理待ちの件数分だけになる
+    """
+    archive = Path(archive)
+    try:
+        if archive.name.lower().endswith('.zip'):
+            yield from _iter_zip_members(archive)
+        else:
+            yield from _iter_tar_members(archive)
+    except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+        click.echo(f"⚠️  アーカイブを読み込めません: {archive} ({e})", err=True)
+
+
+def expand_archives(paths: Iterable[Path]) -> Iterator[ImageSource]:
+    """入力のうちアーカイブをメンバーの画像に置き換えて列挙（それ以外はそのまま）"""
+    for path in paths:
+        if is_archive(path) and path.is_file():
+            yield from iter_archive_members(path)
+        else:
+            yield path
+
+
+def source_key(source: ImageSource) -> str:
+    """入力を一意に表す文字列（アーカイブのメンバーは「アーカイブ:メンバー」）"""
+    if isinstance(source, ArchiveMember):
+        return f"{os.path.normpath(str(source.archive))}:{source.member}"
+    return os.path.normpath(str(source))
+
+
+class OutputNames:
+    """入力ごとの出力JSONファイル名（{stem}.json）を決める
+
+    別のディレクトリやアーカイブ内の別フォルダにある同じstemの画像（a/001.png と b/001.png など）が
+    同じファイル名・同じマニフェストの項目を上書きしないよう、2件目以降は入力のパスから求めた
+    短いハッシュを付けた名前（001_1a2b3c4d.json）にする。同じ入力には何度呼んでも同じ名前を返す。
+    """
+
+    def __init__(self):
+        # 出力ファイル名 -> その名前を使っている入力
+        self._owners: Dict[str, str] = {}
+
+    def name_for(self, source: ImageSource) -> str:
+        key = source_key(source)
+        filename = f"{source.stem}.json"
+        if self._owners.setdefault(filename, key) == key:
+            return filename
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+        renamed = f"{source.stem}_{digest}.json"
+        if renamed not in self._owners:
+            self._owners[renamed] = key
+            click.echo(f"⚠️  {filename} は別の画像と重なるため {renamed} に保存します: {source}", err=True)
+        return renamed
+
+
+def load_input(ocr: SushidaOCR, source: ImageSource, crop: bool = True) -> np.ndarray:
+    """ファイルまたはアーカイブのメンバーを読み込み（auto_cropが有効かつcropならゲーム画面を切り出す）"""
+    if isinstance(source, ArchiveMember):
+        if source.data is None:
+            raise ValueError(f"画像データを読み込めません: {source}")
+        return ocr.decode_image(source.data, crop)
+    return ocr.load_image(source, crop)
+
+
+def input_size(source: ImageSource) -> int:
+    """入力のバイト数"""
+    if isinstance(source, ArchiveMember):
+        return source.size
+    return source.stat().st_size
+
+
+def release_input(source: ImageSource):
+    """結果を処理し終えたアーカイブのメンバーのデータを手放す（失敗一覧などに残っても保持しない）"""
+    if isinstance(source, ArchiveMember):
+        source.data = None
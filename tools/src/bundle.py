@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .storage import file_fingerprint, score_key, sync_score_files
+from .utils import SCORE_BUNDLE_NAME, is_score_file
+
+BUNDLE_VERSION = 2
+
+
+class ScoreBundle:
+    """フロントエンドのビルドが読み込む score/bundle.json を増分管理するクラス
+
+    bundle.json はscoreディレクトリからの相対パス順（年/月のパーティション順）に並べた
+    スコア一覧を最小化したもので、内容のハッシュを含む。
+    同じスコアの集合からは常に同じバイト列（同じハッシュ）が生成される。
+    各ファイルの指紋は .bundle/index.json に保持し、変更のあったファイルだけを読み直す。
+    """
+
+    def __init__(self, score_dir: Path):
+        self.score_dir = Path(score_dir)
+        self.bundle_path = self.score_dir / SCORE_BUNDLE_NAME
+        self.index_path = self.score_dir / '.bundle' / 'index.json'
+        # 相対パス -> スコアデータ
+        self.entries: Dict[str, Dict] = {}
+        # 相対パス -> 指紋
+        self.fingerprints: Dict[str, str] = {}
+        self.hash = ''
+
+    def load(self) -> bool:
+        """bundle.json と指紋の索引を読み込み（どちらかが欠けている・壊れている場合はFalse）"""
+        try:
+            with open(self.bundle_path, 'r', encoding='utf-8') as f:
+                bundle = json.load(f)
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if bundle.get('version') != BUNDLE_VERSION or index.get('version') != BUNDLE_VERSION:
+            return False
+        self.entries = {item['path']: item['data'] for item in bundle.get('scores', [])}
+        self.fingerprints = {key: fp for key, fp in index.get('files', {}).items() if key in self.entries}
+        self.hash = bundle.get('hash', '')
+        return True
+
+    def upsert(self, key: str, data: Dict, fingerprint: str = ''):
+        """スコアを追加・更新"""
+        self.entries[key] = data
+        self.fingerprints[key] = fingerprint
+
+    def remove(self, key: str) -> bool:
+        """スコアを削除"""
+        self.fingerprints.pop(key, None)
+        return self.entries.pop(key, None) is not None
+
+    def is_current(self, key: str, fingerprint: str) -> bool:
+        return self.fingerprints.get(key) == fingerprint
+
+    def record_written(self, path: Path, data: Dict):
+        """書き込んだばかりのスコアファイルを反映（ファイルを読み直さない）
+
+        同名の旧レイアウトのファイルは保存時に削除されているので、bundleからも外す
+        """
+        key = score_key(self.score_dir, path)
+        if key != path.name:
+            self.remove(path.name)
+        self.upsert(key, data, file_fingerprint(path.stat()))
+
+    def sync_directory(self) -> Dict[str, int]:
+        """scoreディレクトリと同期（変更があったファイルのみ読み込む）"""
+        return sync_score_files(self.score_dir, keys=lambda: iter(self.entries),
+                                is_current=self.is_current, upsert=self.upsert, remove=self.remove)
+
+    def serialize(self) -> Tuple[str, str]:
+        """(bundle.jsonの内容, スコア一覧のハッシュ) を生成"""
+        scores = [{'data': self.entries[key], 'filename': key.rpartition('/')[2], 'path': key}
+                  for key in sorted(self.entries)]
+        payload = json.dumps(scores, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        # キーの順序を固定するため外側は文字列で組み立てる（スコア一覧を二重にシリアライズしない）
+        content = (f'{{"count":{len(scores)},"hash":"{digest}","scores":{payload},'
+                   f'"version":{BUNDLE_VERSION}}}')
+        return content, digest
+
+    def save(self) -> str:
+        """bundle.json と索引をアトミックに保存してハッシュを返す（内容が変わらなければ書き込まない）"""
+        content, digest = self.serialize()
+        if digest != self.hash or not self.bundle_path.exists():
+            _write_atomic(self.bundle_path, content)
+        index = {'version': BUNDLE_VERSION, 'files': self.fingerprints}
+        _write_atomic(self.index_path, json.dumps(index, ensure_ascii=False, separators=(',', ':')))
+        self.hash = digest
+        return digest
+
+
+def _write_atomic(path: Path, content: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def update_bundle(score_dir: Path, written: Sequence[Tuple[Path, Dict]]) -> ScoreBundle:
+    """書き込んだスコアファイルだけを bundle.json に反映
+
+    bundle.json がまだない（または壊れている）場合はディレクトリ全体から作り直す
+    """
+    bundle = ScoreBundle(score_dir)
+    if not bundle.load():
+        bundle.sync_directory()
+    for path, data in written:
+        bundle.record_written(path, data)
+    bundle.save()
+    return bundle
+
+
+def _synthetic_score(rng: random.Random) -> Dict:
+    course, payed = rng.choice([('お手軽', 3000), ('普通', 5000), ('高級', 10000)])
+    gain = rng.randint(0, payed * 2)
+    return {
+        'course': course,
+        'result': gain - payed,
+        'detail': {'payed': payed, 'gain': gain},
+        'typing': {'correct': rng.randint(10, 400), 'avarageTPS': round(rng.uniform(0.5, 8.0), 1),
+                   'miss': rng.randint(0, 50)},
+    }
+
+
+def _timed(func) -> Tuple[float, object]:
+    started = time.perf_counter()
+    value = func()
+    return time.perf_counter() - started, value
+
+
+def _scan_all(score_dir: Path) -> List[Dict]:
+    """従来のビルドと同じ読み込み方（全スコアファイルを読み込んでファイル名順に並べる）"""
+    scores = []
+    for name in os.listdir(score_dir):
+        if is_score_file(name):
+            with open(score_dir / name, 'r', encoding='utf-8') as f:
+                scores.append({'data': json.load(f), 'filename': name})
+    scores.sort(key=lambda item: item['filename'])
+    return scores
+
+
+def benchmark_bundle(count: int, seed: int = 0, work_dir: Optional[Path] = None) -> Dict[str, float]:
+    """count件のスコアファイルを生成し、全件読み込みとbundle.jsonの生成・増分更新・読み込みの時間を測定"""
+    rng = random.Random(seed)
+    base_dir = Path(tempfile.mkdtemp(prefix='sushida-bundle-', dir=work_dir))
+    try:
+        score_dir = base_dir / 'score'
+        score_dir.mkdir()
+        for index in range(count):
+            name = f"{20200101 + index // 1000:08d}_{index % 1000:03d}.json"
+            with open(score_dir / name, 'w', encoding='utf-8') as f:
+                json.dump(_synthetic_score(rng), f, ensure_ascii=False, indent=2)
+
+        scan_seconds, _ = _timed(lambda: _scan_all(score_dir))
+
+        def rebuild():
+            bundle = ScoreBundle(score_dir)
+            bundle.sync_directory()
+            return bundle.save()
+        rebuild_seconds, first_hash = _timed(rebuild)
+
+        # 同じ内容から作り直しても同じハッシュになること
+        shutil.rmtree(score_dir / '.bundle')
+        (score_dir / SCORE_BUNDLE_NAME).unlink()
+        _, second_hash = _timed(rebuild)
+
+        new_path = score_dir / '29991231_000.json'
+        new_data = _synthetic_score(rng)
+        with open(new_path, 'w', encoding='utf-8') as f:
+            json.dump(new_data, f, ensure_ascii=False, indent=2)
+        incremental_seconds, _ = _timed(lambda: update_bundle(score_dir, [(new_path, new_data)]))
+
+        def load_bundle():
+            with open(score_dir / SCORE_BUNDLE_NAME, 'r', encoding='utf-8') as f:
+                return json.load(f)['scores']
+        load_seconds, _ = _timed(load_bundle)
+
+        return {
+            'count': count,
+            'scan_seconds': scan_seconds,
+            'rebuild_seconds': rebuild_seconds,
+            'incremental_seconds': incremental_seconds,
+            'load_seconds': load_seconds,
+            'bundle_bytes': (score_dir / SCORE_BUNDLE_NAME).stat().st_size,
+            'deterministic': first_hash == second_hash,
+        }
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
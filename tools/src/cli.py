@@ -1,13 +1,45 @@
 import click
+import functools
 import json
+import os
 import sys
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from .archives import (
+    ArchiveMember, OutputNames, expand_archives, input_size, load_input, release_input
+)
+from .bundle import ScoreBundle, benchmark_bundle, update_bundle
+from .export import export_scores
+from .frames import benchmark_handoff
+from .fusion import FusionExtractor
+from .glyphs import DEFAULT_DIGIT_MODEL_PATH, DIGIT_FIELDS, load_digit_model, train_digit_model
+from .metrics import RunMetrics
 from .ocr import SushidaOCR
-from .parser import SushidaResultParser
+from .parser import SushidaResultParser, overall_confidence
+from .parser_check import DEFAULT_CORPUS_PATH, append_corpus_case, load_corpus, run_parser_check
+from .pipeline import TIERS, TieredExtractor, result_rank
+from .prefetch import (
+    DEFAULT_PREFETCH_DEPTH, DEFAULT_PREFETCH_MEMORY_MB, DEFAULT_PREFETCH_READERS, ImagePrefetcher
+)
+from .profiles import DEFAULT_PROFILE_PATH, PipelineProfile, ProfileError, get_profile
+from .results import JSON_BACKEND, ScoreResult, benchmark_serializers, save_results, write_json
+from .server import ExtractionService, run_server
+from .stacking import benchmark_preprocess
+from .stats import ScoreStatistics
+from .storage import (
+    capture_timestamp, iter_score_files, load_score, migrate_flat_scores, save_score, score_key,
+    score_path, stamp_capture_time
+)
+from .workers import (
+    ProcessExtractionPool, benchmark_scaling, configure_worker_threads,
+    default_worker_count, iter_extract, iter_extract_prefetched, retry_uncropped,
+    threads_per_worker as default_threads_per_worker
+)
 from .utils import (
     OutputFormatter, ensure_directory, get_output_file_path,
-    validate_image_file, format_file_size
+    validate_image_file, format_file_size, iter_input_paths, is_archive,
+    load_provenance_manifest, save_provenance_manifest
 )
 
 
@@ -19,6 +51,15 @@ def main(ctx):
     ctx.ensure_object(dict)
 
 
+def load_profile(profile_name: Optional[str], profile_file: Path) -> PipelineProfile:
+    """プロファイルを読み込み（失敗した場合は終了）"""
+    try:
+        return get_profile(profile_name, profile_file)
+    except (ProfileError, OSError) as e:
+        click.echo(f"❌ プロファイルを読み込めません: {e}", err=True)
+        sys.exit(1)
+
+
 @main.command()
 @click.argument('image_path', type=click.Path(exists=True, path_type=Path))
 @click.option('--output', '-o', type=click.Path(path_type=Path), 
@@ -27,9 +68,18 @@ def main(ctx):
               default='json', help='出力フォーマット')
 @click.option('--debug', is_flag=True, help='デバッグモード（中間画像を保存）')
 @click.option('--quiet', '-q', is_flag=True, help='結果のみ表示（進捗メッセージを非表示）')
-def analyze(image_path: Path, output: Optional[Path], output_format: str, debug: bool, quiet: bool):
+@click.option('--fusion', is_flag=True, help='複数の前処理バリアントをOCRしてフィールド単位で多数決')
+@click.option('--no-auto-crop', is_flag=True, help='デスクトップ全体のスクリーンショットからゲーム画面を切り出さない')
+@click.option('--profile-name', help='使用するパイプラインプロファイル（fast / balanced / accurate など）')
+@click.option('--profile-file', type=click.Path(dir_okay=False, path_type=Path),
+              default=DEFAULT_PROFILE_PATH, show_default='src/data/profiles.toml',
+              help='プロファイル設定ファイル（TOML）')
+def analyze(image_path: Path, output: Optional[Path], output_format: str, debug: bool, quiet: bool,
+            fusion: bool, no_auto_crop: bool, profile_name: Optional[str], profile_file: Path):
     """単一の画像ファイルを解析してスコアデータを抽出"""
     
+    profile = load_profile(profile_name, profile_file)
+    
     if not quiet:
         click.echo(f"🍣 画像を解析中: {image_path}")
         click.echo(f"📁 ファイルサイズ: {format_file_size(image_path)}")
@@ -44,37 +94,85 @@ def analyze(image_path: Path, output: Optional[Path], output_format: str, debug:
         if not quiet:
             click.echo("🔍 OCR処理中...")
         
-        ocr = SushidaOCR(debug=debug)
+        ocr = SushidaOCR(debug=debug, auto_crop=not no_auto_crop, settings=profile.ocr)
         
         # OCRセットアップテスト
         if not ocr.test_ocr_setup():
             click.echo("❌ OCRセットアップに問題があります。Tesseractが正しくインストールされているか確認してください。", err=True)
             sys.exit(1)
         
-        text = ocr.extract_text(image_path)
+        parser = SushidaResultParser(debug=debug, settings=profile.parser)
+        # これ未満の信頼度なら、切り出さない画像での再処理も試す
+        min_confidence = profile.pipeline.min_confidence
         
-        if not text.strip():
-            click.echo("❌ 画像からテキストを抽出できませんでした", err=True)
-            sys.exit(1)
-        
-        # 結果パース
-        if not quiet:
-            click.echo("📊 データをパース中...")
-        
-        parser = SushidaResultParser(debug=debug)
-        result = parser.parse(text)
-        
-        if not result:
-            click.echo("❌ スコアデータを抽出できませんでした", err=True)
-            if debug:
-                click.echo("抽出されたテキスト:")
-                click.echo(text)
-            sys.exit(1)
+        if fusion:
+            fusion_extractor = FusionExtractor(ocr, parser)
+            result, provenance, used = fusion_extractor.extract(image_path)
+            rank = result_rank(parser, result, provenance)
+            if not (rank[1] and rank[2] >= min_confidence):
+                # 切り出した画像の結果を採用できない場合は切り出さずに再処理し、良い方を使う
+                uncropped = ocr.load_image(image_path, crop=False)
+                if ocr.would_crop(uncropped):
+                    retried = fusion_extractor.extract_array(uncropped)
+                    if result_rank(parser, retried[0], retried[1]) > rank:
+                        result, provenance, used = retried
+            
+            if not result:
+                click.echo("❌ スコアデータを抽出できませんでした", err=True)
+                sys.exit(1)
+            
+            if not quiet:
+                agreement_text = ", ".join(f"{k}={v['agreement']:.0%}" for k, v in provenance.items())
+                click.echo(f"🗳️  {used}個のバリアントで多数決: {agreement_text}")
+        else:
+            text = ocr.extract_text(image_path)
+            
+            # 結果パース
+            if not quiet:
+                click.echo("📊 データをパース中...")
+            
+            provenance = {}
+            result = parser.parse(text, provenance) if text.strip() else None
+            rank = result_rank(parser, result, provenance)
+            if not (rank[1] and rank[2] >= min_confidence):
+                # 切り出した画像の結果を採用できない場合は切り出さずに再処理し、良い方を使う
+                uncropped = ocr.load_image(image_path, crop=False)
+                if ocr.would_crop(uncropped):
+                    if not quiet:
+                        click.echo("🔍 切り出さずに再処理中...")
+                    retried_text = ocr.extract_text_array(uncropped)
+                    retried_provenance: Dict = {}
+                    retried = parser.parse(retried_text, retried_provenance) if retried_text.strip() else None
+                    if result_rank(parser, retried, retried_provenance) > rank:
+                        text, result, provenance = retried_text, retried, retried_provenance
+            
+            if not text.strip():
+                click.echo("❌ 画像からテキストを抽出できませんでした", err=True)
+                sys.exit(1)
+            
+            if not result:
+                click.echo("❌ スコアデータを抽出できませんでした", err=True)
+                if debug:
+                    click.echo("抽出されたテキスト:")
+                    click.echo(text)
+                sys.exit(1)
+            
+            guessed = [k for k, v in provenance.items() if not v['source'].startswith('pattern:')]
+            if guessed and not quiet:
+                click.echo(f"⚠️  推測値を含むフィールド: {', '.join(guessed)}"
+                           f"（信頼度 {overall_confidence(provenance):.2f}、--fusionで精度を上げられます）")
         
         # 結果表示
         if not quiet:
             summary = parser.format_result_summary(result)
             click.echo(summary)
+        if debug:
+            click.echo(f"⏱️  処理時間: {ocr.format_stage_timings()}")
+        
+        # 撮影時刻（EXIF → ファイル名 → 更新日時）を記録
+        timestamp_source = stamp_capture_time(result, image_path)
+        if not quiet:
+            click.echo(f"🕒 撮影時刻: {result['timestamp']}（{timestamp_source}）")
         
         # 出力処理
         if output:
@@ -89,17 +187,17 @@ def analyze(image_path: Path, output: Optional[Path], output_format: str, debug:
             if not quiet:
                 click.echo(f"💾 結果を保存: {output_path}")
         else:
-            # 出力先が指定されていない場合はscoreディレクトリに保存
+            # 出力先が指定されていない場合はscoreディレクトリの年/月のパーティションに保存
             score_dir = Path("../score")  # toolsディレクトリからプロジェクトルートのscoreディレクトリへの相対パス
             score_dir.mkdir(parents=True, exist_ok=True)
             
             # 画像ファイル名からJSONファイル名を生成
             image_stem = image_path.stem  # 拡張子を除いたファイル名
             filename = f"{image_stem}.json"
-            output_path = score_dir / filename
             
             if output_format == 'json':
-                OutputFormatter.save_json(result, output_path)
+                output_path = save_score(score_dir, filename, result)
+                update_bundle(score_dir, [(output_path, result)])
                 if not quiet:
                     click.echo(f"💾 結果を保存: {output_path}")
             else:
@@ -118,65 +216,235 @@ def analyze(image_path: Path, output: Optional[Path], output_format: str, debug:
 
 
 @main.command()
-@click.argument('image_paths', nargs=-1, type=click.Path(exists=True, path_type=Path))
+@click.argument('image_paths', nargs=-1, type=click.Path(path_type=Path))
+@click.option('--recursive', '-r', 'directories', multiple=True,
+              type=click.Path(exists=True, file_okay=False, path_type=Path),
+              help='ディレクトリ以下の画像を再帰的に処理（複数指定可）')
+@click.option('--glob', 'patterns', multiple=True,
+              help='globパターンに一致する画像を処理（例: "screens/**/*.png"。引用符で囲んでシェルに展開させない）')
 @click.option('--output-dir', '-o', type=click.Path(path_type=Path), 
               help='出力ディレクトリ（指定しない場合は標準出力）')
-@click.option('--format', 'output_format', type=click.Choice(['json', 'csv']), 
-              default='json', help='出力フォーマット')
+@click.option('--format', 'output_format', type=click.Choice(['json', 'ndjson', 'csv']), 
+              default='json', help='出力フォーマット（ndjson / csv は1ファイルにまとめて保存）')
 @click.option('--debug', is_flag=True, help='デバッグモード')
 @click.option('--continue-on-error', is_flag=True, help='エラーが発生しても処理を続行')
-def batch(image_paths: List[Path], output_dir: Optional[Path], output_format: str, 
-          debug: bool, continue_on_error: bool):
-    """複数の画像ファイルを一括処理"""
+@click.option('--fusion', is_flag=True, help='複数の前処理バリアントをOCRしてフィールド単位で多数決')
+@click.option('--min-confidence', type=click.FloatRange(0.0, 1.0),
+              help='これ未満の信頼度の結果は次の処理段（より高精度）で再処理（既定はプロファイルの値）')
+@click.option('--skip-trusted', is_flag=True,
+              help='前回の実行で同じプロファイルの信頼度が閾値以上だった画像は再処理しない')
+@click.option('--start-tier', type=click.Choice(TIERS),
+              help='最初に試す処理段（digits: 数字テンプレート, fast: 軽量1回OCR, accurate: 従来の処理, fusion: 多数決。既定はプロファイルの値）')
+@click.option('--no-auto-crop', is_flag=True, help='デスクトップ全体のスクリーンショットからゲーム画面を切り出さない')
+@click.option('--profile-name', help='使用するパイプラインプロファイル（fast / balanced / accurate など）')
+@click.option('--profile-file', type=click.Path(dir_okay=False, path_type=Path),
+              default=DEFAULT_PROFILE_PATH, show_default='src/data/profiles.toml',
+              help='プロファイル設定ファイル（TOML）')
+@click.option('--metrics-file', type=click.Path(dir_okay=False, path_type=Path),
+              help='実行メトリクスをPrometheusのtextfile形式で出力（node exporterのtextfileコレクタ用）')
+@click.option('--metrics-json', type=click.Path(dir_okay=False, path_type=Path),
+              help='実行メトリクスのJSONサマリーを出力')
+@click.option('--workers', type=click.IntRange(1),
+              help='OCRワーカープロセス数（既定はCPUコア数で、最大2。2以上で画像を共有メモリ経由でワーカープロセスに渡して並列処理）')
+@click.option('--threads-per-worker', type=click.IntRange(1),
+              help='1ワーカーあたりのTesseract（OMP_THREAD_LIMIT）とOpenCVのスレッド数（既定はコア数÷ワーカー数）')
+@click.option('--prefetch', 'prefetch_depth', default=DEFAULT_PREFETCH_DEPTH, show_default=True,
+              type=click.IntRange(0),
+              help='OCR中に先に読み込んでおく画像の枚数（0で先読みしない）')
+@click.option('--prefetch-readers', default=DEFAULT_PREFETCH_READERS, show_default=True,
+              type=click.IntRange(1), help='先読みでデコードするスレッド数')
+@click.option('--prefetch-memory', default=DEFAULT_PREFETCH_MEMORY_MB, show_default=True,
+              type=click.IntRange(1), help='先読みした画像が使うメモリの上限（MB）')
+@click.option('--preprocess-batch', default=1, show_default=True, type=click.IntRange(1),
+              help='先読みした画像をこの枚数ずつまとめ、同じサイズの画像の前処理を1回で行う'
+                   '（1プロセス・先読みありのとき。指定時の--workersの既定は1）')
+def batch(image_paths: List[Path], directories: List[Path], patterns: List[str],
+          output_dir: Optional[Path], output_format: str, 
+          debug: bool, continue_on_error: bool, fusion: bool, min_confidence: Optional[float],
+          skip_trusted: bool, start_tier: Optional[str], no_auto_crop: bool,
+          profile_name: Optional[str], profile_file: Path,
+          metrics_file: Optional[Path], metrics_json: Optional[Path], workers: Optional[int],
+          threads_per_worker: Optional[int], prefetch_depth: int, prefetch_readers: int,
+          prefetch_memory: int, preprocess_batch: int):
+    """複数の画像ファイル（zip/tarアーカイブ内の画像を含む）を一括処理"""
     
-    if not image_paths:
+    if not image_paths and not directories and not patterns:
         click.echo("❌ 処理する画像ファイルが指定されていません", err=True)
         sys.exit(1)
     
-    click.echo(f"🍣 {len(image_paths)}個のファイルを処理中...")
+    profile = load_profile(profile_name, profile_file)
+    if min_confidence is None:
+        min_confidence = profile.pipeline.min_confidence
+    start_tier = start_tier or profile.pipeline.start_tier
     
-    results = []
+    # ディレクトリやglob、アーカイブの走査は処理と並行して進めるため、件数は事前に分からない
+    streaming = bool(directories or patterns) or any(is_archive(path) for path in image_paths)
+    if streaming:
+        click.echo("🍣 画像を探しながら処理中...")
+    else:
+        click.echo(f"🍣 {len(image_paths)}個のファイルを処理中...")
+    
+    # (出力ファイル名, 結果)
+    results: List[Tuple[str, ScoreResult]] = []
     failed_files = []
+    skipped_files = []
     
-    ocr = SushidaOCR(debug=debug)
-    parser = SushidaResultParser()
+    # 出力先（指定しない場合はscoreディレクトリ）の取得元・信頼度の記録
+    destination_dir = output_dir or Path("../score")
+    manifest = load_provenance_manifest(destination_dir)
+    
+    ocr = SushidaOCR(debug=debug, auto_crop=not no_auto_crop, settings=profile.ocr)
+    parser = SushidaResultParser(settings=profile.parser)
+    extractor = TieredExtractor(ocr, parser, min_confidence=min_confidence,
+                                start_tier='fusion' if fusion else start_tier)
+    # 数字テンプレートを学習し直した後は、前のモデルで得た結果を信頼済みとみなさない
+    fingerprint = extractor.result_fingerprint(profile.fingerprint)
     
     # OCRセットアップテスト
     if not ocr.test_ocr_setup():
         click.echo("❌ OCRセットアップに問題があります", err=True)
         sys.exit(1)
     
-    with click.progressbar(image_paths, label="処理中") as bar:
-        for image_path in bar:
-            try:
-                if not validate_image_file(image_path):
-                    if continue_on_error:
-                        failed_files.append((image_path, "サポートされていない画像形式"))
-                        continue
-                    else:
-                        click.echo(f"❌ サポートされていない画像形式: {image_path}", err=True)
-                        sys.exit(1)
-                
-                text = ocr.extract_text(image_path)
-                result = parser.parse(text)
-                
-                if result:
+    run_metrics = RunMetrics()
+    # 別のディレクトリにある同じstemの画像の結果が上書きし合わないように名前を決める
+    output_names = OutputNames()
+    # --continue-on-errorなしで対象外の画像に当たった場合の中断理由
+    stop_reasons: List[str] = []
+    
+    def targets():
+        """形式の検証とスキップの判定を通った画像だけを処理に回す"""
+        inputs = expand_archives(iter_input_paths(image_paths, directories, patterns, archives=True))
+        for image_path in inputs:
+            if isinstance(image_path, ArchiveMember):
+                # アーカイブのメンバーは列挙時に画像の拡張子で絞り込み済み
+                reason = None
+            elif not image_path.exists():
+                reason, message = 'missing', "ファイルが見つかりません"
+            elif not validate_image_file(image_path):
+                reason, message = 'unsupported', "サポートされていない画像形式"
+            else:
+                reason = None
+            if reason:
+                run_metrics.record_image('failed', 0.0, reason=reason)
+                failed_files.append((image_path, message))
+                if not continue_on_error:
+                    stop_reasons.append(f"{message}: {image_path}")
+                    return
+                continue
+            
+            if skip_trusted and output_format == 'json':
+                # 別のプロファイルで得た結果は信頼済みとみなさない
+                output_filename = output_names.name_for(image_path)
+                previous = manifest.get(output_filename)
+                if (previous and previous.get('profile') == fingerprint
+                        and previous.get('confidence', 0.0) >= min_confidence
+                        and (destination_dir / previous.get('path', output_filename)).exists()):
+                    skipped_files.append(image_path)
+                    run_metrics.record_image('skipped', 0.0)
+                    release_input(image_path)
+                    continue
+            yield image_path
+    
+    # 検証失敗・低信頼度の結果だけを高精度な処理段に回す
+    # 同時に動くTesseract/OpenCVのスレッドがコア数を超えないように、ワーカーごとに制限する
+    # 前処理をまとめる場合は、プロセスを分けずにOpenCVの内部の並列化でコアを使う
+    workers = workers or (1 if preprocess_batch > 1 else default_worker_count())
+    threads = threads_per_worker or default_threads_per_worker(workers)
+    if preprocess_batch > 1 and (workers > 1 or not prefetch_depth):
+        click.echo("⚠️  --preprocess-batch は --workers 1 かつ先読みありのときだけ有効です", err=True)
+    # 画像のデコードはOCRと並行して読み込みスレッドで先に進めておく
+    prefetch_bytes = prefetch_memory * 1024 * 1024
+    pool = None
+    prefetcher = None
+    if workers > 1:
+        pool = ProcessExtractionPool(ocr, profile, workers=workers, min_confidence=min_confidence,
+                                     start_tier='fusion' if fusion else start_tier, threads=threads,
+                                     readers=prefetch_readers, prefetch=prefetch_depth,
+                                     max_bytes=prefetch_bytes)
+        pool.start()
+        click.echo(f"⚙️  {workers}プロセス × {threads}スレッドで処理します")
+        outcomes = pool.extract_paths(targets())
+    elif prefetch_depth:
+        configure_worker_threads(threads)
+        prefetcher = ImagePrefetcher(functools.partial(load_input, ocr), targets(), depth=prefetch_depth,
+                                     readers=prefetch_readers, max_bytes=prefetch_bytes)
+        outcomes = iter_extract_prefetched(extractor, prefetcher, batch_size=preprocess_batch)
+    else:
+        configure_worker_threads(threads)
+        outcomes = iter_extract(extractor, targets())
+    timings = pool or ocr
+    prefetch_stats = pool.prefetch_stats if pool else prefetcher.stats if prefetcher else None
+    
+    try:
+        length = None if streaming else len(image_paths)
+        with click.progressbar(outcomes, length=length, label="処理中") as bar:
+            for outcome in bar:
+                # 切り出した画像の結果を採用できない場合は切り出さずに再処理
+                # 再処理の試行・確定件数は元の結果と同じ集計（プールならpool.stats）に記録する
+                outcome = retry_uncropped(extractor, outcome, pool.stats if pool else None)
+                image_path = outcome.path
+                size = input_size(image_path)
+                if outcome.result:
+                    run_metrics.record_image('success', outcome.seconds, size,
+                                             outcome.stage_seconds, tier=outcome.tier)
                     # 画像ファイル名からJSONファイル名を決定
-                    result['output_filename'] = f"{image_path.stem}.json"
-                    results.append(result)
+                    output_filename = output_names.name_for(image_path)
+                    result = ScoreResult.from_dict(outcome.result)
+                    result.timestamp, timestamp_source = capture_timestamp(image_path)
+                    manifest[output_filename] = {
+                        'confidence': overall_confidence(outcome.provenance),
+                        'profile': fingerprint,
+                        'timestampSource': timestamp_source,
+                        'fields': outcome.provenance,
+                    }
+                    if output_dir is None and output_format == 'json':
+                        # scoreディレクトリでは撮影時刻の年/月のパーティションに保存される
+                        manifest[output_filename]['path'] = score_key(
+                            destination_dir, score_path(destination_dir, output_filename, result))
+                    results.append((output_filename, result))
                 else:
-                    failed_files.append((image_path, "スコアデータを抽出できませんでした"))
+                    run_metrics.record_image('failed', outcome.seconds, size, outcome.stage_seconds,
+                                             reason='error' if outcome.error else 'unparsed')
+                    failed_files.append((image_path, outcome.error or "スコアデータを抽出できませんでした"))
                     if not continue_on_error:
+                        if outcome.error:
+                            click.echo(f"❌ エラー: {outcome.error}", err=True)
                         sys.exit(1)
-                        
-            except Exception as e:
-                failed_files.append((image_path, str(e)))
-                if not continue_on_error:
-                    click.echo(f"❌ エラー: {e}", err=True)
-                    sys.exit(1)
+                # アーカイブから読み込んだデータは結果を処理したら手放す
+                release_input(image_path)
+        
+        if stop_reasons:
+            click.echo(f"❌ {stop_reasons[0]}", err=True)
+            sys.exit(1)
+    finally:
+        if pool:
+            pool.close()
+        if prefetcher:
+            prefetcher.close()
+        # 途中で終了した場合もそれまでのメトリクスを出力する
+        run_metrics.finish(timings.stage_calls, prefetch_stats.to_dict() if prefetch_stats else None)
+        if metrics_file:
+            run_metrics.write_textfile(metrics_file)
+        if metrics_json:
+            run_metrics.write_json(metrics_json)
     
     # 結果表示
-    click.echo(f"\n✅ 処理完了: {len(results)}件成功, {len(failed_files)}件失敗")
+    click.echo(f"\n✅ 処理完了: {len(results)}件成功, {len(failed_files)}件失敗"
+               f"（{run_metrics.images_per_second:.2f}枚/秒）")
+    tier_lines = (pool.stats if pool else extractor.stats).report_lines()
+    if tier_lines:
+        click.echo("⏱️  処理段ごとの内訳:")
+        for line in tier_lines:
+            click.echo(line)
+    if timings.stage_seconds:
+        click.echo(f"⏱️  処理段階ごとの合計: {timings.format_stage_timings()}")
+    if prefetch_stats:
+        click.echo(f"📥 先読み: {prefetch_stats.report_line()}")
+    if skipped_files:
+        click.echo(f"⏭️  信頼済みのためスキップ: {len(skipped_files)}件")
+    for path in (metrics_file, metrics_json):
+        if path:
+            click.echo(f"📈 メトリクスを保存: {path}")
     
     if failed_files:
         click.echo("\n❌ 失敗したファイル:")
@@ -184,27 +452,26 @@ def batch(image_paths: List[Path], output_dir: Optional[Path], output_format: st
             click.echo(f"  {file_path}: {error}")
     
     if not results:
+        if skipped_files:
+            return
         click.echo("処理可能なファイルがありませんでした", err=True)
         sys.exit(1)
     
+    save_provenance_manifest(destination_dir, manifest)
+    
     # 出力処理
     if output_dir:
         output_dir.mkdir(parents=True, exist_ok=True)
         
         if output_format == 'json':
             # 個別のJSONファイルとして保存
-            for result in results:
-                output_file = output_dir / result['output_filename']
-                # 出力用のデータから内部フィールドを除去
-                clean_result = {k: v for k, v in result.items() if k not in ['output_filename']}
-                OutputFormatter.save_json(clean_result, output_file)
+            for output_filename, result in results:
+                write_json(result, output_dir / output_filename)
             click.echo(f"💾 {len(results)}個のファイルを保存: {output_dir}")
-        elif output_format == 'csv':
-            # CSVの場合は一括ファイルとして保存
-            output_file = output_dir / f"batch_results.csv"
-            # 出力用のデータから内部フィールドを除去
-            clean_results = [{k: v for k, v in result.items() if k not in ['output_filename']} for result in results]
-            OutputFormatter.save_csv(clean_results, output_file)
+        else:
+            # NDJSON/CSVの場合は一括ファイルとして保存
+            output_file = output_dir / f"batch_results.{output_format}"
+            save_results([result for _, result in results], output_file, output_format)
             click.echo(f"💾 結果を保存: {output_file}")
     else:
         # 出力先が指定されていない場合はscoreディレクトリに保存
@@ -213,32 +480,433 @@ def batch(image_paths: List[Path], output_dir: Optional[Path], output_format: st
         
         if output_format == 'json':
             # 個別のJSONファイルとして保存
-            for result in results:
-                output_file = score_dir / result['output_filename']
-                # 出力用のデータから内部フィールドを除去
-                clean_result = {k: v for k, v in result.items() if k not in ['output_filename']}
-                OutputFormatter.save_json(clean_result, output_file)
+            written = []
+            for output_filename, result in results:
+                # 撮影時刻の年/月のパーティションに保存
+                output_file = save_score(score_dir, output_filename, result)
+                written.append((output_file, result.to_dict()))
             click.echo(f"💾 {len(results)}個のファイルを保存: {score_dir}")
-        elif output_format == 'csv':
-            # CSVの場合はタイムスタンプ付きファイルとして保存
+            # フロントエンドのビルドが読み込むbundle.jsonに書き込んだ分だけ反映
+            bundle = update_bundle(score_dir, written)
+            click.echo(f"📦 bundle.jsonを更新: {len(bundle.entries)}件 (hash {bundle.hash[:12]})")
+        else:
+            # NDJSON/CSVの場合はタイムスタンプ付きファイルとして保存
             from datetime import datetime
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = score_dir / f"batch_results_{timestamp}.csv"
-            # 出力用のデータから内部フィールドを除去
-            clean_results = [{k: v for k, v in result.items() if k not in ['output_filename']} for result in results]
-            OutputFormatter.save_csv(clean_results, output_file)
+            output_file = score_dir / f"batch_results_{timestamp}.{output_format}"
+            save_results([result for _, result in results], output_file, output_format)
             click.echo(f"💾 結果を保存: {output_file}")
 
 
+@main.command()
+@click.option('--score-dir', type=click.Path(file_okay=False, path_type=Path),
+              default=Path("../score"), show_default=True, help='スコアJSONのディレクトリ')
+@click.option('--state', 'state_path', type=click.Path(dir_okay=False, path_type=Path),
+              default=Path("../score/.stats/state.json"), show_default=True,
+              help='集計の途中状態を保持するファイル')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, path_type=Path),
+              default=Path("../public/stats.json"), show_default=True,
+              help='フロントエンド向け集計JSONの出力先')
+@click.option('--rebuild', is_flag=True, help='状態ファイルを破棄して全件から再集計')
+def stats(score_dir: Path, state_path: Path, output: Path, rebuild: bool):
+    """スコアを日次・週次・コース別に増分集計して出力"""
+    
+    if not score_dir.is_dir():
+        click.echo(f"❌ scoreディレクトリが見つかりません: {score_dir}", err=True)
+        sys.exit(1)
+    
+    if rebuild and state_path.exists():
+        state_path.unlink()
+    
+    statistics = ScoreStatistics(state_path)
+    counts = statistics.sync_directory(score_dir)
+    statistics.save()
+    
+    summary = statistics.export()
+    statistics.write_export(output, summary)
+    
+    click.echo(
+        f"📊 集計更新: 追加{counts['added']}件, 更新{counts['updated']}件, "
+        f"削除{counts['removed']}件, 変更なし{counts['unchanged']}件"
+    )
+    click.echo(f"🎮 総ゲーム数: {summary['total'].get('totalGames', 0)}回")
+    click.echo(f"💾 集計結果を保存: {output}")
+
+
+@main.command()
+@click.option('--score-dir', type=click.Path(file_okay=False, path_type=Path),
+              default=Path("../score"), show_default=True, help='スコアJSONのディレクトリ')
+@click.option('--rebuild', is_flag=True, help='既存のbundle.jsonを使わず全件から作り直す')
+def bundle(score_dir: Path, rebuild: bool):
+    """フロントエンドのビルド用に score/bundle.json を増分更新"""
+    
+    if not score_dir.is_dir():
+        click.echo(f"❌ scoreディレクトリが見つかりません: {score_dir}", err=True)
+        sys.exit(1)
+    
+    score_bundle = ScoreBundle(score_dir)
+    if not rebuild:
+        score_bundle.load()
+    counts = score_bundle.sync_directory()
+    digest = score_bundle.save()
+    
+    click.echo(
+        f"📦 bundle更新: 追加{counts['added']}件, 更新{counts['updated']}件, "
+        f"削除{counts['removed']}件, 変更なし{counts['unchanged']}件"
+    )
+    click.echo(f"💾 {len(score_bundle.entries)}件を保存: {score_bundle.bundle_path} (hash {digest[:12]})")
+
+
+@main.command()
+@click.option('--score-dir', type=click.Path(file_okay=False, path_type=Path),
+              default=Path("../score"), show_default=True, help='スコアJSONのディレクトリ')
+def partition(score_dir: Path):
+    """score直下の旧レイアウトのスコアファイルを年/月のパーティションに移動"""
+    
+    if not score_dir.is_dir():
+        click.echo(f"❌ scoreディレクトリが見つかりません: {score_dir}", err=True)
+        sys.exit(1)
+    
+    moved = migrate_flat_scores(score_dir)
+    # batch --skip-trusted が移動先のファイルを確認できるように記録を更新
+    manifest = load_provenance_manifest(score_dir)
+    for filename, key in moved.items():
+        if filename in manifest:
+            manifest[filename]['path'] = key
+    if moved and manifest:
+        save_provenance_manifest(score_dir, manifest)
+    
+    score_bundle = ScoreBundle(score_dir)
+    score_bundle.load()
+    score_bundle.sync_directory()
+    score_bundle.save()
+    for filename, key in moved.items():
+        click.echo(f"  {filename} → {key}")
+    click.echo(f"📁 {len(moved)}個のファイルをパーティションに移動しました")
+    click.echo(f"📦 bundle.jsonを更新: {len(score_bundle.entries)}件 (hash {score_bundle.hash[:12]})")
+
+
+@main.command()
+@click.argument('sources', nargs=-1, type=click.Path(exists=True, path_type=Path))
+@click.option('--output', '-o', type=click.Path(dir_okay=False, path_type=Path), required=True,
+              help='出力ファイルパス（拡張子は自動で付与）')
+@click.option('--format', 'output_format', type=click.Choice(['csv', 'parquet']),
+              default='csv', help='出力フォーマット')
+@click.option('--since', type=click.DateTime(['%Y-%m-%d']), help='この日付以降のみ出力（YYYY-MM-DD）')
+@click.option('--until', type=click.DateTime(['%Y-%m-%d']), help='この日付以前のみ出力（YYYY-MM-DD）')
+@click.option('--course', 'courses', multiple=True, type=click.Choice(['お手軽', '普通', '高級']),
+              help='出力するコース（複数指定可）')
+def export(sources: List[Path], output: Path, output_format: str, since: Optional[datetime],
+           until: Optional[datetime], courses: List[str]):
+    """スコアJSON（scoreディレクトリやbatch出力）をCSV/Parquetに一括出力"""
+    
+    if not sources:
+        sources = [Path("../score")]
+    
+    output_path = get_output_file_path(output, output_format)
+    ensure_directory(output_path)
+    
+    try:
+        # 日付はスコアの日付と同じ YYYY-MM-DD の文字列で比べる
+        count = export_scores(sources, output_path, output_format,
+                              since=since and since.strftime('%Y-%m-%d'),
+                              until=until and until.strftime('%Y-%m-%d'), courses=courses)
+    except ImportError:
+        sys.exit(1)
+    
+    click.echo(f"💾 {count}件を出力: {output_path}")
+
+
+@main.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help='待ち受けアドレス')
+@click.option('--port', default=8765, show_default=True, type=int, help='待ち受けポート（0で自動割り当て）')
+@click.option('--workers', default=2, show_default=True, type=click.IntRange(1), help='OCRワーカー数')
+@click.option('--max-batch', default=4, show_default=True, type=click.IntRange(1),
+              help='ワーカーが一度にまとめて取り出す最大件数')
+@click.option('--max-wait-ms', default=5.0, show_default=True, type=click.FloatRange(0.0),
+              help='まとめて取り出す際に後続のリクエストを待つ時間（ミリ秒）')
+@click.option('--timeout', default=60.0, show_default=True, type=click.FloatRange(0.1),
+              help='1リクエストの解析を待つ時間（秒）。超えると504を返す')
+@click.option('--read-timeout', default=10.0, show_default=True, type=click.FloatRange(0.1),
+              help='クライアントからの受信が止まってから接続を切るまでの時間（秒）。本文の途中なら408を返す')
+@click.option('--start-tier', type=click.Choice(TIERS), help='最初に試す処理段（既定はプロファイルの値）')
+@click.option('--min-confidence', type=click.FloatRange(0.0, 1.0),
+              help='これ未満の信頼度の結果は次の処理段で再処理（既定はプロファイルの値）')
+@click.option('--debug', is_flag=True, help='デバッグモード（アクセスログを表示）')
+@click.option('--no-auto-crop', is_flag=True, help='デスクトップ全体のスクリーンショットからゲーム画面を切り出さない')
+@click.option('--profile-name', help='使用するパイプラインプロファイル（fast / balanced / accurate など）')
+@click.option('--profile-file', type=click.Path(dir_okay=False, path_type=Path),
+              default=DEFAULT_PROFILE_PATH, show_default='src/data/profiles.toml',
+              help='プロファイル設定ファイル（TOML）')
+def serve(host: str, port: int, workers: int, max_batch: int, max_wait_ms: float, timeout: float,
+          read_timeout: float, start_tier: Optional[str], min_confidence: Optional[float], debug: bool, no_auto_crop: bool,
+          profile_name: Optional[str], profile_file: Path):
+    """ローカルHTTPサーバーとして常駐し、POSTされた画像を解析"""
+    
+    profile = load_profile(profile_name, profile_file)
+    if min_confidence is None:
+        min_confidence = profile.pipeline.min_confidence
+    
+    service = ExtractionService(workers=workers, max_batch=max_batch,
+                                max_wait=max_wait_ms / 1000.0,
+                                start_tier=start_tier or profile.pipeline.start_tier,
+                                min_confidence=min_confidence, debug=debug,
+                                auto_crop=not no_auto_crop, profile=profile)
+    
+    probe = SushidaOCR()
+    if not probe.test_ocr_setup():
+        click.echo("❌ OCRセットアップに問題があります", err=True)
+        sys.exit(1)
+    
+    run_server(service, host, port, timeout, read_timeout)
+
+
+@main.command('bench-ipc')
+@click.option('--width', default=1920, show_default=True, type=click.IntRange(1), help='フレームの幅')
+@click.option('--height', default=1080, show_default=True, type=click.IntRange(1), help='フレームの高さ')
+@click.option('--frames', default=200, show_default=True, type=click.IntRange(1), help='送るフレーム数')
+@click.option('--workers', default=2, show_default=True, type=click.IntRange(1), help='受け取るワーカープロセス数')
+def bench_ipc(width: int, height: int, frames: int, workers: int):
+    """ワーカープロセスへの画像の受け渡しコストを pickle と共有メモリで比較"""
+    
+    click.echo(f"📦 {width}x{height}x3 (uint8) のフレームを{frames}枚、{workers}プロセスに送信中...")
+    results = benchmark_handoff((height, width, 3), frames=frames, workers=workers)
+    
+    for method, result in results.items():
+        click.echo(f"  {method}: {result['per_frame_ms']:.3f}ms/枚, "
+                   f"{result['frames_per_second']:.0f}枚/秒（合計 {result['total_seconds']:.2f}s）")
+    saved = results['pickle']['per_frame_ms'] - results['shared_memory']['per_frame_ms']
+    click.echo(f"⚡ 共有メモリで1枚あたり {saved:.3f}ms 短縮")
+
+
+@main.command('bench-scaling')
+@click.argument('image_paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--workers-list', default='1,2,4,8', show_default=True,
+              help='測定するワーカー数（カンマ区切り）')
+@click.option('--repeat', default=1, show_default=True, type=click.IntRange(1),
+              help='画像リストを繰り返す回数（枚数が少ない場合に増やす）')
+@click.option('--start-tier', type=click.Choice(TIERS), help='最初に試す処理段（既定はプロファイルの値）')
+@click.option('--profile-name', help='使用するパイプラインプロファイル（fast / balanced / accurate など）')
+@click.option('--profile-file', type=click.Path(dir_okay=False, path_type=Path),
+              default=DEFAULT_PROFILE_PATH, show_default='src/data/profiles.toml',
+              help='プロファイル設定ファイル（TOML）')
+def bench_scaling(image_paths: List[Path], workers_list: str, repeat: int, start_tier: Optional[str],
+                  profile_name: Optional[str], profile_file: Path):
+    """ワーカープロセス数ごとの処理枚数/秒を測定"""
+    
+    try:
+        worker_counts = [int(value) for value in workers_list.split(',') if value.strip()]
+    except ValueError:
+        click.echo(f"❌ ワーカー数の指定が不正です: {workers_list}", err=True)
+        sys.exit(1)
+    if not worker_counts or min(worker_counts) < 1:
+        click.echo(f"❌ ワーカー数の指定が不正です: {workers_list}", err=True)
+        sys.exit(1)
+    
+    profile = load_profile(profile_name, profile_file)
+    ocr = SushidaOCR(settings=profile.ocr)
+    if not ocr.test_ocr_setup():
+        click.echo("❌ OCRセットアップに問題があります", err=True)
+        sys.exit(1)
+    
+    paths = [path for path in image_paths if validate_image_file(path)] * repeat
+    click.echo(f"📈 {len(paths)}枚の画像で測定中（CPUコア数 {os.cpu_count() or 1}）...")
+    results = benchmark_scaling(ocr, profile, paths, worker_counts,
+                                start_tier=start_tier or profile.pipeline.start_tier,
+                                min_confidence=profile.pipeline.min_confidence)
+    
+    baseline = results[0].images_per_second
+    for result in results:
+        speedup = result.images_per_second / baseline if baseline else 0.0
+        click.echo(f"  {result.workers}ワーカー × {result.threads}スレッド: "
+                   f"{result.images_per_second:.2f}枚/秒（{result.seconds:.1f}s, x{speedup:.2f}）")
+
+
+@main.command('bench-bundle')
+@click.option('--counts', default='10000,100000', show_default=True,
+              help='生成するスコアファイル数（カンマ区切り）')
+def bench_bundle(counts: str):
+    """スコアファイルの全件読み込みとbundle.jsonの生成・増分更新・読み込みの時間を比較"""
+    
+    try:
+        sizes = [int(value) for value in counts.split(',') if value.strip()]
+    except ValueError:
+        click.echo(f"❌ 件数の指定が不正です: {counts}", err=True)
+        sys.exit(1)
+    
+    for count in sizes:
+        click.echo(f"📦 {count}件のスコアファイルで測定中...")
+        result = benchmark_bundle(count)
+        click.echo(f"  全件読み込み（従来のビルド）: {result['scan_seconds']:.2f}s")
+        click.echo(f"  bundle.json 全件生成: {result['rebuild_seconds']:.2f}s")
+        click.echo(f"  bundle.json 1件追加の増分更新: {result['incremental_seconds']:.2f}s")
+        click.echo(f"  bundle.json 読み込み: {result['load_seconds']:.2f}s "
+                   f"（{result['bundle_bytes'] / 1024 / 1024:.1f} MB）")
+        click.echo(f"  同じ内容から同じハッシュ: {'はい' if result['deterministic'] else 'いいえ'}")
+
+
+@main.command('bench-serialize')
+@click.option('--count', default=100000, show_default=True, type=click.IntRange(1),
+              help='出力するスコアの件数')
+def bench_serialize(count: int):
+    """スコアのJSON・NDJSON・CSV出力の速度を従来の辞書経由の出力と比較"""
+
+    click.echo(f"🧾 {count}件のスコアで測定中...（汎用JSONバックエンド: {JSON_BACKEND}）")
+    baseline = {}
+    for row in benchmark_serializers(count):
+        baseline.setdefault(row['format'], row['seconds'])
+        speedup = baseline[row['format']] / row['seconds'] if row['seconds'] else 0.0
+        click.echo(f"  {row['format']:<6} {row['method']:<18} {row['seconds']:.2f}s "
+                   f"（{row['per_second']:,.0f}件/秒, 従来比 {speedup:.1f}倍）")
+
+
+@main.command('bench-preprocess')
+@click.argument('image_paths', nargs=-1, required=True,
+                type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--repeat', default=3, show_default=True, type=click.IntRange(1),
+              help='測定の繰り返し回数（最小値を使う）')
+@click.option('--threshold', default='adaptive', show_default=True,
+              type=click.Choice(['adaptive', 'otsu']), help='二値化の方式')
+@click.option('--threads', type=click.IntRange(1), help='OpenCVのスレッド数（既定はOpenCVの既定値）')
+@click.option('--no-auto-crop', is_flag=True, help='デスクトップ全体のスクリーンショットからゲーム画面を切り出さない')
+def bench_preprocess(image_paths: List[Path], repeat: int, threshold: str, threads: Optional[int],
+                     no_auto_crop: bool):
+    """1枚ずつの前処理と、同じサイズの画像をまとめた前処理の速度を比較"""
+
+    ocr = SushidaOCR(auto_crop=not no_auto_crop)
+    images = [ocr.load_image(path) for path in image_paths]
+    click.echo(f"🧪 {len(images)}枚の前処理を測定中...")
+    result = benchmark_preprocess(ocr, images, repeat=repeat, threshold=threshold, threads=threads)
+    speedup = result['single_seconds'] / result['batch_seconds'] if result['batch_seconds'] else 0.0
+    click.echo(f"  画像のサイズ: {result['groups']}種類, OpenCVのスレッド数: {result['threads']}")
+    click.echo(f"  1枚ずつ:   {result['single_seconds'] * 1000:.0f}ms")
+    click.echo(f"  まとめて:  {result['batch_seconds'] * 1000:.0f}ms（{speedup:.2f}倍）")
+    click.echo(f"  結果の一致: {'はい' if result['identical'] else 'いいえ'}")
+
+
+@main.command('train-digits')
+@click.argument('image_paths', nargs=-1, type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--recursive', '-r', 'directories', multiple=True,
+              type=click.Path(exists=True, file_okay=False, path_type=Path),
+              help='ディレクトリ以下の画像を再帰的に使う（複数指定可）')
+@click.option('--field', 'field_specs', multiple=True,
+              help='数値フィールドの範囲 NAME=x,y,幅,高さ（ゲーム画面に対する比率。'
+                   f'NAMEは {" / ".join(DIGIT_FIELDS)}。省略時は既存のモデルの範囲）')
+@click.option('--score-dir', type=click.Path(exists=True, file_okay=False, path_type=Path),
+              default=Path("../score"), show_default=True,
+              help='正解として使うスコアJSONのディレクトリ（画像と同じファイル名のものを使う）')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, path_type=Path),
+              default=DEFAULT_DIGIT_MODEL_PATH, show_default='src/data/digits.npz', help='モデルの保存先')
+@click.option('--neighbors', '-k', default=3, show_default=True, type=click.IntRange(1),
+              help='k近傍法の近傍数')
+@click.option('--no-auto-crop', is_flag=True, help='デスクトップ全体のスクリーンショットからゲーム画面を切り出さない')
+def train_digits(image_paths: List[Path], directories: List[Path], field_specs: List[str],
+                 score_dir: Path, output: Path, neighbors: int, no_auto_crop: bool):
+    """正解のスコアがある画面から、数値フィールドを読む数字テンプレートを学習"""
+    
+    fields = {}
+    for spec in field_specs:
+        name, _, values = spec.partition('=')
+        try:
+            roi = tuple(float(value) for value in values.split(','))
+        except ValueError:
+            roi = ()
+        if name not in DIGIT_FIELDS or len(roi) != 4:
+            click.echo(f"❌ フィールドの指定が不正です: {spec}", err=True)
+            sys.exit(1)
+        fields[name] = roi
+    if not fields:
+        existing = load_digit_model(output)
+        if existing is None:
+            click.echo("❌ --field でフィールドの範囲を指定してください", err=True)
+            sys.exit(1)
+        fields = existing.fields
+    
+    # 画像と同じファイル名のスコアJSONを正解にする
+    labels = {path.stem: path for path in iter_score_files(score_dir)}
+    ocr = SushidaOCR(auto_crop=not no_auto_crop)
+    
+    def examples():
+        for image_path in iter_input_paths(image_paths, directories):
+            score_file = labels.get(image_path.stem)
+            result = load_score(score_file) if score_file else None
+            if result is None or not validate_image_file(image_path):
+                continue
+            yield ocr.load_image(image_path), result
+    
+    click.echo(f"🔢 {len(fields)}個のフィールド（{', '.join(fields)}）の数字を学習中...")
+    try:
+        model, report = train_digit_model(examples(), fields, k=neighbors)
+    except ValueError as e:
+        click.echo(f"❌ {e}", err=True)
+        sys.exit(1)
+    
+    output.parent.mkdir(parents=True, exist_ok=True)
+    model.save(output)
+    counts = ", ".join(f"{label}:{count}" for label, count in report.class_counts.items())
+    click.echo(f"  使用したフィールド: {report.samples}件（正解と対応付けられず除外: {report.skipped}件）")
+    click.echo(f"  テンプレート数: {counts}")
+    click.echo(f"  学習データでの正解率: {report.accuracy:.1%}, 1フィールドあたり {report.field_ms:.3f}ms")
+    click.echo(f"💾 モデルを保存: {output}（--start-tier digits で使用）")
+
+
+@main.command('check-parser')
+@click.option('--corpus', 'corpus_path', type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              default=DEFAULT_CORPUS_PATH, show_default=True, help='回帰テスト用コーパス（JSON Lines）')
+@click.option('--fuzz', 'fuzz_count', default=200, show_default=True, type=click.IntRange(0),
+              help='ファジングで生成するテキスト数')
+@click.option('--max-length', default=20000, show_default=True, type=click.IntRange(1),
+              help='ファジングで生成するテキストの最大長')
+@click.option('--seed', default=0, show_default=True, type=int, help='ファジングの乱数シード')
+@click.option('--hang-timeout', default=10.0, show_default=True, type=click.FloatRange(0.1),
+              help='1件の処理がこの秒数を超えたら破滅的な後戻りとみなして中断')
+def check_parser(corpus_path: Path, fuzz_count: int, max_length: int, seed: int, hang_timeout: float):
+    """パーサーの回帰テストと、長いノイズテキストによる処理時間の検証"""
+    
+    corpus = load_corpus(corpus_path)
+    click.echo(f"🧪 コーパス{len(corpus)}件 + ファジング{fuzz_count}件（最大{max_length}文字, seed={seed}）を検証中...")
+    
+    report = run_parser_check(corpus, fuzz_count=fuzz_count, max_length=max_length,
+                              seed=seed, hang_timeout=hang_timeout)
+    
+    click.echo(f"⚡ スループット: {report.texts_per_second:.1f} texts/sec, "
+               f"{report.chars_per_second / 1000:.0f}k chars/sec")
+    slowest_time, slowest_id, slowest_length = report.slowest
+    if slowest_id:
+        click.echo(f"🐢 最も遅い入力: {slowest_id}（{slowest_length}文字, {slowest_time * 1000:.1f}ms）")
+    
+    if report.hung:
+        case_id, length = report.hung
+        click.echo(f"❌ {case_id}（{length}文字）の処理が{hang_timeout}秒以内に終わりませんでした"
+                   "（破滅的な後戻りの可能性）", err=True)
+    for case_id, problem in report.failures:
+        click.echo(f"❌ {case_id}: {problem}", err=True)
+    
+    if not report.ok:
+        sys.exit(1)
+    click.echo(f"✅ {report.cases}件すべて問題ありません")
+
+
 @main.command()
 @click.argument('image_path', type=click.Path(exists=True, path_type=Path))
-def test(image_path: Path):
+@click.option('--no-auto-crop', is_flag=True, help='デスクトップ全体のスクリーンショットからゲーム画面を切り出さない')
+@click.option('--profile-name', help='使用するパイプラインプロファイル（fast / balanced / accurate など）')
+@click.option('--profile-file', type=click.Path(dir_okay=False, path_type=Path),
+              default=DEFAULT_PROFILE_PATH, show_default='src/data/profiles.toml',
+              help='プロファイル設定ファイル（TOML）')
+@click.option('--record-corpus', 'expected_path', type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help='OCRのテキストをこのスコアJSONを期待値としてパーサーの回帰テスト用コーパスに追加')
+@click.option('--xfail-reason',
+              help='パース結果が期待値と違う場合に、既知の誤り（xfail）として記録する理由（なければ記録しない）')
+def test(image_path: Path, no_auto_crop: bool, profile_name: Optional[str], profile_file: Path,
+         expected_path: Optional[Path], xfail_reason: Optional[str]):
     """画像に対してOCRテストを実行（デバッグ用）"""
     
-    click.echo(f"🔍 OCRテスト: {image_path}")
+    profile = load_profile(profile_name, profile_file)
+    click.echo(f"🔍 OCRテスト: {image_path}（プロファイル: {profile.name}）")
     
     try:
-        ocr = SushidaOCR(debug=True)
+        ocr = SushidaOCR(debug=True, auto_crop=not no_auto_crop, settings=profile.ocr)
         
         if not ocr.test_ocr_setup():
             click.echo("❌ OCRセットアップに問題があります", err=True)
@@ -250,8 +918,9 @@ def test(image_path: Path):
         click.echo("抽出されたテキスト:")
         click.echo(text)
         click.echo("=" * 50)
+        click.echo(f"⏱️  処理時間: {ocr.format_stage_timings()}")
         
-        parser = SushidaResultParser()
+        parser = SushidaResultParser(settings=profile.parser)
         result = parser.parse(text)
         
         if result:
@@ -259,6 +928,22 @@ def test(image_path: Path):
             print(json.dumps(result, indent=2, ensure_ascii=False))
         else:
             click.echo("❌ パースに失敗しました")
+        
+        if expected_path:
+            with open(expected_path, 'r', encoding='utf-8') as f:
+                expected = json.load(f)
+            expected.pop('timestamp', None)
+            case = {'id': f"captured_{image_path.stem}", 'kind': 'captured', 'text': text,
+                    'expected': expected}
+            if result != expected:
+                if not xfail_reason:
+                    click.echo("❌ パース結果が期待値と違うため記録しません"
+                               "（既知の誤りとして記録する場合は --xfail-reason で理由を指定）", err=True)
+                    sys.exit(1)
+                case['xfail'] = xfail_reason
+            append_corpus_case(case)
+            click.echo(f"🧪 コーパスに追加しました: {case['id']}"
+                       + ("（期待値と違うため xfail）" if 'xfail' in case else ""))
             
     except Exception as e:
         click.echo(f"❌ エラー: {e}", err=True)
@@ -0,0 +1,146 @@
+import csv
+import json
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import click
+
+from .stats import to_record
+from .storage import iter_score_files
+from .utils import is_score_file
+
+# 固定スキーマ（列名, 型）。courseはParquetでは辞書エンコードのカテゴリ列になる
+EXPORT_SCHEMA: Tuple[Tuple[str, str], ...] = (
+    ('date', 'string'),
+    ('course', 'category'),
+    ('result', 'int32'),
+    ('payed', 'int32'),
+    ('gain', 'int32'),
+    ('correct', 'int32'),
+    ('avarageTPS', 'float64'),
+    ('miss', 'int32'),
+    ('file', 'string'),
+)
+EXPORT_COLUMNS = [name for name, _ in EXPORT_SCHEMA]
+
+DEFAULT_BATCH_SIZE = 4096
+
+
+def _iter_json_files(sources: Sequence[Path], since: Optional[str] = None,
+                     until: Optional[str] = None) -> Iterator[Path]:
+    """入力パスからJSONファイルを順に列挙
+
+    ディレクトリは直下と年/月のパーティションを走査し、期間外の月のパーティションは開かない
+    """
+    for source in sources:
+        if source.is_dir():
+            yield from iter_score_files(source, since, until)
+        elif is_score_file(source.name):
+            yield source
+
+
+def iter_export_rows(
+    sources: Sequence[Path],
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    courses: Optional[Iterable[str]] = None,
+) -> Iterator[tuple]:
+    """スコアJSONをストリームで読み込み、フィルタ済みの行タプルを返す"""
+    course_filter = set(courses) if courses else None
+
+    for path in _iter_json_files(sources, since, until):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            if not isinstance(item, dict) or 'typing' not in item:
+                continue
+            record = to_record(item, path.name, path.stat().st_mtime)
+            # 日付は撮影時刻（なければファイル名、それもなければ更新日時）で判定する
+            if (since and record[0] < since) or (until and record[0] > until):
+                continue
+            if course_filter is not None and record[1] not in course_filter:
+                continue
+            yield record + (path.stem,)
+
+
+def iter_column_batches(rows: Iterable[tuple], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[list]]:
+    """行タプルを列方向のバッチにまとめる（Parquet用）"""
+    batch: List[tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield [list(column) for column in zip(*batch)]
+            batch = []
+    if batch:
+        yield [list(column) for column in zip(*batch)]
+
+
+def write_csv(rows: Iterable[tuple], output_path: Path) -> int:
+    """行タプルをそのままCSVに書き出し、書き込んだ行数を返す"""
+    total = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            total += 1
+    return total
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    types = {
+        'string': pa.string(),
+        'category': pa.dictionary(pa.int8(), pa.string()),
+        'int32': pa.int32(),
+        'float64': pa.float64(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in EXPORT_SCHEMA])
+
+
+def write_parquet(batches: Iterable[List[list]], output_path: Path) -> int:
+    """列バッチをParquetに書き出し（pyarrowが利用可能な場合）"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        click.echo("⚠️  pyarrowがインストールされていません。pip install pyarrowでインストールしてください。", err=True)
+        raise
+
+    schema = _arrow_schema()
+    total = 0
+    with pq.ParquetWriter(str(output_path), schema) as writer:
+        for columns in batches:
+            arrays = []
+            for (name, kind), values in zip(EXPORT_SCHEMA, columns):
+                if kind == 'category':
+                    arrays.append(pa.array(values, type=pa.string()).dictionary_encode()
+                                  .cast(schema.field(name).type))
+                else:
+                    arrays.append(pa.array(values, type=schema.field(name).type))
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            total += len(columns[0])
+    return total
+
+
+def export_scores(
+    sources: Sequence[Path],
+    output_path: Path,
+    output_format: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    courses: Optional[Iterable[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """スコアを読み込んでCSV/Parquetに一括出力"""
+    rows = iter_export_rows(sources, since=since, until=until, courses=courses)
+    if output_format == 'parquet':
+        return write_parquet(iter_column_batches(rows, batch_size), output_path)
+    return write_csv(rows, output_path)
+
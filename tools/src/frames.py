@@ -0,0 +1,176 @@
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# スロット1つの既定サイズ（ゲーム画面を切り出した後のBGR画像が収まる大きさ）
+DEFAULT_SLOT_BYTES = 8 * 1024 * 1024
+
+
+class FrameRef(NamedTuple):
+    """共有メモリ上のフレームの参照（プロセス間ではこれだけを送る）
+
+    inline はスロットに収まらない画像を通常のpickleで送る場合にだけ使う
+    """
+    slot: int
+    shape: Tuple[int, ...]
+    dtype: str
+    inline: Optional[np.ndarray] = None
+
+
+class SharedFramePool:
+    """再利用する共有メモリバッファのプール（生成したプロセスが所有する）
+
+    acquire → store でフレームを書き込み、読み手の処理が終わったら release でスロットを返す。
+    空きスロットがない場合 acquire は待つため、プールの大きさが処理中フレーム数の上限になる。
+    """
+
+    def __init__(self, slots: int = 4, slot_bytes: int = DEFAULT_SLOT_BYTES):
+        self.slot_bytes = slot_bytes
+        self.blocks: List[shared_memory.SharedMemory] = []
+        self._free: 'queue.Queue[int]' = queue.Queue()
+        try:
+            for index in range(max(1, slots)):
+                self.blocks.append(shared_memory.SharedMemory(create=True, size=slot_bytes))
+                self._free.put(index)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def names(self) -> List[str]:
+        """読み手のプロセスに渡す共有メモリ名"""
+        return [block.name for block in self.blocks]
+
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        """空きスロットを取得（空きがなければ待つ）"""
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("共有メモリの空きスロットを取得できませんでした")
+
+    def release(self, slot: int):
+        """読み手の処理が終わったスロットを返却"""
+        if slot >= 0:
+            self._free.put(slot)
+
+    def view(self, ref: FrameRef) -> np.ndarray:
+        """スロットの内容をコピーせずに参照するndarray"""
+        return np.ndarray(ref.shape, dtype=ref.dtype, buffer=self.blocks[ref.slot].buf)
+
+    def store(self, frame: np.ndarray, timeout: Optional[float] = None) -> FrameRef:
+        """フレームを空きスロットに書き込んで参照を返す
+
+        スロットより大きいフレームはスロットを使わず inline で送る（slot=-1）
+        """
+        if frame.nbytes > self.slot_bytes:
+            return FrameRef(-1, frame.shape, frame.dtype.str, np.ascontiguousarray(frame))
+        slot = self.acquire(timeout)
+        ref = FrameRef(slot, frame.shape, frame.dtype.str)
+        np.copyto(self.view(ref), frame)
+        return ref
+
+    def close(self):
+        """全スロットを解放（所有者のプロセスで1回だけ呼ぶ）"""
+        for block in self.blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self.blocks = []
+
+
+class FrameReader:
+    """読み手のプロセスで共有メモリに接続し、フレームをコピーなしで参照する"""
+
+    def __init__(self, names: List[str]):
+        self.blocks = [shared_memory.SharedMemory(name=name) for name in names]
+
+    def view(self, ref: FrameRef) -> np.ndarray:
+        """フレームの参照（返却後は内容が上書きされるため、処理が終わるまでだけ使う）"""
+        if ref.inline is not None:
+            return ref.inline
+        array = np.ndarray(ref.shape, dtype=ref.dtype, buffer=self.blocks[ref.slot].buf)
+        # 読み手からの書き込みは所有者のデータを壊すので禁止する
+        array.flags.writeable = False
+        return array
+
+    def close(self):
+        """接続を閉じる（unlinkは所有者が行う）"""
+        for block in self.blocks:
+            block.close()
+        self.blocks = []
+
+
+def _handoff_worker(names: Optional[List[str]], tasks, done):
+    """ベンチマーク用の読み手: フレームの1画素目に触れてスロット番号を返す"""
+    reader = FrameReader(names) if names else None
+    try:
+        while True:
+            item = tasks.get()
+            if item is None:
+                return
+            frame = reader.view(item) if reader else item
+            done.put((item.slot if reader else -1, int(frame.flat[0])))
+            del frame
+    finally:
+        if reader:
+            reader.close()
+
+
+def benchmark_handoff(shape: Tuple[int, ...] = (1080, 1920, 3), frames: int = 200,
+                      workers: int = 2, slots: int = 8) -> Dict[str, Dict[str, float]]:
+    """フレームをワーカープロセスに渡すコストを pickle と共有メモリで比較
+
+    戻り値: 方式ごとの {'total_seconds', 'per_frame_ms', 'frames_per_second'}
+    """
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    results: Dict[str, Dict[str, float]] = {}
+
+    for method in ('pickle', 'shared_memory'):
+        pool = SharedFramePool(slots, frame.nbytes) if method == 'shared_memory' else None
+        tasks: 'multiprocessing.Queue' = multiprocessing.Queue()
+        done: 'multiprocessing.Queue' = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_handoff_worker,
+                                    args=(pool.names if pool else None, tasks, done), daemon=True)
+            for _ in range(max(1, workers))
+        ]
+        for process in processes:
+            process.start()
+
+        # 読み手の返却を受けてスロットを戻す（共有メモリの場合のみ意味がある）
+        def collect():
+            for _ in range(frames):
+                slot, _ = done.get()
+                if pool:
+                    pool.release(slot)
+
+        try:
+            collector = threading.Thread(target=collect, daemon=True)
+            started = time.perf_counter()
+            collector.start()
+            for _ in range(frames):
+                tasks.put(pool.store(frame) if pool else frame)
+            collector.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            for _ in processes:
+                tasks.put(None)
+            for process in processes:
+                process.join()
+            if pool:
+                pool.close()
+
+        results[method] = {
+            'total_seconds': elapsed,
+            'per_frame_ms': elapsed / frames * 1000,
+            'frames_per_second': frames / elapsed if elapsed else 0.0,
+        }
+    return results
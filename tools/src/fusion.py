@@ -0,0 +1,150 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import click
+import numpy as np
+
+from .ocr import SushidaOCR
+from .parser import SushidaResultParser
+from .profiles import OCRSettings
+
+# 前処理バリアント（二値化方式, プロファイルの target_width に対するリサイズ幅の倍率）。先頭ほど優先度が高い
+VARIANT_SCALES: Tuple[Tuple[str, float], ...] = (
+    ('adaptive', 1.0),
+    ('otsu', 1.0),
+    ('adaptive', 4 / 3),
+    ('otsu', 4 / 3),
+    ('adaptive', 0.75),
+    ('otsu', 5 / 3),
+)
+
+# 投票の単位と、パース結果からの取り出し方
+# コースと支払額は対応しているため組で投票する（別々に多数決すると食い違った組み合わせになりうる）
+VOTE_GROUPS = {
+    ('course', 'paid'): lambda r: (r['course'], r['detail']['payed']),
+    ('gain',): lambda r: (r['detail']['gain'],),
+    ('correct',): lambda r: (r['typing']['correct'],),
+    ('avarageTPS',): lambda r: (r['typing']['avarageTPS'],),
+    ('miss',): lambda r: (r['typing']['miss'],),
+}
+
+
+def preprocess_variants(settings: OCRSettings) -> Tuple[Tuple[str, int], ...]:
+    """プロファイルの設定から前処理バリアント（二値化方式, リサイズ幅）を求める（balancedでは幅1200〜2000）"""
+    variants: List[Tuple[str, int]] = []
+    for threshold, scale in VARIANT_SCALES:
+        variant = (threshold, int(round(settings.target_width * scale)))
+        if variant not in variants:
+            variants.append(variant)
+    return tuple(variants)
+
+
+class FusionExtractor:
+    """複数の前処理バリアントを並列にOCRし、フィールド単位の多数決で結果を統合するクラス"""
+
+    def __init__(self, ocr: SushidaOCR, parser: SushidaResultParser,
+                 initial_variants: int = 3, step: int = 2,
+                 max_variants: Optional[int] = None,
+                 min_agreement: float = 0.6):
+        self.ocr = ocr
+        self.parser = parser
+        # 前処理の他の設定（ノイズ除去・二値化のパラメータ）も ocr のプロファイルのものを使う
+        self.variants = preprocess_variants(ocr.settings)
+        self.initial_variants = max(1, initial_variants)
+        self.step = max(1, step)
+        self.max_variants = min(max_variants or len(self.variants), len(self.variants))
+        self.min_agreement = min_agreement
+
+    def _run_variant(self, img: np.ndarray, variant: Tuple[str, int]) -> Optional[Tuple[Dict, Dict]]:
+        threshold, target_width = variant
+        processed = self.ocr.preprocess_array(img, threshold=threshold, target_width=target_width)
+        text = self.ocr.ocr_image(processed)
+        if not text.strip():
+            return None
+        provenance: Dict = {}
+        parsed = self.parser.parse(text, provenance)
+        return (parsed, provenance) if parsed else None
+
+    @staticmethod
+    def vote(parsed_results: List[Tuple[Dict, Dict]]) -> Tuple[Dict, Dict[str, Dict]]:
+        """フィールド（コースと支払額は組）ごとに多数決を取り、採用値と取得元情報を返す
+
+        信頼度は「一致率 × 採用値に投票したバリアントの最大のパース信頼度」とする。
+        全バリアントがデフォルト値で一致しても信頼度が上がらないようにするため。
+        """
+        values: Dict = {}
+        provenance: Dict[str, Dict] = {}
+        for fields, getter in VOTE_GROUPS.items():
+            # Counterは挿入順を保つので、同数の場合は優先度の高いバリアントの値が残る
+            counts = Counter(getter(parsed) for parsed, _ in parsed_results)
+            value, count = counts.most_common(1)[0]
+            agreement = count / len(parsed_results)
+            voters = [prov for parsed, prov in parsed_results if getter(parsed) == value]
+            for field, field_value in zip(fields, value):
+                parse_confidence = max(prov.get(field, {}).get('confidence', 0.0) for prov in voters)
+                values[field] = field_value
+                provenance[field] = {
+                    'source': 'fusion:vote',
+                    'confidence': round(agreement * parse_confidence, 3),
+                    'agreement': round(agreement, 3),
+                }
+        return values, provenance
+
+    def _needs_more(self, provenance: Dict[str, Dict], voters: int) -> bool:
+        if voters < 2:
+            return True
+        return any(item['agreement'] < self.min_agreement for item in provenance.values())
+
+    def extract(self, image_path: Union[str, Path]) -> Tuple[Optional[Dict], Dict[str, Dict], int]:
+        """画像からフィールド単位で統合した結果を抽出
+
+        戻り値: (パース結果, フィールドごとの取得元情報（一致率を含む）, 実行したバリアント数)
+        """
+        return self.extract_array(self.ocr.load_image(image_path))
+
+    def extract_array(self, img: np.ndarray) -> Tuple[Optional[Dict], Dict[str, Dict], int]:
+        """読み込み済みの画像からフィールド単位で統合した結果を抽出"""
+        parsed_results: List[Tuple[Dict, Dict]] = []
+        used = 0
+        batch_size = self.initial_variants
+
+        with ThreadPoolExecutor(max_workers=self.max_variants) as executor:
+            while used < self.max_variants:
+                variants = self.variants[used:used + batch_size]
+                used += len(variants)
+                # map は投入順に結果を返すのでバリアントの優先順位が保たれる
+                for parsed in executor.map(lambda v: self._run_variant(img, v), variants):
+                    if parsed:
+                        parsed_results.append(parsed)
+
+                if parsed_results:
+                    _, provenance = self.vote(parsed_results)
+                    if not self._needs_more(provenance, len(parsed_results)):
+                        break
+                batch_size = self.step
+
+        if not parsed_results:
+            return None, {}, used
+
+        values, provenance = self.vote(parsed_results)
+        result = {
+            "course": values['course'],
+            "result": values['gain'] - values['paid'],
+            "detail": {
+                "payed": values['paid'],
+                "gain": values['gain']
+            },
+            "typing": {
+                "correct": values['correct'],
+                "avarageTPS": values['avarageTPS'],
+                "miss": values['miss']
+            }
+        }
+
+        if self.ocr.debug:
+            click.echo(f"🔍 デバッグ: 統合バリアント数={used}, 取得元={provenance}")
+
+        return result, provenance, used
+
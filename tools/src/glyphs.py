@@ -0,0 +1,341 @@
+import hashlib
+import json
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_DIGIT_MODEL_PATH = Path(__file__).resolve().parent / 'data' / 'digits.npz'
+
+# 数値を読み取るフィールド（provenanceのフィールド名と同じ）
+DIGIT_FIELDS = ('gain', 'paid', 'correct', 'avarageTPS', 'miss')
+# 小数点を含むフィールド
+DECIMAL_FIELDS = ('avarageTPS',)
+
+# 正規化後のグリフの大きさ（幅, 高さ）
+GLYPH_SIZE = (10, 14)
+# 最も高いグリフに対してこの比率未満の高さの連結成分は区切り記号（, .）とみなす
+PUNCTUATION_HEIGHT_RATIO = 0.5
+# これ未満の面積の連結成分はノイズとして捨てる
+MIN_COMPONENT_AREA = 3
+# クラスごとに保持するテンプレート数の上限（k-NNの計算量を抑える）
+MAX_TEMPLATES_PER_CLASS = 40
+
+
+class GlyphBox(NamedTuple):
+    """連結成分の外接矩形"""
+    x: int
+    y: int
+    w: int
+    h: int
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """大津の二値化で文字を前景（255）にする（背景が暗い・明るいどちらにも対応）"""
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # 文字は領域の少数派なので、前景が過半数なら反転する
+    if np.count_nonzero(binary) * 2 > binary.size:
+        binary = cv2.bitwise_not(binary)
+    return binary
+
+
+def segment_glyphs(binary: np.ndarray) -> List[GlyphBox]:
+    """連結成分で文字を切り出し、左から順に並べる
+
+    横方向にほぼ重なる成分（かすれて分かれた線など）は1文字にまとめる
+    """
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    stats = stats[1:count]
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= MIN_COMPONENT_AREA]
+    boxes = sorted(stats[:, :4].tolist())
+    merged: List[List[int]] = []
+    for x, y, w, h in boxes:
+        if merged:
+            mx, my, mw, mh = merged[-1]
+            overlap = min(mx + mw, x + w) - max(mx, x)
+            if overlap > 0.5 * min(mw, w):
+                right, bottom = max(mx + mw, x + w), max(my + mh, y + h)
+                merged[-1] = [min(mx, x), min(my, y), right - min(mx, x), bottom - min(my, y)]
+                continue
+        merged.append([x, y, w, h])
+    return [GlyphBox(*box) for box in merged]
+
+
+def glyph_vectors(binary: np.ndarray, boxes: Sequence[GlyphBox]) -> np.ndarray:
+    """グリフを縦横比を保って正規化し、単位長のベクトルにまとめる（N x 幅*高さ）"""
+    width, height = GLYPH_SIZE
+    vectors = np.zeros((len(boxes), width * height), dtype=np.float32)
+    for index, (x, y, w, h) in enumerate(boxes):
+        crop = binary[y:y + h, x:x + w]
+        # 「1」のような細い文字が横に引き伸ばされないように、高さに合わせて左右に余白を足す
+        side = max(w, int(round(h * width / height)))
+        canvas = np.zeros((h, side), dtype=np.uint8)
+        offset = (side - w) // 2
+        canvas[:, offset:offset + w] = crop
+        vectors[index] = cv2.resize(canvas, GLYPH_SIZE, interpolation=cv2.INTER_AREA).ravel()
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class DigitReading(NamedTuple):
+    """フィールド1つ分の読み取り結果"""
+    text: str
+    confidence: float
+
+
+class DigitModel:
+    """ゲームのフォントの数字テンプレートに対するk近傍法の認識器
+
+    templates は単位長に正規化したグリフのベクトル、fields はゲーム画面に対する
+    各フィールドの範囲（比率: x, y, 幅, 高さ）
+    """
+
+    def __init__(self, templates: np.ndarray, labels: np.ndarray,
+                 fields: Dict[str, Tuple[float, float, float, float]],
+                 reject_distance: float, k: int = 3):
+        self.templates = np.ascontiguousarray(templates, dtype=np.float32)
+        self.labels = np.asarray(labels)
+        self.fields = dict(fields)
+        self.reject_distance = reject_distance
+        self.k = max(1, min(k, len(self.labels)))
+
+    @property
+    def fingerprint(self) -> str:
+        """テンプレートと設定から求めた識別子（学習し直すと変わる）"""
+        digest = hashlib.sha256(self.templates.tobytes())
+        digest.update(self.labels.astype('<U1').tobytes())
+        digest.update(json.dumps([self.fields, self.reject_distance, self.k],
+                                 sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()[:12]
+
+    def classify(self, vectors: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """各グリフの文字と最近傍テンプレートまでの距離"""
+        if not len(vectors):
+            return [], np.zeros(0, dtype=np.float32)
+        # 単位ベクトルどうしの二乗距離は 2 - 2 * 内積
+        distances = np.maximum(2.0 - 2.0 * vectors @ self.templates.T, 0.0)
+        if self.k == 1:
+            nearest = distances.argmin(axis=1)[:, None]
+        else:
+            nearest = np.argpartition(distances, self.k - 1, axis=1)[:, :self.k]
+            order = np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1)
+            nearest = np.take_along_axis(nearest, order, axis=1)
+        # k近傍の多数決（近い順に並べてあるので、同数なら近い方が選ばれる）
+        neighbor_labels = self.labels[nearest]
+        votes = (neighbor_labels[:, :, None] == neighbor_labels[:, None, :]).sum(axis=2)
+        winners = neighbor_labels[np.arange(len(vectors)), votes.argmax(axis=1)]
+        return winners.tolist(), np.sqrt(distances[np.arange(len(vectors)), nearest[:, 0]])
+
+    def read(self, gray: np.ndarray, decimal: bool = False) -> Optional[DigitReading]:
+        """フィールドの範囲のグレースケール画像から数字列を読み取る
+
+        テンプレートから遠いグリフ（「円」「回」などの文字）で区切られた中で、最も長い数字の並びを採用する
+        """
+        binary = binarize(gray)
+        boxes = segment_glyphs(binary)
+        if not boxes:
+            return None
+        digit_height = max(box.h for box in boxes)
+        glyphs = [box for box in boxes if box.h >= PUNCTUATION_HEIGHT_RATIO * digit_height]
+        chars, distances = self.classify(glyph_vectors(binary, glyphs))
+        accepted = {box: (char, distance) for box, char, distance in zip(glyphs, chars, distances)
+                    if distance <= self.reject_distance}
+
+        runs: List[List[Tuple[str, float]]] = [[]]
+        baseline = max(box.y + box.h for box in glyphs)
+        for box in boxes:
+            if box in accepted:
+                runs[-1].append(accepted[box])
+            elif box.h < PUNCTUATION_HEIGHT_RATIO * digit_height:
+                # 下端が数字の下端にそろう小さな成分は小数点（整数のフィールドでは桁区切りとして読み飛ばす）
+                if decimal and runs[-1] and box.y + box.h >= baseline - 0.2 * digit_height:
+                    runs[-1].append(('.', 0.0))
+            else:
+                runs.append([])
+
+        best = max(runs, key=lambda run: sum(1 for char, _ in run if char != '.'))
+        text = ''.join(char for char, _ in best).strip('.')
+        if not text or text.count('.') > 1:
+            return None
+        worst = float(max(distance for _, distance in best))
+        confidence = round(0.95 - 0.45 * worst / self.reject_distance, 2) if self.reject_distance else 0.95
+        return DigitReading(text, confidence)
+
+    def crop_field(self, gray: np.ndarray, field: str) -> np.ndarray:
+        """ゲーム画面からフィールドの範囲を切り出す"""
+        height, width = gray.shape[:2]
+        x, y, w, h = self.fields[field]
+        return gray[int(height * y):int(height * (y + h)), int(width * x):int(width * (x + w))]
+
+    def read_fields(self, img: np.ndarray) -> Dict[str, DigitReading]:
+        """ゲーム画面（BGR）から学習済みの全フィールドを読み取る（読めなかったフィールドは含めない）"""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        readings = {}
+        for field in self.fields:
+            crop = self.crop_field(gray, field)
+            if not crop.size:
+                continue
+            reading = self.read(crop, decimal=field in DECIMAL_FIELDS)
+            if reading:
+                readings[field] = reading
+        return readings
+
+    def save(self, path: Path):
+        """テンプレートとフィールドの範囲を .npz に保存"""
+        names = list(self.fields)
+        np.savez_compressed(
+            path,
+            templates=self.templates,
+            labels=self.labels.astype('<U1'),
+            field_names=np.array(names, dtype='<U32'),
+            field_rois=np.array([self.fields[name] for name in names], dtype=np.float64).reshape(-1, 4),
+            reject_distance=np.float64(self.reject_distance),
+            k=np.int64(self.k),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> 'DigitModel':
+        with np.load(path) as data:
+            fields = {str(name): tuple(float(v) for v in roi)
+                      for name, roi in zip(data['field_names'], data['field_rois'])}
+            return cls(data['templates'], data['labels'], fields,
+                       float(data['reject_distance']), int(data['k']))
+
+
+@lru_cache(maxsize=4)
+def _load_model_cached(path: str, mtime_ns: int) -> DigitModel:
+    return DigitModel.load(Path(path))
+
+
+def load_digit_model(path: Path = DEFAULT_DIGIT_MODEL_PATH) -> Optional[DigitModel]:
+    """学習済みの数字モデルを読み込み（ファイルがなければNone、変わらない限り読み込みは1回だけ）"""
+    path = Path(path)
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _load_model_cached(str(path.resolve()), mtime_ns)
+
+
+def field_label(result: Dict, field: str) -> str:
+    """スコアJSONから画面に表示される数字列を取り出す（学習用の正解ラベル）"""
+    if field == 'gain':
+        return str(result['detail']['gain'])
+    if field == 'paid':
+        return str(result['detail']['payed'])
+    value = result['typing'][field]
+    return f"{float(value):.1f}" if field in DECIMAL_FIELDS else str(int(value))
+
+
+class TrainingReport(NamedTuple):
+    """学習結果の要約（samples: 学習に使ったフィールド数, skipped: 使えなかったフィールド数）"""
+    samples: int
+    skipped: int
+    class_counts: Dict[str, int]
+    accuracy: float
+    field_ms: float
+
+
+def _build_model(vectors: np.ndarray, labels: np.ndarray,
+                 fields: Dict[str, Tuple[float, float, float, float]], k: int) -> DigitModel:
+    """学習サンプルからテンプレートを選び、棄却距離を決めてモデルを作る"""
+    # クラスごとのテンプレート数を制限（平均に近いものから残す）
+    keep = []
+    for label in sorted(set(labels.tolist())):
+        indices = np.flatnonzero(labels == label)
+        centroid = vectors[indices].mean(axis=0)
+        order = np.argsort(np.linalg.norm(vectors[indices] - centroid, axis=1))
+        keep.extend(indices[order[:MAX_TEMPLATES_PER_CLASS]])
+    keep = np.array(sorted(keep))
+    templates, template_labels = vectors[keep], labels[keep]
+
+    # 他のクラスのテンプレートまでの最短距離の半分を、未知の文字を棄却する距離にする
+    distances = np.sqrt(np.maximum(2.0 - 2.0 * templates @ templates.T, 0.0))
+    different = template_labels[:, None] != template_labels[None, :]
+    reject_distance = float(distances[different].min() / 2) if different.any() else 0.5
+    # ただし同じクラスの中で最も遠いサンプルまでは受け入れる
+    for label in set(template_labels.tolist()):
+        within = np.sqrt(np.maximum(
+            2.0 - 2.0 * vectors[labels == label] @ templates[template_labels == label].T, 0.0))
+        reject_distance = max(reject_distance, float(within.min(axis=1).max()) * 1.1)
+
+    return DigitModel(templates, template_labels, fields, reject_distance, k=k)
+
+
+def train_digit_model(examples: Iterable[Tuple[np.ndarray, Dict]],
+                      fields: Dict[str, Tuple[float, float, float, float]],
+                      k: int = 3) -> Tuple[DigitModel, TrainingReport]:
+    """正解のスコアが分かっている画面からフィールドを切り出して数字テンプレートを学習
+
+    examples: (ゲーム画面のBGR画像, スコアJSON) の並び。
+    まずグリフ数が正解の桁数と一致したフィールドで学習し、そのモデルで「円」「回」などの
+    余分なグリフを含むフィールドの中から正解と一致する並びを探して学習に加える。
+    """
+    vectors: List[np.ndarray] = []
+    labels: List[str] = []
+    # (グリフのベクトル, 正解の数字列) のうち、グリフが多すぎて位置を決められなかったもの
+    pending: List[Tuple[np.ndarray, str]] = []
+    crops: List[Tuple[np.ndarray, bool, str]] = []
+    used = skipped = 0
+    for img, result in examples:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        height, width = gray.shape[:2]
+        for field, (x, y, w, h) in fields.items():
+            crop = gray[int(height * y):int(height * (y + h)), int(width * x):int(width * (x + w))]
+            try:
+                label = field_label(result, field)
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            expected = label.replace('.', '')
+            boxes: List[GlyphBox] = []
+            if crop.size:
+                binary = binarize(crop)
+                boxes = segment_glyphs(binary)
+            if boxes:
+                digit_height = max(box.h for box in boxes)
+                boxes = [box for box in boxes if box.h >= PUNCTUATION_HEIGHT_RATIO * digit_height]
+            if len(boxes) < len(expected):
+                skipped += 1
+                continue
+            if len(boxes) == len(expected):
+                vectors.append(glyph_vectors(binary, boxes))
+                labels.extend(expected)
+                used += 1
+            else:
+                pending.append((glyph_vectors(binary, boxes), expected))
+            crops.append((crop, field in DECIMAL_FIELDS, label))
+
+    if not labels:
+        raise ValueError("学習に使えるフィールドがありません（範囲の指定と正解のスコアを確認してください）")
+
+    model = _build_model(np.concatenate(vectors), np.array(labels), fields, k)
+    if pending:
+        for glyphs, expected in pending:
+            chars, _ = model.classify(glyphs)
+            predicted = ''.join(chars)
+            start = predicted.find(expected)
+            if start < 0:
+                skipped += 1
+                continue
+            vectors.append(glyphs[start:start + len(expected)])
+            labels.extend(expected)
+            used += 1
+        model = _build_model(np.concatenate(vectors), np.array(labels), fields, k)
+
+    # 学習に使ったフィールドを読み直して、正解率と1フィールドあたりの処理時間を測る
+    correct = 0
+    started = time.perf_counter()
+    for crop, decimal, expected in crops:
+        reading = model.read(crop, decimal=decimal)
+        correct += bool(reading and reading.text == expected)
+    elapsed = time.perf_counter() - started
+
+    class_counts = {label: int((model.labels == label).sum()) for label in sorted(set(labels))}
+    report = TrainingReport(used, skipped, class_counts, correct / len(crops),
+                            elapsed / len(crops) * 1000)
+    return model, report
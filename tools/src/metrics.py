@@ -0,0 +1,241 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# 処理時間（秒）のヒストグラムのバケット境界
+DEFAULT_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels: Optional[Dict[str, str]]) -> str:
+    """Prometheusのラベル表記 {key="value",...} を生成"""
+    if not labels:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in sorted(labels.items())
+    )
+    return '{' + body + '}'
+
+
+class Histogram:
+    """スレッドセーフな累積ヒストグラム（Prometheus形式で出力可能）"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+               header: bool = True) -> List[str]:
+        """Prometheusのテキスト形式の行を返す"""
+        with self._lock:
+            counts = list(self.counts)
+            total_sum, total_count = self.sum, self.count
+
+        lines = []
+        if header:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            bucket_labels = dict(labels or {}, le=le)
+            lines.append(f"{name}_bucket{format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {total_sum}")
+        lines.append(f"{name}_count{format_labels(labels)} {total_count}")
+        return lines
+
+    def to_dict(self) -> Dict:
+        """JSON出力用の辞書（バケットは非累積の件数）"""
+        with self._lock:
+            return {
+                'buckets': {
+                    ('+Inf' if bound == float('inf') else repr(bound)): count
+                    for bound, count in zip(self.buckets + (float('inf'),), self.counts)
+                },
+                'sum': round(self.sum, 6),
+                'count': self.count,
+            }
+
+
+def render_metric(name: str, metric_type: str, help_text: str, value: float,
+                  labels: Optional[Dict[str, str]] = None, header: bool = True) -> List[str]:
+    """gauge/counterの1系列をPrometheusのテキスト形式にする"""
+    lines = []
+    if header:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+    lines.append(f"{name}{format_labels(labels)} {value}")
+    return lines
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """プロセスの最大常駐メモリ（バイト）。取得できない環境ではNone"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxはキロバイト単位、macOSはバイト単位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def write_atomic(path: Path, content: str):
+    """一時ファイルに書いてから置き換える（node exporterが書きかけのファイルを読まないように）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class RunMetrics:
+    """batch実行1回分のメトリクス（Prometheusのtextfile / JSONで出力）"""
+
+    def __init__(self, job: str = 'batch'):
+        self.job = job
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.finished_seconds: Optional[float] = None
+        self.outcomes: Dict[str, int] = {'success': 0, 'failed': 0, 'skipped': 0}
+        self.failures: Dict[str, int] = {}
+        self.tiers: Dict[str, int] = {}
+        self.bytes_read = 0
+        self.image_latency = Histogram()
+        self.stage_latency: Dict[str, Histogram] = {}
+        self.stage_calls: Dict[str, int] = {}
+        # 先読みキューの待ち時間（先読みを使わない場合はNone）
+        self.prefetch: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def record_image(self, outcome: str, elapsed: float, size: int = 0,
+                     stage_seconds: Optional[Dict[str, float]] = None,
+                     reason: Optional[str] = None, tier: Optional[str] = None):
+        """画像1枚の結果を記録
+
+        stage_seconds: この画像の処理で増えた処理段階ごとの時間
+        reason: 失敗時の理由（'unsupported', 'unparsed', 'error' など）
+        """
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if reason:
+                self.failures[reason] = self.failures.get(reason, 0) + 1
+            if tier:
+                self.tiers[tier] = self.tiers.get(tier, 0) + 1
+            if outcome == 'skipped':
+                return
+            self.bytes_read += size
+            for stage in stage_seconds or {}:
+                if stage not in self.stage_latency:
+                    self.stage_latency[stage] = Histogram()
+        self.image_latency.observe(elapsed)
+        for stage, seconds in (stage_seconds or {}).items():
+            self.stage_latency[stage].observe(seconds)
+
+    def finish(self, stage_calls: Optional[Dict[str, int]] = None, prefetch: Optional[Dict] = None):
+        """実行終了時に経過時間と処理段階ごとの呼び出し回数（と先読みの待ち時間）を確定"""
+        self.finished_seconds = time.perf_counter() - self._started
+        self.stage_calls = dict(stage_calls or {})
+        self.prefetch = dict(prefetch) if prefetch is not None else None
+
+    @property
+    def duration_seconds(self) -> float:
+        if self.finished_seconds is not None:
+            return self.finished_seconds
+        return time.perf_counter() - self._started
+
+    @property
+    def processed(self) -> int:
+        return self.outcomes.get('success', 0) + self.outcomes.get('failed', 0)
+
+    @property
+    def images_per_second(self) -> float:
+        duration = self.duration_seconds
+        return self.processed / duration if duration else 0.0
+
+    def render_prometheus(self) -> str:
+        """Prometheusのtextfile形式（node exporterのtextfileコレクタ用）"""
+        job = {'job': self.job}
+        lines: List[str] = []
+        for index, (outcome, count) in enumerate(sorted(self.outcomes.items())):
+            lines += render_metric('sushida_batch_images', 'gauge', '結果別の画像数',
+                                   count, dict(job, outcome=outcome), header=index == 0)
+        for index, (reason, count) in enumerate(sorted(self.failures.items())):
+            lines += render_metric('sushida_batch_failures', 'gauge', '理由別の失敗数',
+                                   count, dict(job, reason=reason), header=index == 0)
+        for index, (tier, count) in enumerate(sorted(self.tiers.items())):
+            lines += render_metric('sushida_batch_tier_resolved', 'gauge', '処理段別の確定件数',
+                                   count, dict(job, tier=tier), header=index == 0)
+        lines += self.image_latency.render(
+            'sushida_batch_image_duration_seconds', '画像1枚あたりの処理時間', job)
+        for index, (stage, histogram) in enumerate(sorted(self.stage_latency.items())):
+            lines += histogram.render(
+                'sushida_batch_stage_duration_seconds', '画像1枚あたりの処理段階ごとの時間',
+                dict(job, stage=stage), header=index == 0)
+        for index, (stage, count) in enumerate(sorted(self.stage_calls.items())):
+            lines += render_metric('sushida_batch_stage_calls', 'gauge',
+                                   '処理段階ごとの呼び出し回数（tesseractはOCRの実行回数）',
+                                   count, dict(job, stage=stage), header=index == 0)
+        if self.prefetch is not None:
+            sides = (('reader', self.prefetch['readerWaitSeconds']), ('ocr', self.prefetch['ocrWaitSeconds']))
+            for index, (side, seconds) in enumerate(sides):
+                lines += render_metric('sushida_batch_prefetch_stall_seconds', 'gauge',
+                                       '先読みキューの待ち時間（reader: 空き待ち, ocr: 画像待ち）',
+                                       seconds, dict(job, side=side), header=index == 0)
+            lines += render_metric('sushida_batch_inline_frames', 'gauge',
+                                   '共有メモリのスロットに収まらずpickleでワーカーに送った画像の枚数',
+                                   self.prefetch.get('inlineFrames', 0), job)
+        lines += render_metric('sushida_batch_bytes_read', 'gauge', '読み込んだ画像の合計バイト数',
+                               self.bytes_read, job)
+        lines += render_metric('sushida_batch_duration_seconds', 'gauge', '実行全体の所要時間',
+                               round(self.duration_seconds, 6), job)
+        lines += render_metric('sushida_batch_images_per_second', 'gauge', '処理した画像数 / 所要時間',
+                               round(self.images_per_second, 6), job)
+        peak = peak_rss_bytes()
+        if peak is not None:
+            lines += render_metric('sushida_batch_peak_rss_bytes', 'gauge', 'プロセスの最大常駐メモリ',
+                                   peak, job)
+        lines += render_metric('sushida_batch_last_run_timestamp_seconds', 'gauge', '実行開始時刻（UNIX時間）',
+                               round(self.started_at, 3), job)
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self) -> Dict:
+        """JSONサマリー用の辞書"""
+        return {
+            'job': self.job,
+            'startedAt': datetime.fromtimestamp(self.started_at).isoformat(),
+            'durationSeconds': round(self.duration_seconds, 3),
+            'images': dict(self.outcomes, processed=self.processed),
+            'failures': dict(self.failures),
+            'tiers': dict(self.tiers),
+            'imagesPerSecond': round(self.images_per_second, 3),
+            'bytesRead': self.bytes_read,
+            'stageCalls': dict(self.stage_calls),
+            'tesseractInvocations': self.stage_calls.get('tesseract', 0),
+            'peakRssBytes': peak_rss_bytes(),
+            'imageLatency': self.image_latency.to_dict(),
+            'stageLatency': {stage: h.to_dict() for stage, h in sorted(self.stage_latency.items())},
+            'prefetch': self.prefetch,
+        }
+
+    def write_textfile(self, path: Path):
+        write_atomic(Path(path), self.render_prometheus())
+
+    def write_json(self, path: Path):
+        write_atomic(Path(path), json.dumps(self.to_dict(), indent=2, ensure_ascii=False) + '\n')
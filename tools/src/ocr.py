@@ -5,15 +5,92 @@ from PIL import Image
 from pathlib import Path
 import shutil
 import sys
-from typing import Union
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple, Union
 import click
 
+from .profiles import DEFAULT_WHITELIST, OCRSettings
+
+
+OCR_WHITELIST = DEFAULT_WHITELIST
+
+
+@lru_cache(maxsize=None)
+def build_tesseract_configs(settings: OCRSettings) -> Tuple[str, str, str]:
+    """設定から (標準, 保守的, 高速パス) のTesseract設定文字列を生成（設定ごとに1回だけ）"""
+    # より精密なTesseract設定
+    standard = f'''
+    --oem {settings.oem} 
+    --psm {settings.psm} 
+    -l {settings.language}
+    -c tessedit_char_whitelist={settings.whitelist}
+    -c tessedit_char_blacklist={settings.blacklist}
+    -c load_system_dawg=0
+    -c load_freq_dawg=0
+'''.strip()
+    
+    # より保守的な設定
+    conservative = f'''
+    --oem {settings.oem}
+    --psm {settings.conservative_psm}
+    -l {settings.language}
+    -c tessedit_char_whitelist={settings.whitelist}
+'''.strip()
+    
+    # 高速パス用の設定（軽量な前処理の画像に対して1回だけ実行する）
+    fast = f'''
+    --oem {settings.oem}
+    --psm {settings.psm}
+    -l {settings.language}
+    -c tessedit_char_whitelist={settings.whitelist}
+    -c load_system_dawg=0
+    -c load_freq_dawg=0
+'''.strip()
+    return standard, conservative, fast
+
+
+@lru_cache(maxsize=None)
+def gamma_table(gamma: float) -> np.ndarray:
+    """ガンマ補正用のルックアップテーブル（ガンマ値ごとに1回だけ生成）"""
+    inv_gamma = 1.0 / gamma
+    return np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
+
+
+STANDARD_CONFIG, CONSERVATIVE_CONFIG, FAST_CONFIG = build_tesseract_configs(OCRSettings())
+
+# 高速パスで切り出す範囲（画像サイズに対する比率: x, y, 幅, 高さ）と正規化後の幅
+FAST_ROI = OCRSettings().fast_roi
+FAST_TARGET_WIDTH = OCRSettings().fast_target_width
+
+# ゲーム画面の検出パラメータ（縮小画像の幅, 画面全体に対する面積比の範囲, 縦横比の範囲）
+LOCATE_WIDTH = 640
+GAME_AREA_RATIO = (0.03, 0.85)
+GAME_ASPECT_RANGE = (1.0, 1.9)
+# 候補の内側に面積比がこれ以上の候補があれば内側を採用する（ブラウザウィンドウ内のゲーム画面など）
+NESTED_REGION_RATIO = 0.15
+
 
 class SushidaOCR:
     """寿司打の結果画面に特化したOCRクラス"""
     
-    def __init__(self, debug: bool = False):
+    def __init__(self, debug: bool = False, auto_crop: bool = True,
+                 settings: Optional[OCRSettings] = None):
         self.debug = debug
+        # 前処理とTesseractの設定（プロファイルで変更できる）
+        self.settings = settings or OCRSettings()
+        self.standard_config, self.conservative_config, self.fast_config = \
+            build_tesseract_configs(self.settings)
+        self.gamma_table = gamma_table(self.settings.gamma)
+        # デスクトップ全体のスクリーンショットからゲーム画面を切り出すか
+        self.auto_crop = auto_crop
+        # 処理段階ごとの累積時間（秒）
+        self.stage_seconds: Dict[str, float] = {}
+        # 処理段階ごとの呼び出し回数（tesseractはOCRの実行回数）
+        self.stage_calls: Dict[str, int] = {}
+        self._stage_lock = threading.Lock()
         self.tesseract_cmd = self._find_tesseract()
         if self.tesseract_cmd:
             pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
@@ -36,17 +113,124 @@ class SushidaOCR:
                 return path
         return None
     
-    def preprocess_image(self, image_path: Union[str, Path]) -> np.ndarray:
-        """寿司打画面に特化した画像前処理（改善版）"""
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """処理段階の所要時間を stage_seconds に、呼び出し回数を stage_calls に加算"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stage_lock:
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + elapsed
+                self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+    
+    def stage_snapshot(self) -> Dict[str, float]:
+        """stage_seconds のコピー（先読みスレッドが並行して加算していても安全に読める）"""
+        with self._stage_lock:
+            return dict(self.stage_seconds)
+    
+    def load_image(self, image_path: Union[str, Path], crop: bool = True) -> np.ndarray:
+        """画像ファイルを読み込み（auto_cropが有効かつcropならゲーム画面を切り出す）"""
         image_path = Path(image_path)
         
         if not image_path.exists():
             raise FileNotFoundError(f"画像ファイルが見つかりません: {image_path}")
         
-        # 画像読み込み
-        img = cv2.imread(str(image_path))
+        with self.timed('decode'):
+            img = cv2.imread(str(image_path))
         if img is None:
             raise ValueError(f"画像を読み込めません: {image_path}")
+        return self.crop_to_game(img) if crop else img
+    
+    def decode_image(self, data: bytes, crop: bool = True) -> np.ndarray:
+        """メモリ上の画像データ（PNG/JPEG等）をデコード（auto_cropが有効かつcropならゲーム画面を切り出す）"""
+        with self.timed('decode'):
+            img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("画像データをデコードできません")
+        return self.crop_to_game(img) if crop else img
+    
+    def locate_game_region(self, img: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """縮小画像のエッジ・輪郭からゲーム画面の矩形 (x, y, 幅, 高さ) を推定
+        
+        候補が見つからない場合や、画像の大部分を占める（切り出し済みの）場合はNoneを返す
+        """
+        height, width = img.shape[:2]
+        scale = min(1.0, LOCATE_WIDTH / width)
+        small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else img
+        
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        edges = cv2.Canny(gray, 50, 150)
+        edges = cv2.dilate(edges, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)))
+        contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        
+        frame_area = small.shape[0] * small.shape[1]
+        min_area, max_area = (ratio * frame_area for ratio in GAME_AREA_RATIO)
+        candidates = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            area = w * h
+            if not (min_area <= area <= max_area):
+                continue
+            if not (GAME_ASPECT_RANGE[0] <= w / h <= GAME_ASPECT_RANGE[1]):
+                continue
+            # 輪郭が外接矩形をほぼ埋めている（＝矩形の枠）ものだけを候補にする
+            if cv2.contourArea(contour) < 0.8 * area:
+                continue
+            candidates.append((x, y, w, h))
+        
+        if not candidates:
+            return None
+        
+        # 大きい順に見ていき、現在の候補の内側にある十分大きな矩形があればそちらに絞り込む
+        candidates.sort(key=lambda box: box[2] * box[3], reverse=True)
+        best = candidates[0]
+        for box in candidates[1:]:
+            bx, by, bw, bh = best
+            x, y, w, h = box
+            inside = x >= bx and y >= by and x + w <= bx + bw and y + h <= by + bh
+            if inside and w * h >= NESTED_REGION_RATIO * bw * bh:
+                best = box
+        
+        # 縮小前の座標に戻す
+        x, y, w, h = (int(round(v / scale)) for v in best)
+        return x, y, min(w, width - x), min(h, height - y)
+    
+    def would_crop(self, img: np.ndarray) -> bool:
+        """切り出す前の画像 img からゲーム画面を切り出すか（auto_cropが無効ならFalse）"""
+        if not self.auto_crop:
+            return False
+        with self.timed('locate'):
+            return self.locate_game_region(img) is not None
+    
+    def crop_to_game(self, img: np.ndarray) -> np.ndarray:
+        """ゲーム画面が見つかればその範囲だけを切り出す（重いフィルタ処理の前に行う）"""
+        if not self.auto_crop:
+            return img
+        with self.timed('locate'):
+            region = self.locate_game_region(img)
+        if region is None:
+            return img
+        
+        x, y, w, h = region
+        if self.debug:
+            click.echo(f"🔍 デバッグ: ゲーム画面を検出 ({x}, {y}, {w}x{h}) / 元画像 {img.shape[1]}x{img.shape[0]}")
+        return img[y:y + h, x:x + w]
+    
+    def preprocess_image(self, image_path: Union[str, Path]) -> np.ndarray:
+        """寿司打画面に特化した画像前処理（改善版）"""
+        return self.preprocess_array(self.load_image(image_path))
+    
+    def preprocess_array(self, img: np.ndarray, threshold: str = 'adaptive',
+                         target_width: Optional[int] = None) -> np.ndarray:
+        """読み込み済みの画像を前処理
+        
+        threshold: 'adaptive'（適応的二値化）または 'otsu'（大津の二値化）
+        target_width: 省略時は設定の target_width
+        """
+        settings = self.settings
+        target_width = target_width or settings.target_width
         
         if self.debug:
             cv2.imwrite('debug_01_original.png', img)
@@ -54,7 +238,6 @@ class SushidaOCR:
         
         # 1. より積極的なリサイズ（OCR精度向上のため）
         height, width = img.shape[:2]
-        target_width = 1200  # より大きなサイズにリサイズ
         if width < target_width:
             scale = target_width / width
             new_width = int(width * scale)
@@ -71,29 +254,35 @@ class SushidaOCR:
             cv2.imwrite('debug_03_gray.png', gray)
         
         # 3. より強力なノイズ除去
-        denoised = cv2.bilateralFilter(gray, 9, 75, 75)
+        with self.timed('bilateral'):
+            denoised = cv2.bilateralFilter(gray, settings.bilateral_diameter,
+                                           settings.bilateral_sigma_color,
+                                           settings.bilateral_sigma_space)
         
         # 4. ガンマ補正でコントラストを改善
-        gamma = 1.2
-        inv_gamma = 1.0 / gamma
-        table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-        enhanced = cv2.LUT(denoised, table)
+        enhanced = cv2.LUT(denoised, self.gamma_table)
         
         if self.debug:
             cv2.imwrite('debug_04_enhanced.png', enhanced)
         
         # 5. シャープニング（文字の境界を強調）
-        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        sharpened = cv2.filter2D(enhanced, -1, kernel)
+        if settings.sharpen:
+            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+            sharpened = cv2.filter2D(enhanced, -1, kernel)
+        else:
+            sharpened = enhanced
         
-        # 6. 適応的二値化（パラメータ調整）
-        binary = cv2.adaptiveThreshold(
-            sharpened, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
-        )
+        # 6. 二値化（パラメータ調整）
+        if threshold == 'otsu':
+            _, binary = cv2.threshold(sharpened, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        else:
+            binary = cv2.adaptiveThreshold(
+                sharpened, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                cv2.THRESH_BINARY, settings.threshold_block_size, settings.threshold_c
+            )
         
         # 7. モルフォロジー処理（改善）
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (settings.morph_kernel, settings.morph_kernel))
         processed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
         
         # 8. 文字の太さを適度に調整
@@ -106,38 +295,60 @@ class SushidaOCR:
         
         return processed
     
+    def preprocess_fast(self, img: np.ndarray, roi: Optional[Tuple[float, float, float, float]] = None,
+                        target_width: Optional[int] = None) -> np.ndarray:
+        """高速パス用の軽量な前処理（ROI切り出し・縮小・大津の二値化のみ）
+        
+        roi: 画像サイズに対する比率で指定した切り出し範囲 (x, y, 幅, 高さ)。省略時は設定の fast_roi
+        """
+        roi = roi or self.settings.fast_roi
+        target_width = target_width or self.settings.fast_target_width
+        height, width = img.shape[:2]
+        x, y, roi_width, roi_height = roi
+        crop = img[int(height * y):int(height * (y + roi_height)),
+                   int(width * x):int(width * (x + roi_width))]
+        
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        
+        # 縮小はINTER_AREA、拡大は軽量なINTER_LINEARを使う
+        scale = target_width / gray.shape[1]
+        if scale != 1.0:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+        
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary
+    
+    def extract_text_fast(self, img: np.ndarray) -> str:
+        """高速パス: 軽量な前処理とTesseract 1回のみでテキスト抽出"""
+        text = self.ocr_image(self.preprocess_fast(img), self.fast_config)
+        if self.debug:
+            click.echo(f"🔍 抽出されたテキスト (高速パス):\n{text}")
+        return text.strip()
+    
     def extract_text(self, image_path: Union[str, Path]) -> str:
         """OCRでテキスト抽出（改善版）"""
+        return self.extract_text_array(self.load_image(image_path))
+    
+    def extract_text_array(self, img: np.ndarray) -> str:
+        """読み込み済みの画像からOCRでテキスト抽出"""
+        return self.extract_text_processed(self.preprocess_array(img))
+    
+    def extract_text_processed(self, processed_img: np.ndarray) -> str:
+        """preprocess_array 相当の前処理済みの画像からOCRでテキスト抽出"""
         try:
-            processed_img = self.preprocess_image(image_path)
-            
-            # より精密なTesseract設定
-            custom_config = r'''
-                --oem 1 
-                --psm 6 
-                -l jpn
-                -c tessedit_char_whitelist=0123456789お手軽普通高級円コースゲット払って損でした正しく打ったキーの数平均ミスタイプ回秒/×、。・-+,
-                -c tessedit_char_blacklist=|Il
-                -c load_system_dawg=0
-                -c load_freq_dawg=0
-            '''.strip()
-            
             # 複数回OCRを実行して最も確実な結果を取得
             results = []
             
             # 1回目: 標準設定
-            text1 = pytesseract.image_to_string(processed_img, config=custom_config)
+            text1 = self.ocr_image(processed_img, self.standard_config)
             results.append(text1)
             
-            # 2回目: より保守的な設定
-            conservative_config = r'''
-                --oem 1
-                --psm 8
-                -l jpn
-                -c tessedit_char_whitelist=0123456789お手軽普通高級円コースゲット払って損でした正しく打ったキーの数平均ミスタイプ回秒/×、。・-+,
-            '''.strip()
-            text2 = pytesseract.image_to_string(processed_img, config=conservative_config)
-            results.append(text2)
+            # 2回目: より保守的な設定（プロファイルで無効にできる）
+            text2 = ''
+            if self.settings.second_pass:
+                text2 = self.ocr_image(processed_img, self.conservative_config)
+                results.append(text2)
             
             # 最も長いテキストを選択（通常はより多くの情報を含む）
             text = max(results, key=len)
@@ -155,6 +366,16 @@ class SushidaOCR:
                 click.echo(f"❌ OCRエラー: {e}", err=True)
             raise
     
+    def ocr_image(self, processed_img: np.ndarray, config: Optional[str] = None) -> str:
+        """前処理済み画像に対してTesseractを1回実行（configの省略時は標準設定）"""
+        with self.timed('tesseract'):
+            return pytesseract.image_to_string(processed_img, config=config or self.standard_config)
+    
+    def format_stage_timings(self) -> str:
+        """処理段階ごとの累積時間を表示用に整形"""
+        return ", ".join(f"{stage} {seconds * 1000:.1f}ms"
+                         for stage, seconds in self.stage_seconds.items())
+    
     def test_ocr_setup(self) -> bool:
         """OCRセットアップをテスト"""
         try:
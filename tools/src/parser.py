@@ -3,39 +3,100 @@ from datetime import datetime
 from typing import Dict, Optional, Union
 import click
 
+from .profiles import ParserSettings
+
+# 値の取得元の種類ごとの信頼度
+SOURCE_CONFIDENCE = {
+    'pattern': 0.9,    # 文脈付きの正規表現パターンにマッチ
+    'special': 0.7,    # 「35回06。20」のようなOCR崩れの特殊パターン
+    'glyph': 0.9,      # 数字テンプレートによる読み取り（通常は距離に応じた値を記録）
+    'heuristic': 0.3,  # 数値候補からの推測
+    'default': 0.0,    # 抽出できずデフォルト値を使用
+}
+
+PROVENANCE_FIELDS = ('course', 'gain', 'paid', 'correct', 'avarageTPS', 'miss')
+
+# 支払額（コースの料金）からコースを決める
+COURSE_BY_PAID = {3000: 'お手軽', 5000: '普通', 10000: '高級'}
+
+
+def record_source(provenance: Optional[Dict], field: str, source: str,
+                  confidence: Optional[float] = None):
+    """フィールドの取得元と信頼度を記録（provenanceがNoneなら何もしない）"""
+    if provenance is None:
+        return
+    kind = source.split(':', 1)[0]
+    provenance[field] = {
+        'source': source,
+        'confidence': SOURCE_CONFIDENCE[kind] if confidence is None else confidence,
+    }
+
+
+def pattern_confidence(index: int) -> float:
+    """パターンの優先順位に応じた信頼度（後ろのパターンほど緩いので下げる）"""
+    return round(max(SOURCE_CONFIDENCE['pattern'] - 0.1 * index, 0.5), 2)
+
+
+def search_before_last(pattern: str, text: str, tail: str) -> Optional[re.Match]:
+    """「.*tail」で終わるパターンを、最後のtailまでで切り詰めたテキストに対して検索
+    
+    tailがない位置から始まる試行は毎回文末まで走査するため、長いテキストで二乗時間になる。
+    最後のtailより後ろはマッチに使われないので、切り詰めても結果は変わらない。
+    """
+    end = text.rfind(tail)
+    if end < 0:
+        return None
+    return re.search(pattern, text[:end + len(tail)])
+
+
+def overall_confidence(provenance: Dict) -> float:
+    """結果全体の信頼度（最も信頼度の低いフィールドに合わせる）"""
+    if not provenance:
+        return 0.0
+    return min(provenance.get(field, {}).get('confidence', 0.0) for field in PROVENANCE_FIELDS)
+
 
 class SushidaResultParser:
     """寿司打のOCR結果をパースしてJSONデータに変換するクラス"""
     
-    def __init__(self, debug: bool = False):
+    def __init__(self, debug: bool = False, quiet: bool = False,
+                 settings: Optional[ParserSettings] = None):
         self.debug = debug
+        # quiet=True の場合は警告・エラーメッセージを表示しない（大量のテキストを検証する場合など）
+        self.quiet = quiet
+        # 値を採用する妥当な範囲（プロファイルで変更できる）
+        self.settings = settings or ParserSettings()
         # 正規表現パターンを定義（より寛容なパターンに変更）
         self.patterns = {
             'course': r'(お手軽|普通|高級|手軽)',  # "お"が抜ける場合も対応
             'gain': r'(\d+)\s*[円のお寿司をゲットゲッゲ]+',  # OCRエラーに対応
-            'paid': r'(\d+,?\d*)\s*[円コース払って]*',
-            'loss': r'(\d+,?\d*)\s*[円分損でした]*',
+            'paid': r'(\d+(?:,\d*)?)\s*[円コース払って]*',
+            'loss': r'(\d+(?:,\d*)?)\s*[円分損でした]*',
             'correct': r'[正し]*[く打った]*[キーの数]*[:\s]*(\d+)',  # より柔軟に
-            'average_tps': r'[平均]*[キータイプ数]*[:\s]*(\d+\.?\d*)',
+            'average_tps': r'[平均]*[キータイプ数]*[:\s]*(\d+(?:\.\d*)?)',
             'miss': r'[ミスタイプ数]*[:\s]*(\d+)'
         }
     
-    def parse(self, text: str) -> Optional[Dict]:
-        """OCR結果をJSONに変換"""
+    def parse(self, text: str, provenance: Optional[Dict] = None) -> Optional[Dict]:
+        """OCR結果をJSONに変換
+        
+        provenanceに辞書を渡すと、フィールドごとの取得元（source）と信頼度（confidence）が記録される
+        """
         try:
             if not text or not text.strip():
-                click.echo("❌ 抽出されたテキストが空です", err=True)
+                if not self.quiet:
+                    click.echo("❌ 抽出されたテキストが空です", err=True)
                 return None
             
             # テキストを正規化（改行、スペースの調整）
             normalized_text = self._normalize_text(text)
             
             # 各データを抽出
-            course = self._extract_course(normalized_text)
+            course = self._extract_course(normalized_text, provenance)
             # コース情報の必須チェックを削除（推測で補完するため）
             
-            gain = self._extract_gain(normalized_text)
-            paid = self._extract_paid(normalized_text)
+            gain = self._extract_gain(normalized_text, provenance)
+            paid = self._extract_paid(normalized_text, provenance)
             
             # 結果は常に計算で求める（OCRによる損失抽出は使わない）
             result = gain - paid
@@ -45,7 +106,7 @@ class SushidaResultParser:
                 click.echo(f"🔍 デバッグ: 計算結果 result = {gain} - {paid} = {result}")
             
             # タイピング統計抽出
-            typing_stats = self._extract_typing_stats(normalized_text)
+            typing_stats = self._extract_typing_stats(normalized_text, provenance)
             
             parsed_result = {
                 "course": course,
@@ -58,15 +119,55 @@ class SushidaResultParser:
             }
             
             # 基本的な検証（より寛容に）
-            if not self._validate_result(parsed_result):
+            if not self.validate_result(parsed_result) and not self.quiet:
                 click.echo("⚠️  抽出されたデータに問題がある可能性があります", err=True)
                 # 検証失敗でもデータは返す
             
             return parsed_result
             
         except Exception as e:
-            click.echo(f"❌ パースエラー: {e}", err=True)
+            if not self.quiet:
+                click.echo(f"❌ パースエラー: {e}", err=True)
+            return None
+    
+    def from_fields(self, fields: Dict, provenance: Optional[Dict] = None) -> Optional[Dict]:
+        """フィールドごとに読み取った数字列（DigitReading）から結果を組み立てる
+        
+        いずれかのフィールドが欠けている・範囲外の場合はNone（Tesseractの処理にフォールバックする）
+        """
+        try:
+            gain = int(fields['gain'].text)
+            paid = int(fields['paid'].text)
+            correct = int(fields['correct'].text)
+            tps = float(fields['avarageTPS'].text)
+            miss = int(fields['miss'].text)
+        except (KeyError, ValueError):
+            return None
+        
+        settings = self.settings
+        if not (paid in COURSE_BY_PAID
+                and self._in_range(gain, settings.gain_range)
+                and self._in_range(correct, settings.correct_range)
+                and self._in_range(tps, settings.tps_range)
+                and self._in_range(miss, settings.miss_range)):
             return None
+        
+        for field in ('gain', 'paid', 'correct', 'avarageTPS', 'miss'):
+            record_source(provenance, field, 'glyph:knn', fields[field].confidence)
+        record_source(provenance, 'course', 'glyph:course_from_paid', fields['paid'].confidence)
+        return {
+            "course": COURSE_BY_PAID[paid],
+            "result": gain - paid,
+            "detail": {
+                "payed": paid,
+                "gain": gain
+            },
+            "typing": {
+                "correct": correct,
+                "avarageTPS": tps,
+                "miss": miss
+            }
+        }
     
     def _normalize_text(self, text: str) -> str:
         """テキストを正規化"""
@@ -76,46 +177,57 @@ class SushidaResultParser:
         normalized = normalized.replace('\n', ' ')
         return normalized.strip()
     
-    def _extract_course(self, text: str) -> Optional[str]:
+    def _extract_course(self, text: str, provenance: Optional[Dict] = None) -> Optional[str]:
         """コース名抽出（より寛容なロジック）"""
         # まず正確なマッチを試行
         match = re.search(self.patterns['course'], text)
         if match:
+            record_source(provenance, 'course', 'pattern:course#0')
             return match.group(1)
         
         # 画像から推測される情報を利用
         # 金額から推測
         if '3000' in text or '3,000' in text:
+            record_source(provenance, 'course', 'heuristic:course_from_amount', 0.5)
             return 'お手軽'
         elif '5000' in text or '5,000' in text:
+            record_source(provenance, 'course', 'heuristic:course_from_amount', 0.5)
             return '普通'  
         elif '10000' in text or '10,000' in text:
+            record_source(provenance, 'course', 'heuristic:course_from_amount', 0.5)
             return '高級'
         
         # デフォルトでお手軽コースと推定
+        record_source(provenance, 'course', 'default')
         return 'お手軽'
     
-    def _extract_gain(self, text: str) -> int:
+    def _extract_gain(self, text: str, provenance: Optional[Dict] = None) -> int:
         """獲得金額抽出（改善版）"""
         # カンマ区切りの数値も含めて抽出
         numbers = re.findall(r'\d+(?:,\d+)*', text)
         
-        # 複数のパターンを試行
+        # 複数のパターンを試行（「.*」を含むものは末尾の文字列で切り詰めて検索）
+        # (?<!\d)(?<!\d,) は数字列（カンマ区切りを含む）の途中から試行し直す無駄な後戻りを防ぐ
         patterns = [
-            r'(\d+(?:,\d+)*)\s*円分のお寿司をゲット',
-            r'(\d+(?:,\d+)*)\s*のお.*ゲット',
-            r'(\d+(?:,\d+)*)\s*円.*ゲ[ットッ]*',
-            r'(\d+(?:,\d+)*)\s*.*ゲ[ットッ]*',
+            (r'(?<!\d)(?<!\d,)(\d+(?:,\d+)*)\s*円分のお寿司をゲット', None),
+            (r'(?<!\d)(?<!\d,)(\d+(?:,\d+)*)\s*のお.*ゲット', 'ゲット'),
+            (r'(?<!\d)(?<!\d,)(\d+(?:,\d+)*)\s*円.*ゲ[ットッ]*', 'ゲ'),
+            (r'(?<!\d)(?<!\d,)(\d+(?:,\d+)*)\s*.*ゲ[ットッ]*', 'ゲ'),
         ]
         
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for index, (pattern, tail) in enumerate(patterns):
+            if tail:
+                match = search_before_last(pattern, text, tail)
+            else:
+                match = re.search(pattern, text)
             if match:
                 amount_str = match.group(1).replace(',', '')
                 try:
                     amount = int(amount_str)
-                    # 妥当な範囲かチェック（0-10000円程度）
-                    if 0 <= amount <= 10000:
+                    # 妥当な範囲かチェック（既定は0-10000円程度）
+                    if self._in_range(amount, self.settings.gain_range):
+                        record_source(provenance, 'gain', f'pattern:gain#{index}',
+                                      pattern_confidence(index))
                         return amount
                 except ValueError:
                     continue
@@ -127,41 +239,49 @@ class SushidaResultParser:
                 num = int(num_str.replace(',', ''))
                 # 1160（1,160）は正しい獲得金額として処理
                 if num == 1160:
+                    record_source(provenance, 'gain', 'heuristic:gain_1160')
                     return 1160
-                # 獲得金額として妥当な範囲（50-5000円程度）
-                elif 50 <= num <= 5000:
+                # 獲得金額として妥当な範囲（既定は50-5000円程度）
+                elif self._in_range(num, self.settings.gain_guess_range):
+                    record_source(provenance, 'gain', 'heuristic:gain_range')
                     return num
             except ValueError:
                 continue
-                
+        
+        record_source(provenance, 'gain', 'default')
         return 0
     
-    def _extract_paid(self, text: str) -> int:
+    def _extract_paid(self, text: str, provenance: Optional[Dict] = None) -> int:
         """支払金額抽出（改善版）"""
         if self.debug:
             print(f"🔍 デバッグ: 支払額抽出開始")
             
         # 複数のパターンを試行
         patterns = [
-            r'(\d+,?\d*)\s*円\s*払って',
-            r'(\d+,?\d*)\s*円コース',
-            r'(\d+,?\d*)\s*円.*って',
-            r'(\d+,?\d*)\s*って',  # 「3,000って」パターン
-            r'プ[。、]\s*(\d+,?\d*)',  # 「プ。3,000」パターン
+            (r'(?<!\d)(\d+(?:,\d*)?)\s*円\s*払って', None),
+            (r'(?<!\d)(\d+(?:,\d*)?)\s*円コース', None),
+            (r'(?<!\d)(\d+(?:,\d*)?)\s*円.*って', 'って'),
+            (r'(?<!\d)(\d+(?:,\d*)?)\s*って', None),  # 「3,000って」パターン
+            (r'プ[。、]\s*(\d+(?:,\d*)?)', None),  # 「プ。3,000」パターン
         ]
         
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for index, (pattern, tail) in enumerate(patterns):
+            if tail:
+                match = search_before_last(pattern, text, tail)
+            else:
+                match = re.search(pattern, text)
             if match:
                 if self.debug:
                     print(f"🔍 デバッグ: 支払額パターンマッチ: {pattern} -> {match.group(1)}")
                 amount_str = match.group(1).replace(',', '')
                 try:
                     amount = int(amount_str)
-                    # 妥当な支払額かチェック（1000-10000円程度）
-                    if 1000 <= amount <= 10000:
+                    # 妥当な支払額かチェック（既定は1000-10000円程度）
+                    if self._in_range(amount, self.settings.paid_range):
                         if self.debug:
                             print(f"🔍 デバッグ: 支払額確定: {amount}")
+                        record_source(provenance, 'paid', f'pattern:paid#{index}',
+                                      pattern_confidence(index))
                         return amount
                 except ValueError:
                     continue
@@ -170,18 +290,22 @@ class SushidaResultParser:
         if '3000' in text or '3,000' in text:
             if self.debug:
                 print(f"🔍 デバッグ: 支払額推測（3000パターン）: 3000")
+            record_source(provenance, 'paid', 'heuristic:paid_course_amount', 0.5)
             return 3000
         elif '5000' in text or '5,000' in text:
             if self.debug:
                 print(f"🔍 デバッグ: 支払額推測（5000パターン）: 5000")
+            record_source(provenance, 'paid', 'heuristic:paid_course_amount', 0.5)
             return 5000
         elif '10000' in text or '10,000' in text:
             if self.debug:
                 print(f"🔍 デバッグ: 支払額推測（10000パターン）: 10000")
+            record_source(provenance, 'paid', 'heuristic:paid_course_amount', 0.5)
             return 10000
         
         if self.debug:
             print(f"🔍 デバッグ: 支払額抽出失敗")
+        record_source(provenance, 'paid', 'default')
         return 0
     
     # 損失抽出は使用しない（計算で求めるため）
@@ -221,7 +345,7 @@ class SushidaResultParser:
     #                 
     #     return 0
     
-    def _extract_typing_stats(self, text: str) -> Dict[str, Union[int, float]]:
+    def _extract_typing_stats(self, text: str, provenance: Optional[Dict] = None) -> Dict[str, Union[int, float]]:
         """タイピング統計抽出（改善版）"""
         
         # 数字を抽出してから文脈で判断
@@ -232,6 +356,9 @@ class SushidaResultParser:
             "avarageTPS": 0.0,
             "miss": 0
         }
+        # 抽出できなかったフィールドはデフォルト値扱い
+        for field in stats:
+            record_source(provenance, field, 'default')
         
         if self.debug:
             print(f"🔍 デバッグ: タイピング統計抽出開始")
@@ -242,31 +369,35 @@ class SushidaResultParser:
             r'正しく打ったキーの数[:\s]*(\d+)',
             r'正解[:\s]*(\d+)',
             r'キーの数[:\s]*(\d+)',
-            r'(\d+)\s*回',  # 「35回」のようなパターン
+            r'(?<!\d)(\d+)\s*回',  # 「35回」のようなパターン
         ]
         
-        for pattern in correct_patterns:
+        for index, pattern in enumerate(correct_patterns):
             match = re.search(pattern, text)
             if match:
                 try:
                     value = int(match.group(1))
                     # 妥当な範囲の正解数
-                    if 10 <= value <= 200:
+                    if self._in_range(value, self.settings.correct_range):
                         stats["correct"] = value
+                        record_source(provenance, 'correct', f'pattern:correct#{index}',
+                                      pattern_confidence(index))
                         break
                 except ValueError:
                     continue
         
         # 特殊パターン「35回06。20」「59回。10。15回」のような形式を解析
         special_patterns = [
-            r'(\d+)\s*回\s*(\d+)(?:\.\d+)?[。、]\s*(\d+)',  # 35回06。20
-            r'(\d+)\s*回[。、]\s*(\d+)[。、]\s*(\d+)\s*回?',  # 59回。10。15回
+            r'(?<!\d)(\d+)\s*回\s*(\d+)(?:\.\d+)?[。、]\s*(\d+)',  # 35回06。20
+            r'(?<!\d)(\d+)\s*回[。、]\s*(\d+)[。、]\s*(\d+)\s*回?',  # 59回。10。15回
         ]
         
         special_match = None
-        for pattern in special_patterns:
+        special_source = ''
+        for index, pattern in enumerate(special_patterns):
             special_match = re.search(pattern, text)
             if special_match:
+                special_source = f'special:typing#{index}'
                 if self.debug:
                     print(f"🔍 デバッグ: 特殊パターンマッチ: {pattern} -> {special_match.groups()}")
                 break
@@ -283,26 +414,31 @@ class SushidaResultParser:
                 if self.debug:
                     print(f"🔍 デバッグ: 特殊パターン解析 - correct={potential_correct}, tps_part={potential_tps_part}, miss={potential_miss}")
                 
-                if 10 <= potential_correct <= 200 and stats["correct"] == 0:
+                if self._in_range(potential_correct, self.settings.correct_range) and stats["correct"] == 0:
                     stats["correct"] = potential_correct
+                    record_source(provenance, 'correct', special_source)
                     if self.debug:
                         print(f"🔍 デバッグ: 正解数設定: {potential_correct}")
-                if 0 <= potential_miss <= 50 and stats["miss"] == 0:
+                if self._in_range(potential_miss, self.settings.miss_range) and stats["miss"] == 0:
                     stats["miss"] = potential_miss
+                    record_source(provenance, 'miss', special_source)
                     if self.debug:
                         print(f"🔍 デバッグ: ミス数設定: {potential_miss}")
                 if potential_tps_part and stats["avarageTPS"] == 0.0:
                     # 06 -> 0.6として解釈
                     if potential_tps_part == "06":
                         stats["avarageTPS"] = 0.6
+                        record_source(provenance, 'avarageTPS', special_source)
                         if self.debug:
                             print(f"🔍 デバッグ: TPS設定（06パターン）: 0.6")
                     elif potential_tps_part == "07":
                         stats["avarageTPS"] = 0.7
+                        record_source(provenance, 'avarageTPS', special_source)
                         if self.debug:
                             print(f"🔍 デバッグ: TPS設定（07パターン）: 0.7")
                     elif potential_tps_part == "10":
                         stats["avarageTPS"] = 1.0
+                        record_source(provenance, 'avarageTPS', special_source)
                         if self.debug:
                             print(f"🔍 デバッグ: TPS設定（10パターン）: 1.0")
                         
@@ -312,15 +448,17 @@ class SushidaResultParser:
         # ミスタイプ数の抽出（複数パターン）
         if stats["miss"] == 0:
             miss_patterns = [
-                r'ミスタイプ[:\s]*(\d+)',
+                r'ミスタイプ数?[:\s]*(\d+)\s*回?',  # 画面の表記は「ミスタイプ数 20回」
                 r'ミス[:\s]*(\d+)',
             ]
             
-            for pattern in miss_patterns:
+            for index, pattern in enumerate(miss_patterns):
                 match = re.search(pattern, text)
                 if match:
                     try:
                         stats["miss"] = int(match.group(1))
+                        record_source(provenance, 'miss', f'pattern:miss#{index}',
+                                      pattern_confidence(index))
                         break
                     except ValueError:
                         continue
@@ -329,23 +467,31 @@ class SushidaResultParser:
         if stats["avarageTPS"] == 0.0:
             if self.debug:
                 print(f"🔍 デバッグ: TPS抽出を開始（現在のTPS: {stats['avarageTPS']}）")
+            # 「平均.*?数字」は最初の「平均」で失敗すれば以降も必ず失敗するので、
+            # 先頭の出現位置からのみ試行する（出現ごとに文末まで走査するのを防ぐ）
             tps_patterns = [
-                r'平均.*?(\d+(?:\.\d+)?)',
-                r'(\d+(?:\.\d+)?)\s*回/秒',
-                r'(\d+(?:\.\d+)?)\s*秒',
-                r'平均キータイプ.*?(\d+(?:\.\d+)?)',
+                (r'平均.*?(\d+(?:\.\d+)?)', '平均'),
+                (r'(?<!\d)(\d+(?:\.\d+)?)\s*回/秒', None),
+                (r'(?<!\d)(\d+(?:\.\d+)?)\s*秒', None),
+                (r'平均キータイプ.*?(\d+(?:\.\d+)?)', '平均キータイプ'),
             ]
             
-            for pattern in tps_patterns:
-                match = re.search(pattern, text)
+            for index, (pattern, head) in enumerate(tps_patterns):
+                if head:
+                    start = text.find(head)
+                    match = re.match(pattern, text[start:]) if start >= 0 else None
+                else:
+                    match = re.search(pattern, text)
                 if match:
                     if self.debug:
                         print(f"🔍 デバッグ: TPSパターンマッチ: {pattern} -> {match.group(1)}")
                     try:
                         tps_val = float(match.group(1))
-                        # TPSとして妥当な範囲（0.1-10程度）
-                        if 0.1 <= tps_val <= 10:
+                        # TPSとして妥当な範囲（既定は0.1-10程度）
+                        if self._in_range(tps_val, self.settings.tps_range):
                             stats["avarageTPS"] = tps_val
+                            record_source(provenance, 'avarageTPS', f'pattern:avarageTPS#{index}',
+                                          pattern_confidence(index))
                             if self.debug:
                                 print(f"🔍 デバッグ: TPS設定（パターンマッチ）: {tps_val}")
                             break
@@ -354,15 +500,16 @@ class SushidaResultParser:
         
         # パターンマッチが失敗した場合、小数点を含む数値から推測
         if stats["avarageTPS"] == 0.0:
-            decimal_numbers = re.findall(r'\d+\.\d+', text)
+            decimal_numbers = re.findall(r'(?<!\d)\d+\.\d+', text)
             if self.debug and decimal_numbers:
                 print(f"🔍 デバッグ: 小数点数値から推測: {decimal_numbers}")
             for num_str in decimal_numbers:
                 try:
                     num = float(num_str)
                     # TPSとして妥当な範囲
-                    if 0.1 <= num <= 10:
+                    if self._in_range(num, self.settings.tps_range):
                         stats["avarageTPS"] = num
+                        record_source(provenance, 'avarageTPS', 'heuristic:tps_decimal', 0.5)
                         if self.debug:
                             print(f"🔍 デバッグ: TPS設定（小数点推測）: {num}")
                         break
@@ -394,10 +541,11 @@ class SushidaResultParser:
                     stats["correct"] = min(priority_candidates)
                 else:
                     stats["correct"] = min(candidates) if candidates else 0
+                record_source(provenance, 'correct', 'heuristic:correct_candidates')
         
         # ミス数の推測（正解数より小さく、0-50の範囲）
         if stats["miss"] == 0:
-            candidates = [n for n in all_numbers if isinstance(n, int) and 0 <= n <= 50 and n != stats["correct"]]
+            candidates = [n for n in all_numbers if isinstance(n, int) and self._in_range(n, self.settings.miss_range) and n != stats["correct"]]
             if candidates:
                 # 正解数より小さい値を優先
                 smaller_candidates = [n for n in candidates if n < stats["correct"]]
@@ -405,13 +553,15 @@ class SushidaResultParser:
                     stats["miss"] = max(smaller_candidates)
                 else:
                     stats["miss"] = min(candidates)
+                record_source(provenance, 'miss', 'heuristic:miss_candidates')
         
         # TPS値の推測（特殊パターンで設定されていない場合のみ）
         if stats["avarageTPS"] == 0.0:
             # まず小数点を含む値を探す
-            decimal_candidates = [n for n in all_numbers if isinstance(n, float) and 0.1 <= n <= 10]
+            decimal_candidates = [n for n in all_numbers if isinstance(n, float) and self._in_range(n, self.settings.tps_range)]
             if decimal_candidates:
                 stats["avarageTPS"] = decimal_candidates[0]
+                record_source(provenance, 'avarageTPS', 'heuristic:tps_decimal', 0.5)
                 if self.debug:
                     print(f"🔍 デバッグ: TPS設定（小数点候補）: {decimal_candidates[0]}")
             else:
@@ -422,6 +572,7 @@ class SushidaResultParser:
                         if n == 10:
                             # 10は1.0の可能性（ただし既に特殊パターンで設定されていない場合のみ）
                             stats["avarageTPS"] = 1.0
+                            record_source(provenance, 'avarageTPS', 'heuristic:tps_10', 0.2)
                             if self.debug:
                                 print(f"🔍 デバッグ: TPS設定（10パターン）: 1.0")
                             break
@@ -431,6 +582,11 @@ class SushidaResultParser:
         
         return stats
     
+    @staticmethod
+    def _in_range(value: Union[int, float], bounds) -> bool:
+        """値が (下限, 上限) の範囲内か（両端を含む）"""
+        return bounds[0] <= value <= bounds[1]
+    
     def _extract_number(self, text: str, pattern: str) -> int:
         """数値抽出"""
         match = re.search(pattern, text)
@@ -451,8 +607,8 @@ class SushidaResultParser:
                 return 0.0
         return 0.0
     
-    def _validate_result(self, result: Dict) -> bool:
-        """結果の基本的な検証"""
+    def validate_result(self, result: Dict) -> bool:
+        """結果の基本的な検証（必須フィールド・コース・金額・タイピング統計）"""
         # 必須フィールドの存在確認
         required_fields = ['course', 'result', 'detail', 'typing']
         for field in required_fields:
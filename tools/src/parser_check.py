@@ -0,0 +1,197 @@
+import json
+import multiprocessing
+import queue
+import random
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .parser import SushidaResultParser, overall_confidence
+
+DEFAULT_CORPUS_PATH = Path(__file__).resolve().parent / 'data' / 'parser_corpus.jsonl'
+
+# 1回のパースに許容する時間: 基本時間 + 1000文字あたりの時間（線形時間を前提にした上限）
+BASE_TIME_LIMIT = 0.05
+TIME_LIMIT_PER_KCHAR = 0.05
+
+# ファジング用の語彙（OCR結果に現れやすい断片と、後戻りを誘発しやすい記号）
+FUZZ_TOKENS = (
+    list("0123456789,,..。、 ・-+×/") +
+    ["円", "回", "秒", "回/秒", "平均", "平均キータイプ", "ゲ", "ゲット", "のお", "って", "払って",
+     "円分のお寿司をゲット", "円コース", "プ。", "ミス", "ミスタイプ", "正解", "キーの数",
+     "正しく打ったキーの数", "お手軽", "手軽", "普通", "高級", "損でした",
+     "3,000", "5,000", "10,000", "1160", "06", "10"]
+)
+
+
+def time_limit_for(text: str) -> float:
+    """テキスト長に応じたパース時間の上限"""
+    return BASE_TIME_LIMIT + TIME_LIMIT_PER_KCHAR * len(text) / 1000
+
+
+def load_corpus(path: Path = DEFAULT_CORPUS_PATH) -> List[Dict]:
+    """回帰テスト用コーパス（JSON Lines）を読み込み"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def generate_fuzz_text(rng: random.Random, max_length: int) -> str:
+    """語彙の断片とランダムな文字を混ぜた長いノイズテキストを生成"""
+    target = rng.randint(1, max_length)
+    parts: List[str] = []
+    size = 0
+    while size < target:
+        roll = rng.random()
+        if roll < 0.1:
+            # 長い数字列やカンマ・ピリオド区切りの連続は後戻りを起こしやすい
+            piece = rng.choice(["1", "12,", "3.", "9回", "0。"]) * rng.randint(10, 500)
+        elif roll < 0.8:
+            piece = rng.choice(FUZZ_TOKENS)
+        else:
+            piece = chr(rng.randint(0x20, 0x30FF))
+        parts.append(piece)
+        size += len(piece)
+    return ''.join(parts)[:target]
+
+
+def check_invariants(result: Optional[Dict]) -> Optional[str]:
+    """パース結果が満たすべき性質を検証し、違反があれば内容を返す"""
+    if result is None:
+        return None
+    try:
+        if result['result'] != result['detail']['gain'] - result['detail']['payed']:
+            return "result が gain - payed と一致しない"
+        typing = result['typing']
+        if not isinstance(typing['correct'], int) or not isinstance(typing['miss'], int):
+            return "correct/miss が整数でない"
+        if not isinstance(typing['avarageTPS'], float):
+            return "avarageTPS が小数でない"
+    except (KeyError, TypeError) as e:
+        return f"必須フィールドがない: {e}"
+    return None
+
+
+def case_problems(parser: SushidaResultParser, case: Dict) -> List[str]:
+    """コーパスの1件をパースし、期待値・信頼度の下限（min_confidence）との違いを返す"""
+    provenance: Dict = {}
+    result = parser.parse(case['text'], provenance)
+    problems = []
+    if result != case.get('expected'):
+        problems.append(f"期待値と不一致: {result}")
+    if 'min_confidence' in case and overall_confidence(provenance) < case['min_confidence']:
+        problems.append(f"信頼度が低い: {overall_confidence(provenance):.2f}"
+                        f"（下限 {case['min_confidence']}）, 取得元: {provenance}")
+    return problems
+
+
+def check_case(parser: SushidaResultParser, case: Dict) -> List[str]:
+    """case_problems と同じだが、既知の誤りとして xfail（理由）が付いたケースは期待値と違うことを確認する
+
+    xfail のケースの expected は正しい値を書いておき、パーサーの修正で一致したら xfail を外す
+    """
+    problems = case_problems(parser, case)
+    if case.get('xfail'):
+        return [] if problems else ["期待値と一致しました（修正済みなら xfail を外してください）"]
+    return problems
+
+
+def append_corpus_case(case: Dict, path: Path = DEFAULT_CORPUS_PATH):
+    """コーパスの末尾にケースを1件追加（idが既にある場合はValueError）"""
+    if any(existing['id'] == case['id'] for existing in load_corpus(path)):
+        raise ValueError(f"コーパスに同じidのケースがあります: {case['id']}")
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(case, ensure_ascii=False) + '\n')
+
+
+def _iter_cases(corpus: List[Dict], fuzz_count: int, max_length: int,
+                seed: int) -> Iterator[Tuple[str, str, Optional[Dict]]]:
+    for case in corpus:
+        yield case['id'], case['text'], case
+    rng = random.Random(seed)
+    for index in range(fuzz_count):
+        yield f"fuzz-{index}", generate_fuzz_text(rng, max_length), None
+
+
+def _check_worker(progress, corpus: List[Dict], fuzz_count: int, max_length: int, seed: int):
+    """子プロセスで実行する検証本体（進捗と結果をキューで親に送る）"""
+    parser = SushidaResultParser(quiet=True)
+    for case_id, text, case in _iter_cases(corpus, fuzz_count, max_length, seed):
+        progress.put(('start', case_id, len(text)))
+        started = time.perf_counter()
+        result = parser.parse(text)
+        elapsed = time.perf_counter() - started
+
+        problems = check_case(parser, case) if case is not None else []
+        violation = check_invariants(result)
+        if violation:
+            problems.append(violation)
+        if elapsed > time_limit_for(text):
+            problems.append(f"時間超過: {elapsed * 1000:.1f}ms（上限 {time_limit_for(text) * 1000:.1f}ms）")
+        progress.put(('done', case_id, len(text), elapsed, problems))
+    progress.put(('finished',))
+
+
+class ParserCheckReport:
+    """検証結果の集計"""
+
+    def __init__(self):
+        self.cases = 0
+        self.characters = 0
+        self.seconds = 0.0
+        self.slowest: Tuple[float, str, int] = (0.0, '', 0)
+        self.failures: List[Tuple[str, str]] = []
+        self.hung: Optional[Tuple[str, int]] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures and self.hung is None
+
+    @property
+    def texts_per_second(self) -> float:
+        return self.cases / self.seconds if self.seconds else 0.0
+
+    @property
+    def chars_per_second(self) -> float:
+        return self.characters / self.seconds if self.seconds else 0.0
+
+
+def run_parser_check(corpus: List[Dict], fuzz_count: int = 200, max_length: int = 20000,
+                     seed: int = 0, hang_timeout: float = 10.0) -> ParserCheckReport:
+    """コーパスとファジングでパーサーを検証
+
+    正規表現の破滅的な後戻りは中断できないため、検証は子プロセスで行い、
+    1件の処理が hang_timeout 秒を超えた場合は子プロセスを終了させてその入力を報告する。
+    """
+    report = ParserCheckReport()
+    progress: 'multiprocessing.Queue' = multiprocessing.Queue()
+    worker = multiprocessing.Process(
+        target=_check_worker, args=(progress, corpus, fuzz_count, max_length, seed), daemon=True)
+    worker.start()
+
+    current: Optional[Tuple[str, int]] = None
+    try:
+        while True:
+            try:
+                message = progress.get(timeout=hang_timeout)
+            except queue.Empty:
+                report.hung = current or ('(起動前)', 0)
+                break
+            kind = message[0]
+            if kind == 'finished':
+                break
+            if kind == 'start':
+                current = (message[1], message[2])
+                continue
+            _, case_id, length, elapsed, problems = message
+            report.cases += 1
+            report.characters += length
+            report.seconds += elapsed
+            if elapsed > report.slowest[0]:
+                report.slowest = (elapsed, case_id, length)
+            for problem in problems:
+                report.failures.append((case_id, problem))
+    finally:
+        if worker.is_alive():
+            worker.terminate()
+        worker.join()
+    return report
@@ -0,0 +1,214 @@
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import click
+import numpy as np
+
+from .fusion import FusionExtractor
+from .glyphs import DigitModel, load_digit_model
+from .ocr import SushidaOCR
+from .parser import SushidaResultParser, overall_confidence
+from .profiles import TIERS
+from .stacking import preprocess_batch
+
+
+class TierStats:
+    """処理段ごとの試行数・確定数・処理時間の集計"""
+
+    def __init__(self):
+        self.attempts = {tier: 0 for tier in TIERS}
+        self.resolved = {tier: 0 for tier in TIERS}
+        self.seconds = {tier: 0.0 for tier in TIERS}
+
+    def record(self, tier: str, elapsed: float):
+        self.attempts[tier] += 1
+        self.seconds[tier] += elapsed
+
+    def report_lines(self) -> List[str]:
+        """処理段ごとの集計を表示用の文字列にする"""
+        lines = []
+        for tier in TIERS:
+            attempts = self.attempts[tier]
+            if not attempts:
+                continue
+            mean_ms = self.seconds[tier] / attempts * 1000
+            lines.append(
+                f"  {tier}: {self.resolved[tier]}件確定 / {attempts}件試行, "
+                f"平均 {mean_ms:.0f}ms, 合計 {self.seconds[tier]:.1f}s"
+            )
+        return lines
+
+
+def result_rank(parser: SushidaResultParser, result: Optional[Dict],
+                provenance: Dict) -> Tuple[bool, bool, float]:
+    """候補の良さ（結果がある → 検証を通る → 信頼度が高い の順に比べる）"""
+    if not result:
+        return False, False, 0.0
+    return True, parser.validate_result(result), overall_confidence(provenance)
+
+
+class TieredExtractor:
+    """高速な処理段から順に試し、検証失敗・低信頼度の画像だけを次の段に回すクラス
+
+    digits:   学習済みの数字テンプレートで数値フィールドを直接読み取る（Tesseractを使わない。モデルがなければ飛ばす）
+    fast:     ROI切り出し・縮小・1回のOCR
+    accurate: preprocess_image相当の前処理 + 2回のOCR（従来の処理）
+    fusion:   複数の前処理バリアントによる多数決
+    """
+
+    def __init__(self, ocr: SushidaOCR, parser: SushidaResultParser,
+                 min_confidence: float = 0.5, start_tier: str = 'fast',
+                 digit_model: Optional[DigitModel] = None):
+        if start_tier not in TIERS:
+            raise ValueError(f"不明な処理段です: {start_tier}（{' / '.join(TIERS)} のいずれか）")
+        self.ocr = ocr
+        self.parser = parser
+        self.min_confidence = min_confidence
+        self.digit_model = digit_model or load_digit_model()
+        self.tiers = tuple(tier for tier in TIERS[TIERS.index(start_tier):]
+                           if tier != 'digits' or self.digit_model)
+        self.fusion = FusionExtractor(ocr, parser)
+        self.stats = TierStats()
+
+    def _run_tier(self, tier: str, img: np.ndarray,
+                  processed: Optional[np.ndarray] = None) -> Tuple[Optional[Dict], Dict]:
+        if tier == 'fusion':
+            result, provenance, _ = self.fusion.extract_array(img)
+            return result, provenance
+
+        if tier == 'digits':
+            with self.ocr.timed('glyphs'):
+                readings = self.digit_model.read_fields(img)
+            provenance = {}
+            return self.parser.from_fields(readings, provenance), provenance
+
+        if tier == 'fast':
+            text = self.ocr.extract_text_fast(img)
+        elif processed is not None:
+            text = self.ocr.extract_text_processed(processed)
+        else:
+            text = self.ocr.extract_text_array(img)
+        if not text:
+            return None, {}
+        provenance: Dict = {}
+        return self.parser.parse(text, provenance), provenance
+
+    def result_fingerprint(self, profile_fingerprint: str) -> str:
+        """結果のキャッシュに使う識別子（数字テンプレートを使う場合はモデルの識別子も含める）"""
+        if 'digits' in self.tiers:
+            return f"{profile_fingerprint}+{self.digit_model.fingerprint}"
+        return profile_fingerprint
+
+    def accepts(self, result: Optional[Dict], provenance: Dict) -> bool:
+        """結果が検証を通り、信頼度が閾値以上か（満たさなければ次の段や再処理に回す）"""
+        if not result or not self.parser.validate_result(result):
+            return False
+        return overall_confidence(provenance) >= self.min_confidence
+
+    def _rank(self, result: Optional[Dict], provenance: Dict) -> Tuple[bool, bool, float]:
+        return result_rank(self.parser, result, provenance)
+
+    def _keep_better(self, best: Tuple[Optional[Dict], Dict, Optional[str]],
+                     result: Optional[Dict], provenance: Dict, tier: str):
+        """次の段の結果が今までの候補より良い場合だけ置き換える（同等なら先の段の結果を残す）"""
+        if self._rank(result, provenance) > self._rank(best[0], best[1]):
+            return result, provenance, tier
+        return best
+
+    def extract(self, image_path: Union[str, Path]) -> Tuple[Optional[Dict], Dict, Optional[str]]:
+        """画像を段階的に処理
+
+        戻り値: (パース結果, 取得元情報, 結果を確定した処理段)
+        どの段でも閾値を満たさない場合は、試した段のうち検証を通り信頼度が最も高い結果を返す
+        """
+        return self.extract_array(self.ocr.load_image(image_path))
+
+    def extract_array(self, img: np.ndarray,
+                      stats: Optional[TierStats] = None) -> Tuple[Optional[Dict], Dict, Optional[str]]:
+        """読み込み済みの画像を段階的に処理（試行・確定の件数は stats に記録。省略時は self.stats）"""
+        stats = self.stats if stats is None else stats
+        best: Tuple[Optional[Dict], Dict, Optional[str]] = (None, {}, None)
+
+        for tier in self.tiers:
+            started = time.perf_counter()
+            result, provenance = self._run_tier(tier, img)
+            stats.record(tier, time.perf_counter() - started)
+
+            best = self._keep_better(best, result, provenance, tier)
+            if self.accepts(result, provenance):
+                break
+            if self.ocr.debug:
+                click.echo(f"🔍 デバッグ: {tier}段の結果を採用せず次の段へ"
+                           f"（信頼度 {overall_confidence(provenance):.2f}）")
+
+        if best[2]:
+            stats.resolved[best[2]] += 1
+        return best
+
+    def extract_uncropped(self, img: np.ndarray,
+                          previous: Tuple[Optional[Dict], Dict, Optional[str]],
+                          stats: Optional[TierStats] = None) -> Optional[Tuple[Dict, Dict, str]]:
+        """auto_cropで切り出した画像の結果 previous が採用できない場合に、切り出す前の画像 img で再処理
+
+        ゲーム画面の誤検出（結果画面の一部だけを切り出すなど）で読み取れなかった画像を救う。
+        パーサーはノイズからもデフォルト値で結果を作るため、結果の有無ではなく accepts で判定する。
+        previous が採用できる場合、ゲーム画面を検出しない（切り出していない）画像、
+        再処理の結果が previous より良くない場合はNoneを返す。
+        stats には previous を記録したもの（ワーカープロセスで処理した場合はプールの集計）を渡す
+        """
+        stats = self.stats if stats is None else stats
+        if self.accepts(previous[0], previous[1]) or not self.ocr.would_crop(img):
+            return None
+        if self.ocr.debug:
+            click.echo("🔍 デバッグ: 切り出した画像の結果を採用できないため、切り出さずに再処理")
+        outcome = self.extract_array(img, stats)
+        # 再処理の試行は数えるが、確定件数は1枚につき採用した方の処理段の1件にする
+        if outcome[2]:
+            stats.resolved[outcome[2]] -= 1
+        if self._rank(outcome[0], outcome[1]) > self._rank(previous[0], previous[1]):
+            if previous[2]:
+                stats.resolved[previous[2]] -= 1
+            stats.resolved[outcome[2]] += 1
+            return outcome
+        return None
+
+    def extract_batch(self, images: Sequence[np.ndarray]) -> List[Tuple[Optional[Dict], Dict, Optional[str]]]:
+        """複数の画像を段階的に処理（extract_array を1枚ずつ呼んだ場合と同じ結果）
+
+        accurate段の前処理は、その段に回った画像を形ごとにまとめて1回で行う（stacking）。
+        まとめた前処理の時間は画像の枚数で均等に割って各画像の試行時間に含める
+        """
+        best: List[Tuple[Optional[Dict], Dict, Optional[str]]] = [(None, {}, None)] * len(images)
+        pending = list(range(len(images)))
+
+        for tier in self.tiers:
+            if not pending:
+                break
+            processed: Dict[int, np.ndarray] = {}
+            shared = 0.0
+            if tier == 'accurate' and len(pending) > 1:
+                started = time.perf_counter()
+                frames = preprocess_batch(self.ocr, [images[index] for index in pending])
+                processed = dict(zip(pending, frames))
+                shared = (time.perf_counter() - started) / len(pending)
+
+            remaining = []
+            for index in pending:
+                started = time.perf_counter()
+                result, provenance = self._run_tier(tier, images[index], processed.pop(index, None))
+                self.stats.record(tier, shared + time.perf_counter() - started)
+
+                best[index] = self._keep_better(best[index], result, provenance, tier)
+                if self.accepts(result, provenance):
+                    continue
+                remaining.append(index)
+                if self.ocr.debug:
+                    click.echo(f"🔍 デバッグ: {tier}段の結果を採用せず次の段へ"
+                               f"（信頼度 {overall_confidence(provenance):.2f}）")
+            pending = remaining
+
+        for _, _, tier in best:
+            if tier:
+                self.stats.resolved[tier] += 1
+        return best
@@ -0,0 +1,213 @@
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+DEFAULT_PREFETCH_DEPTH = 4
+DEFAULT_PREFETCH_READERS = 2
+DEFAULT_PREFETCH_MEMORY_MB = 512
+
+
+class PrefetchStats:
+    """先読みキューの両側の待ち時間
+
+    reader_wait_seconds: 読み込みスレッドがキューの空き（件数・メモリ）を待った時間（OCRが追いつかない）
+    ocr_wait_seconds:    OCR側が読み込み済みの画像を待った時間（読み込みが追いつかない）
+    inline_frames:       共有メモリのスロットに収まらず、pickleでワーカーに送った画像の枚数
+    """
+
+    def __init__(self):
+        self.reader_wait_seconds = 0.0
+        self.ocr_wait_seconds = 0.0
+        self.peak_depth = 0
+        self.peak_bytes = 0
+        self.inline_frames = 0
+        self._lock = threading.Lock()
+
+    def add_reader_wait(self, seconds: float):
+        with self._lock:
+            self.reader_wait_seconds += seconds
+
+    def add_ocr_wait(self, seconds: float):
+        with self._lock:
+            self.ocr_wait_seconds += seconds
+
+    def add_inline_frame(self):
+        with self._lock:
+            self.inline_frames += 1
+
+    def observe(self, depth: int, buffered_bytes: int):
+        with self._lock:
+            self.peak_depth = max(self.peak_depth, depth)
+            self.peak_bytes = max(self.peak_bytes, buffered_bytes)
+
+    def report_line(self) -> str:
+        """表示用の1行"""
+        line = (f"読み込み側の待ち {self.reader_wait_seconds:.2f}s, "
+                f"OCR側の待ち {self.ocr_wait_seconds:.2f}s")
+        if self.peak_depth:
+            line += f"（最大 {self.peak_depth}枚 / {self.peak_bytes / 1024 / 1024:.1f}MB を保持）"
+        if self.inline_frames:
+            line += f", 共有メモリに収まらずpickleで送った画像 {self.inline_frames}枚"
+        return line
+
+    def to_dict(self) -> Dict:
+        return {
+            'readerWaitSeconds': round(self.reader_wait_seconds, 3),
+            'ocrWaitSeconds': round(self.ocr_wait_seconds, 3),
+            'peakDepth': self.peak_depth,
+            'peakBytes': self.peak_bytes,
+            'inlineFrames': self.inline_frames,
+        }
+
+
+def image_footprint(image: Optional[np.ndarray]) -> int:
+    """画像が保持しているメモリのバイト数（切り出した画像は元画像の分）"""
+    if image is None:
+        return 0
+    while isinstance(image.base, np.ndarray):
+        image = image.base
+    return image.nbytes
+
+
+class PrefetchedImage(NamedTuple):
+    """読み込み済みの画像（読み込みに失敗した場合は image が None で error にメッセージ）"""
+    path: Path
+    image: Optional[np.ndarray]
+    error: Optional[str]
+    read_seconds: float
+
+
+class ImagePrefetcher:
+    """読み込みスレッドが次の画像を先にデコードしておく、上限付きのキュー
+
+    読み込み中の画像とキュー内の画像は合わせて depth 枚まで。キュー内の画像の合計が
+    max_bytes を超える場合も、OCR側が取り出すまで次の画像をキューに入れない
+    （1枚だけで超える画像はキューが空なら受け入れる）。
+    画像は入力の順に返す。読み込みは複数のスレッドで前後するため、先に読み終わった後続の画像は
+    キュー内で待たせる（キューの枠は depth 枚なので、並べ替えのために保持する画像も depth 枚まで）。
+    """
+
+    def __init__(self, load: Callable[[Path], np.ndarray], paths: Iterable[Path],
+                 depth: int = DEFAULT_PREFETCH_DEPTH, readers: int = DEFAULT_PREFETCH_READERS,
+                 max_bytes: int = DEFAULT_PREFETCH_MEMORY_MB * 1024 * 1024):
+        self.load = load
+        self.depth = max(1, depth)
+        self.readers = max(1, min(readers, self.depth))
+        self.max_bytes = max_bytes
+        self.stats = PrefetchStats()
+
+        self._paths = iter(paths)
+        self._paths_lock = threading.Lock()
+        self._cond = threading.Condition()
+        # 入力の順番 -> 読み込み済みの画像（次に返す順番の画像が揃うまで後続を保持する）
+        self._buffer: Dict[int, PrefetchedImage] = {}
+        self._next_index = 0
+        self._taken = 0
+        self._buffered_bytes = 0
+        self._in_flight = 0
+        self._active_readers = 0
+        self._source_error: List[BaseException] = []
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """読み込みスレッドを起動"""
+        self._active_readers = self.readers
+        for index in range(self.readers):
+            thread = threading.Thread(target=self._reader, name=f"prefetch-reader-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self):
+        """読み込みスレッドを止める（途中で処理をやめた場合も呼ぶ）"""
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._buffer.clear()
+        self._buffered_bytes = 0
+
+    def __enter__(self) -> 'ImagePrefetcher':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _wait(self, blocked: Callable[[], bool]) -> bool:
+        """条件が解けるまで待ち、待った時間を読み込み側の待ちに加える（停止した場合はFalse）"""
+        started = time.perf_counter()
+        while blocked() and not self._stopping.is_set():
+            self._cond.wait(0.5)
+        self.stats.add_reader_wait(time.perf_counter() - started)
+        return not self._stopping.is_set()
+
+    def _reader(self):
+        try:
+            while not self._stopping.is_set():
+                # 読み込む前にキューの枠を確保する（読み込み中の画像も depth に含める）
+                with self._cond:
+                    if not self._wait(lambda: len(self._buffer) + self._in_flight >= self.depth):
+                        return
+                    self._in_flight += 1
+                try:
+                    with self._paths_lock:
+                        path = next(self._paths, None)
+                        index = self._taken
+                        if path is not None:
+                            self._taken += 1
+                except BaseException as e:
+                    self._source_error.append(e)
+                    path = None
+                if path is None:
+                    with self._cond:
+                        self._in_flight -= 1
+                    return
+
+                started = time.perf_counter()
+                try:
+                    image, error = self.load(path), None
+                except Exception as e:
+                    image, error = None, str(e)
+                item = PrefetchedImage(path, image, error, time.perf_counter() - started)
+                size = image_footprint(image)
+
+                with self._cond:
+                    self._in_flight -= 1
+                    # メモリの上限を超える場合はOCR側が取り出すのを待つ
+                    # （次に返す画像は待たせるとOCR側も進めなくなるので、上限を超えても受け入れる）
+                    if not self._wait(lambda: self._buffer and index != self._next_index
+                                      and self._buffered_bytes + size > self.max_bytes):
+                        return
+                    self._buffer[index] = item
+                    self._buffered_bytes += size
+                    self.stats.observe(len(self._buffer), self._buffered_bytes)
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._active_readers -= 1
+                self._cond.notify_all()
+
+    def __iter__(self) -> Iterator[PrefetchedImage]:
+        if not self._threads:
+            self.start()
+        while True:
+            with self._cond:
+                started = time.perf_counter()
+                while self._next_index not in self._buffer and self._active_readers > 0:
+                    self._cond.wait(0.5)
+                self.stats.add_ocr_wait(time.perf_counter() - started)
+                if self._next_index not in self._buffer:
+                    break
+                item = self._buffer.pop(self._next_index)
+                self._next_index += 1
+                self._buffered_bytes -= image_footprint(item.image)
+                self._cond.notify_all()
+            yield item
+        if self._source_error:
+            raise self._source_error[0]
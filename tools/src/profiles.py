@@ -0,0 +1,166 @@
+import hashlib
+import json
+import sys
+from dataclasses import asdict, dataclass, field, fields, replace
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# 設定ファイルなどのデータはパッケージ内に置く（インストールしたCLIからも参照できるように）
+DEFAULT_PROFILE_PATH = Path(__file__).resolve().parent / 'data' / 'profiles.toml'
+DEFAULT_PROFILE_NAME = 'balanced'
+
+# 速い順に並べた処理段（tier）
+TIERS = ('digits', 'fast', 'accurate', 'fusion')
+
+DEFAULT_WHITELIST = "0123456789お手軽普通高級円コースゲット払って損でした正しく打ったキーの数平均ミスタイプ回秒/×、。・-+,"
+
+
+@dataclass(frozen=True)
+class OCRSettings:
+    """画像前処理とTesseractの設定"""
+    language: str = 'jpn'
+    oem: int = 1
+    psm: int = 6
+    conservative_psm: int = 8
+    whitelist: str = DEFAULT_WHITELIST
+    blacklist: str = '|Il'
+    # accurate段で保守的な設定（conservative_psm）の2回目のOCRを行うか
+    second_pass: bool = True
+    target_width: int = 1200
+    gamma: float = 1.2
+    bilateral_diameter: int = 9
+    bilateral_sigma_color: float = 75.0
+    bilateral_sigma_space: float = 75.0
+    sharpen: bool = True
+    threshold_block_size: int = 11
+    threshold_c: int = 2
+    morph_kernel: int = 2
+    fast_target_width: int = 1000
+    fast_roi: Tuple[float, float, float, float] = (0.0, 0.0, 1.0, 1.0)
+
+
+@dataclass(frozen=True)
+class ParserSettings:
+    """パーサーが値を採用する妥当な範囲（両端を含む）"""
+    gain_range: Tuple[int, int] = (0, 10000)
+    gain_guess_range: Tuple[int, int] = (50, 5000)
+    paid_range: Tuple[int, int] = (1000, 10000)
+    correct_range: Tuple[int, int] = (10, 200)
+    miss_range: Tuple[int, int] = (0, 50)
+    tps_range: Tuple[float, float] = (0.1, 10.0)
+
+
+@dataclass(frozen=True)
+class PipelineSettings:
+    """batch/serveでの段階的な処理の設定"""
+    start_tier: str = 'fast'
+    min_confidence: float = 0.5
+
+
+@dataclass(frozen=True)
+class PipelineProfile:
+    """名前付きのパイプライン設定一式"""
+    name: str = DEFAULT_PROFILE_NAME
+    description: str = ''
+    ocr: OCRSettings = field(default_factory=OCRSettings)
+    parser: ParserSettings = field(default_factory=ParserSettings)
+    pipeline: PipelineSettings = field(default_factory=PipelineSettings)
+
+    @property
+    def fingerprint(self) -> str:
+        """設定内容から求めた識別子（キャッシュのキーに使う。名前・説明は含めない）"""
+        payload = {
+            'ocr': asdict(self.ocr),
+            'parser': asdict(self.parser),
+            'pipeline': asdict(self.pipeline),
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+class ProfileError(ValueError):
+    """プロファイル設定ファイルの内容が不正"""
+
+
+def _build_section(cls, values: Dict, section: str):
+    known = {f.name: f for f in fields(cls)}
+    unknown = set(values) - set(known)
+    if unknown:
+        raise ProfileError(f"[{section}] に不明な設定があります: {', '.join(sorted(unknown))}")
+    converted = {}
+    for key, value in values.items():
+        # TOMLの配列はタプルに変換してハッシュ可能にする
+        converted[key] = tuple(value) if isinstance(value, list) else value
+    return replace(cls(), **converted)
+
+
+def _build_profile(name: str, data: Dict) -> PipelineProfile:
+    unknown = set(data) - {'description', 'ocr', 'parser', 'pipeline'}
+    if unknown:
+        raise ProfileError(f"プロファイル '{name}' に不明な設定があります: {', '.join(sorted(unknown))}")
+    profile = PipelineProfile(
+        name=name,
+        description=data.get('description', ''),
+        ocr=_build_section(OCRSettings, data.get('ocr', {}), f"profiles.{name}.ocr"),
+        parser=_build_section(ParserSettings, data.get('parser', {}), f"profiles.{name}.parser"),
+        pipeline=_build_section(PipelineSettings, data.get('pipeline', {}), f"profiles.{name}.pipeline"),
+    )
+    # 適応的二値化のブロックサイズは3以上の奇数でなければならない
+    block_size = profile.ocr.threshold_block_size
+    if block_size < 3 or block_size % 2 == 0:
+        raise ProfileError(f"プロファイル '{name}' の threshold_block_size は3以上の奇数にしてください: {block_size}")
+    if profile.pipeline.start_tier not in TIERS:
+        raise ProfileError(f"プロファイル '{name}' の start_tier が不明です: {profile.pipeline.start_tier}"
+                           f"（{' / '.join(TIERS)} のいずれか）")
+    if not 0.0 <= profile.pipeline.min_confidence <= 1.0:
+        raise ProfileError(f"プロファイル '{name}' の min_confidence は0〜1にしてください: "
+                           f"{profile.pipeline.min_confidence}")
+    return profile
+
+
+@lru_cache(maxsize=8)
+def _load_profiles_cached(path: str, mtime_ns: int) -> Dict[str, PipelineProfile]:
+    if tomllib is None:
+        raise ProfileError("TOMLを読み込むには Python 3.11以上、または tomli が必要です（pip install tomli）")
+    with open(path, 'rb') as f:
+        data = tomllib.load(f)
+    return {
+        name: _build_profile(name, values)
+        for name, values in data.get('profiles', {}).items()
+    }
+
+
+def load_profiles(path: Path = DEFAULT_PROFILE_PATH) -> Dict[str, PipelineProfile]:
+    """設定ファイルのプロファイルを読み込み（ファイルが変わらない限り構築は1回だけ）"""
+    path = Path(path)
+    return _load_profiles_cached(str(path.resolve()), path.stat().st_mtime_ns)
+
+
+def get_profile(name: Optional[str] = None, path: Path = DEFAULT_PROFILE_PATH) -> PipelineProfile:
+    """名前でプロファイルを取得
+
+    設定ファイルがない（またはTOMLを読めない環境の）場合、名前が指定されていなければ組み込みの既定値を返す
+    """
+    path = Path(path)
+    if not path.exists() or (tomllib is None and not name):
+        if name and name != DEFAULT_PROFILE_NAME:
+            raise ProfileError(f"プロファイル設定ファイルが見つかりません: {path}")
+        return PipelineProfile()
+
+    profiles = load_profiles(path)
+    name = name or DEFAULT_PROFILE_NAME
+    if name not in profiles:
+        if name == DEFAULT_PROFILE_NAME:
+            return PipelineProfile()
+        available = ', '.join(sorted(profiles)) or '(なし)'
+        raise ProfileError(f"プロファイル '{name}' が見つかりません（利用可能: {available}）")
+    return profiles[name]
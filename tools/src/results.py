@@ -0,0 +1,238 @@
+import csv
+import io
+import json
+import math
+import random
+import re
+import time
+from json.encoder import encode_basestring
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 辞書などの汎用的なJSON出力に使うバックエンド（orjsonがあればそちらを使う）
+JSON_BACKEND = 'orjson' if orjson else 'json'
+
+# orjsonの出力が標準のjsonと異なりうる箇所（指数表記の小数は 1e-7 / 1e-07、NaN・Infinityは null になる）
+_ORJSON_MISMATCH = re.compile(rb'null|\d[eE]')
+
+# CSVの列（ワイヤ形式の名前 payed / avarageTPS はそのまま）
+CSV_COLUMNS = ('timestamp', 'course', 'result', 'payed', 'gain', 'correct', 'avarageTPS', 'miss')
+
+
+def _number(value) -> str:
+    """数値のJSON表記（json.dumpsと同じ）"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return json.dumps(value)
+    return repr(value)
+
+
+class ScoreResult:
+    """1回分のスコア
+
+    パーサーが返す入れ子の辞書（detail / typing）を平らな属性で保持し、
+    JSON・NDJSON・CSVへは中間の辞書を作らずに直接書き出す。
+    """
+
+    __slots__ = CSV_COLUMNS
+
+    def __init__(self, course: str, result: int, payed: int, gain: int, correct: int,
+                 avarageTPS: float, miss: int, timestamp: Optional[str] = None):
+        self.timestamp = timestamp
+        self.course = course
+        self.result = result
+        self.payed = payed
+        self.gain = gain
+        self.correct = correct
+        self.avarageTPS = avarageTPS
+        self.miss = miss
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ScoreResult':
+        """スコアJSON（パーサーの結果・保存済みのファイル）から生成"""
+        detail = data.get('detail', {})
+        typing = data.get('typing', {})
+        return cls(
+            course=data.get('course', ''),
+            result=int(data.get('result', 0)),
+            payed=int(detail.get('payed', 0)),
+            gain=int(detail.get('gain', 0)),
+            correct=int(typing.get('correct', 0)),
+            avarageTPS=float(typing.get('avarageTPS', 0.0)),
+            miss=int(typing.get('miss', 0)),
+            timestamp=data.get('timestamp'),
+        )
+
+    def to_dict(self) -> Dict:
+        """スコアJSONと同じ入れ子の辞書（timestampがあれば先頭）"""
+        data: Dict[str, Any] = {'timestamp': self.timestamp} if self.timestamp else {}
+        data['course'] = self.course
+        data['result'] = self.result
+        data['detail'] = {'payed': self.payed, 'gain': self.gain}
+        data['typing'] = {'correct': self.correct, 'avarageTPS': self.avarageTPS, 'miss': self.miss}
+        return data
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """スコアJSONの文字列（json.dumps(to_dict(), indent=indent, ensure_ascii=False) と同じ内容。
+
+        indentがNoneの場合は区切りの空白を入れない1行の形式）
+        """
+        if not indent:
+            head = f'{{"timestamp":{encode_basestring(self.timestamp)},' if self.timestamp else '{'
+            return (f'{head}"course":{encode_basestring(self.course)},"result":{self.result!r},'
+                    f'"detail":{{"payed":{self.payed!r},"gain":{self.gain!r}}},'
+                    f'"typing":{{"correct":{self.correct!r},"avarageTPS":{_number(self.avarageTPS)},'
+                    f'"miss":{self.miss!r}}}}}')
+        i1 = ' ' * indent
+        i2 = i1 * 2
+        head = f'{{\n{i1}"timestamp": {encode_basestring(self.timestamp)},\n' if self.timestamp else '{\n'
+        return (f'{head}{i1}"course": {encode_basestring(self.course)},\n{i1}"result": {self.result!r},\n'
+                f'{i1}"detail": {{\n{i2}"payed": {self.payed!r},\n{i2}"gain": {self.gain!r}\n{i1}}},\n'
+                f'{i1}"typing": {{\n{i2}"correct": {self.correct!r},\n'
+                f'{i2}"avarageTPS": {_number(self.avarageTPS)},\n{i2}"miss": {self.miss!r}\n{i1}}}\n}}')
+
+    def csv_row(self) -> tuple:
+        return (self.timestamp or '', self.course, self.result, self.payed, self.gain,
+                self.correct, self.avarageTPS, self.miss)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ScoreResult):
+            return NotImplemented
+        return self.csv_row() == other.csv_row()
+
+    def __repr__(self) -> str:
+        return f"ScoreResult({self.to_json(indent=None)})"
+
+
+def dumps_json(data: Any, indent: Optional[int] = 2) -> str:
+    """汎用的なJSON出力（ScoreResultはそのまま、辞書などはorjsonがあればorjsonで）
+
+    orjsonのインデントは2固定のため、それ以外の幅は標準のjsonで出力する。
+    出力が標準のjsonと異なりうる値（指数表記の小数・NaNなど）を含む場合も標準のjsonで出力し直す
+    """
+    if isinstance(data, ScoreResult):
+        return data.to_json(indent)
+    if orjson is not None and indent in (None, 2):
+        option = orjson.OPT_INDENT_2 if indent else 0
+        try:
+            encoded = orjson.dumps(data, option=option)
+        except TypeError:
+            # orjsonが扱えない値（64bitを超える整数など）は標準のjsonに任せる
+            pass
+        else:
+            if not _ORJSON_MISMATCH.search(encoded):
+                return encoded.decode('utf-8')
+    separators = None if indent else (',', ':')
+    return json.dumps(data, indent=indent, ensure_ascii=False, separators=separators)
+
+
+def write_json(result: ScoreResult, output_path: Path, indent: int = 2):
+    """スコアを1ファイルのJSONとして保存"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(result.to_json(indent))
+
+
+def write_ndjson(results: Iterable[ScoreResult], f: TextIO) -> int:
+    """1行に1件のJSON（NDJSON）を書き出し、件数を返す"""
+    count = 0
+    for result in results:
+        f.write(result.to_json(indent=None))
+        f.write('\n')
+        count += 1
+    return count
+
+
+def write_csv(results: Iterable[ScoreResult], f: TextIO) -> int:
+    """ヘッダー付きのCSVを書き出し、件数を返す（fは newline='' で開く）"""
+    writer = csv.writer(f)
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for result in results:
+        writer.writerow(result.csv_row())
+        count += 1
+    return count
+
+
+def save_results(results: List[ScoreResult], output_path: Path, output_format: str) -> int:
+    """複数のスコアをCSV/NDJSONの1ファイルに保存"""
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        if output_format == 'csv':
+            return write_csv(results, f)
+        return write_ndjson(results, f)
+
+
+def _synthetic_results(count: int, seed: int = 0) -> List[ScoreResult]:
+    rng = random.Random(seed)
+    results = []
+    for index in range(count):
+        course, payed = rng.choice([('お手軽', 3000), ('普通', 5000), ('高級', 10000)])
+        gain = rng.randint(0, payed * 2)
+        results.append(ScoreResult(
+            course=course, result=gain - payed, payed=payed, gain=gain,
+            correct=rng.randint(10, 400), avarageTPS=round(rng.uniform(0.5, 8.0), 1),
+            miss=rng.randint(0, 50),
+            timestamp=f"2025-{index % 12 + 1:02d}-{index % 28 + 1:02d}T12:00:00"))
+    return results
+
+
+def _legacy_csv(items: List[Dict], f: TextIO):
+    """従来の出力（内部フィールドを除いた辞書のコピーを平らな辞書にしてDictWriterで書く）"""
+    writer = csv.DictWriter(f, fieldnames=list(CSV_COLUMNS))
+    writer.writeheader()
+    for item in items:
+        clean = {k: v for k, v in item.items() if k not in ['output_filename']}
+        writer.writerow({
+            'timestamp': clean.get('timestamp', ''),
+            'course': clean.get('course', ''),
+            'result': clean.get('result', 0),
+            'payed': clean.get('detail', {}).get('payed', 0),
+            'gain': clean.get('detail', {}).get('gain', 0),
+            'correct': clean.get('typing', {}).get('correct', 0),
+            'avarageTPS': clean.get('typing', {}).get('avarageTPS', 0.0),
+            'miss': clean.get('typing', {}).get('miss', 0),
+        })
+
+
+def benchmark_serializers(count: int, seed: int = 0) -> List[Dict]:
+    """count件のスコアをJSON（1件ずつ）・NDJSON・CSVに出力する時間を従来の辞書経由の出力と比較
+
+    出力先はメモリ上のバッファ（ディスクの速度を含めない）
+    """
+    results = _synthetic_results(count, seed)
+    items = [dict(r.to_dict(), output_filename=f"{index}.json") for index, r in enumerate(results)]
+
+    def legacy_json():
+        for item in items:
+            clean = {k: v for k, v in item.items() if k not in ['output_filename']}
+            json.dumps(clean, indent=2, ensure_ascii=False)
+
+    def legacy_ndjson():
+        buffer = io.StringIO()
+        for item in items:
+            clean = {k: v for k, v in item.items() if k not in ['output_filename']}
+            buffer.write(json.dumps(clean, ensure_ascii=False))
+            buffer.write('\n')
+
+    cases = [
+        ('json', 'dict + json', legacy_json),
+        ('json', 'ScoreResult', lambda: [r.to_json() for r in results]),
+        ('ndjson', 'dict + json', legacy_ndjson),
+        ('ndjson', 'ScoreResult', lambda: write_ndjson(results, io.StringIO())),
+        ('csv', 'dict + DictWriter', lambda: _legacy_csv(items, io.StringIO(newline=''))),
+        ('csv', 'ScoreResult', lambda: write_csv(results, io.StringIO(newline=''))),
+    ]
+    if orjson is not None:
+        cases.insert(2, ('json', 'dict + orjson', lambda: [dumps_json(r.to_dict()) for r in results]))
+
+    rows = []
+    for output_format, method, func in cases:
+        started = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - started
+        rows.append({'format': output_format, 'method': method, 'seconds': seconds,
+                     'per_second': count / seconds if seconds else 0.0})
+    return rows
@@ -0,0 +1,326 @@
+import json
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+from .metrics import Histogram, render_metric
+from .ocr import SushidaOCR
+from .parser import SushidaResultParser, overall_confidence
+from .pipeline import TieredExtractor
+from .profiles import PipelineProfile
+from .workers import configure_worker_threads, threads_per_worker
+
+# 1リクエストで受け付ける画像の最大サイズ
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+class ExtractionJob:
+    """キューに積まれる1件分の解析依頼"""
+
+    __slots__ = ('data', 'future', 'enqueued_at')
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class ExtractionService:
+    """OCR済みの状態を保ったワーカーで画像を解析するサービス
+
+    各ワーカーはキューから最大 max_batch 件をまとめて取り出し（最初の1件から
+    max_wait 秒だけ後続を待つ）、同じ SushidaOCR / パーサーでまとめて処理する
+    （同じサイズの画像の前処理は1回で行う）。
+    """
+
+    def __init__(self, workers: int = 2, max_batch: int = 4, max_wait: float = 0.005,
+                 start_tier: str = 'fast', min_confidence: float = 0.5, debug: bool = False,
+                 auto_crop: bool = True, profile: Optional[PipelineProfile] = None):
+        self.workers = max(1, workers)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.start_tier = start_tier
+        self.min_confidence = min_confidence
+        self.debug = debug
+        self.auto_crop = auto_crop
+        self.profile = profile or PipelineProfile()
+
+        self.jobs: 'queue.Queue[Optional[ExtractionJob]]' = queue.Queue()
+        self.request_latency = Histogram()
+        self.queue_wait = Histogram()
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.outcomes: Dict[str, int] = {'success': 0, 'unparsed': 0, 'error': 0, 'timeout': 0}
+        self.tiers: Dict[str, int] = {}
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """ワーカースレッドを起動（OCRエンジンの初期化もここで済ませる）"""
+        # ワーカーが同時に起動するTesseractのスレッドがコア数を超えないようにする
+        configure_worker_threads(threads_per_worker(self.workers))
+        for index in range(self.workers):
+            ocr = SushidaOCR(debug=self.debug, auto_crop=self.auto_crop, settings=self.profile.ocr)
+            parser = SushidaResultParser(debug=self.debug, settings=self.profile.parser)
+            extractor = TieredExtractor(ocr, parser,
+                                        min_confidence=self.min_confidence,
+                                        start_tier=self.start_tier)
+            thread = threading.Thread(target=self._worker_loop, args=(extractor,),
+                                      name=f"ocr-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """ワーカースレッドを停止"""
+        for _ in self._threads:
+            self.jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, data: bytes) -> Future:
+        """画像データを解析キューに積む"""
+        job = ExtractionJob(data)
+        self.jobs.put(job)
+        return job.future
+
+    def _collect_batch(self, first: ExtractionJob) -> Tuple[List[ExtractionJob], bool]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _worker_loop(self, extractor: TieredExtractor):
+        while True:
+            first = self.jobs.get()
+            if first is None:
+                return
+            batch, stopping = self._collect_batch(first)
+            # 待ち時間切れで取り消されたリクエストは処理しない（処理中にしたものは取り消せなくなる）
+            batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            if not batch:
+                if stopping:
+                    return
+                continue
+            self.batch_sizes.observe(len(batch))
+
+            now = time.perf_counter()
+            for job in batch:
+                self.queue_wait.observe(now - job.enqueued_at)
+            with self._lock:
+                self.in_flight += len(batch)
+            try:
+                self._extract_batch(extractor, batch)
+            finally:
+                with self._lock:
+                    self.in_flight -= len(batch)
+            if stopping:
+                return
+
+    def _extract_batch(self, extractor: TieredExtractor, batch: List[ExtractionJob]):
+        """取り出した画像をまとめて処理（同じサイズの画像の前処理は1回で行う）
+
+        デコードできない画像はその画像だけを失敗にし、まとめた処理で例外が起きた場合は
+        1枚ずつ処理し直して、失敗した画像だけに例外を返す。
+        切り出した画像の結果を採用できない場合は切り出さずに再処理する
+        """
+        decoded = []
+        for job in batch:
+            try:
+                decoded.append((job, extractor.ocr.decode_image(job.data)))
+            except Exception as e:
+                job.future.set_exception(e)
+        if len(decoded) > 1:
+            try:
+                outcomes = extractor.extract_batch([img for _, img in decoded])
+            except Exception:
+                pass
+            else:
+                for (job, _), outcome in zip(decoded, outcomes):
+                    job.future.set_result(self._retry_uncropped(extractor, job, outcome))
+                return
+        for job, img in decoded:
+            try:
+                outcome = extractor.extract_array(img)
+            except Exception as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(self._retry_uncropped(extractor, job, outcome))
+
+    @staticmethod
+    def _retry_uncropped(extractor: TieredExtractor, job: ExtractionJob,
+                         outcome: Tuple[Optional[Dict], Dict, Optional[str]]):
+        if not extractor.ocr.auto_crop or extractor.accepts(outcome[0], outcome[1]):
+            return outcome
+        try:
+            retried = extractor.extract_uncropped(extractor.ocr.decode_image(job.data, crop=False), outcome)
+        except Exception:
+            retried = None
+        return retried or outcome
+
+    def record(self, outcome: str, elapsed: float, tier: Optional[str] = None):
+        """リクエスト単位の結果と処理時間を記録"""
+        self.request_latency.observe(elapsed)
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if tier:
+                self.tiers[tier] = self.tiers.get(tier, 0) + 1
+
+    def render_metrics(self) -> str:
+        """/metrics 用のPrometheusテキスト"""
+        with self._lock:
+            outcomes = dict(self.outcomes)
+            tiers = dict(self.tiers)
+            in_flight = self.in_flight
+
+        lines: List[str] = []
+        lines += self.request_latency.render(
+            'sushida_request_duration_seconds', '解析リクエストの処理時間（キュー待ちを含む）')
+        lines += self.queue_wait.render(
+            'sushida_queue_wait_seconds', 'ワーカーが取り出すまでのキュー待ち時間')
+        lines += self.batch_sizes.render(
+            'sushida_batch_size', 'ワーカーが一度に取り出した件数')
+        lines += render_metric('sushida_queue_depth', 'gauge', '処理待ちの件数', self.jobs.qsize())
+        lines += render_metric('sushida_in_flight', 'gauge', '処理中の件数', in_flight)
+        lines += render_metric('sushida_workers', 'gauge', 'ワーカー数', self.workers)
+        lines += render_metric('sushida_profile_info', 'gauge', '使用中のパイプラインプロファイル', 1,
+                               {'profile': self.profile.name, 'fingerprint': self.profile.fingerprint})
+        for index, (outcome, count) in enumerate(sorted(outcomes.items())):
+            lines += render_metric('sushida_requests_total', 'counter', '結果別のリクエスト数',
+                                   count, {'outcome': outcome}, header=index == 0)
+        for index, (tier, count) in enumerate(sorted(tiers.items())):
+            lines += render_metric('sushida_tier_resolved_total', 'counter', '処理段別の確定件数',
+                                   count, {'tier': tier}, header=index == 0)
+        return '\n'.join(lines) + '\n'
+
+
+def make_handler(service: ExtractionService, timeout: float = 60.0, read_timeout: float = 10.0):
+    """ExtractionServiceを使うリクエストハンドラクラスを生成
+
+    timeout 秒以内に結果が出なければ504を返し、まだキューにあるリクエストは取り消す。
+    ソケットの読み書きが read_timeout 秒止まった場合は接続を切る（本文の途中なら408を返す）
+    """
+
+    class ExtractionHandler(BaseHTTPRequestHandler):
+        server_version = 'sushida-ocr'
+        # Content-Lengthより少ないデータしか送らないクライアントがスレッドを占有し続けないようにする
+        timeout = read_timeout
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, data: Dict):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self._send(status, body, 'application/json; charset=utf-8')
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send(200, service.render_metrics().encode('utf-8'),
+                           'text/plain; version=0.0.4; charset=utf-8')
+            elif self.path == '/healthz':
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/extract':
+                self._send_json(404, {'error': 'not found'})
+                return
+
+            started = time.perf_counter()
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                self._send_json(400, {'error': 'Content-Lengthが不正です'})
+                return
+            if length <= 0 or length > MAX_IMAGE_BYTES:
+                self._send_json(400, {'error': '画像データが空か、大きすぎます'})
+                return
+
+            try:
+                data = self.rfile.read(length)
+            except socket.timeout:
+                data = None
+            if data is None or len(data) < length:
+                # 続きを読めない接続は使い回さない
+                self.close_connection = True
+                service.record('incomplete', time.perf_counter() - started)
+                self._send_json(408, {'error': f'{read_timeout:g}秒以内に画像データを受信できませんでした'})
+                return
+            future = service.submit(data)
+            try:
+                result, provenance, tier = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                service.record('timeout', time.perf_counter() - started)
+                self._send_json(504, {'error': f'{timeout:g}秒以内に解析が終わりませんでした'})
+                return
+            except Exception as e:
+                service.record('error', time.perf_counter() - started)
+                self._send_json(422, {'error': str(e) or type(e).__name__})
+                return
+
+            if not result:
+                service.record('unparsed', time.perf_counter() - started)
+                self._send_json(422, {'error': 'スコアデータを抽出できませんでした'})
+                return
+
+            service.record('success', time.perf_counter() - started, tier)
+            self._send_json(200, {
+                'result': result,
+                'tier': tier,
+                'profile': service.profile.name,
+                'confidence': overall_confidence(provenance),
+                'provenance': provenance,
+            })
+
+        def log_message(self, format, *args):
+            if service.debug:
+                super().log_message(format, *args)
+
+    return ExtractionHandler
+
+
+def create_server(service: ExtractionService, host: str = '127.0.0.1', port: int = 8765,
+                  timeout: float = 60.0, read_timeout: float = 10.0) -> ThreadingHTTPServer:
+    """HTTPサーバーを生成（port=0 で空きポートを自動割り当て）"""
+    server = ThreadingHTTPServer((host, port), make_handler(service, timeout, read_timeout))
+    server.daemon_threads = True
+    return server
+
+
+def run_server(service: ExtractionService, host: str, port: int, timeout: float = 60.0,
+               read_timeout: float = 10.0):
+    """サーバーを起動してCtrl+Cまで処理を続ける"""
+    service.start()
+    server = create_server(service, host, port, timeout, read_timeout)
+    bound_host, bound_port = server.server_address[:2]
+    click.echo(f"🍣 解析サーバーを起動: http://{bound_host}:{bound_port}")
+    click.echo("   POST /extract（画像データ）, GET /metrics, GET /healthz")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        click.echo("\n⚠️  サーバーを停止します")
+    finally:
+        server.server_close()
+        service.stop()
@@ -0,0 +1,181 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .ocr import SushidaOCR
+
+
+def group_by_shape(images: Sequence[np.ndarray]) -> Dict[Tuple[int, ...], List[int]]:
+    """同じ形（高さ・幅・チャンネル数）の画像のインデックスをまとめる（最初に現れた順）"""
+    groups: Dict[Tuple[int, ...], List[int]] = OrderedDict()
+    for index, img in enumerate(images):
+        groups.setdefault(img.shape, []).append(index)
+    return groups
+
+
+def _rows(stack: np.ndarray, radius: int, mode: str, func: Callable[[np.ndarray], np.ndarray],
+          value: int = 0) -> np.ndarray:
+    """(N, H, W) の画像を縦に並べた1枚の大きな画像に近傍処理を1回だけ適用
+
+    画像の境目には各画像の上下を radius 行だけ拡張した行を挟むため、各画像の結果は
+    1枚ずつ処理した場合と同じになる（mode は np.pad の指定。reflect は OpenCV の
+    BORDER_REFLECT_101、edge は BORDER_REPLICATE に相当）。左右の端は画像の幅が
+    共通なので OpenCV 側の境界処理がそのまま使われる。
+    """
+    count, height, width = stack.shape
+    if radius:
+        pad = ((0, 0), (radius, radius), (0, 0))
+        if mode == 'constant':
+            stack = np.pad(stack, pad, mode='constant', constant_values=value)
+        else:
+            stack = np.pad(stack, pad, mode=mode)
+    else:
+        stack = np.ascontiguousarray(stack)
+    tall = func(stack.reshape(count * (height + 2 * radius), width))
+    return tall.reshape(count, height + 2 * radius, width)[:, radius:radius + height]
+
+
+def bilateral_radius(diameter: int, sigma_space: float) -> int:
+    """cv2.bilateralFilter が実際に使う近傍の半径（d<=0 なら sigma_space から決まり、最小1）"""
+    radius = diameter // 2 if diameter > 0 else int(round(sigma_space * 1.5))
+    return max(radius, 1)
+
+
+# これより小さい半径（直径5以下）では、OpenCVがIPPの実装に切り替える場合がある。
+# IPPの実装は画像の四隅の境界処理が異なり、行を挟んで縦に並べても1枚ずつの結果と一致しないため、
+# この場合は1枚ずつ処理する
+MIN_STACKED_BILATERAL_RADIUS = 3
+
+
+def _resize_each(images: Sequence[np.ndarray], size: Tuple[int, int], interpolation: int) -> np.ndarray:
+    """画像を1枚ずつ縮尺変更し、重ねた (N, H, W, C) に直接書き込む
+
+    チャンネル方向に重ねて1回で処理すると、3チャンネルとは別の実装になって結果が僅かに変わるため
+    """
+    new_width, new_height = size
+    first = images[0]
+    resized = np.empty((len(images), new_height, new_width) + first.shape[2:], dtype=first.dtype)
+    for index, img in enumerate(images):
+        cv2.resize(img, size, dst=resized[index], interpolation=interpolation)
+    return resized
+
+
+def preprocess_stack(ocr: SushidaOCR, images: Sequence[np.ndarray], threshold: str = 'adaptive',
+                     target_width: int = 0) -> np.ndarray:
+    """同じ形のBGR画像を (N, H, W, 3) に重ね、preprocess_array と同じ処理をまとめて適用
+
+    画素ごとの処理（グレースケール化・ガンマ補正）は全体に1回、近傍を参照する処理
+    （ノイズ除去・シャープニング・適応的二値化・クロージング）は縦に並べた大きな画像に
+    1回ずつ適用する。OpenCVの内部の並列化は大きな画像ほど効く。
+    ただしノイズ除去の直径が小さい（fastプロファイルの d=5 など）場合は、ノイズ除去だけ1枚ずつ行う。
+    戻り値: 二値化済みの (N, H', W')。各画像の結果は preprocess_array と一致する
+    """
+    settings = ocr.settings
+    target_width = target_width or settings.target_width
+    count = len(images)
+    height, width = images[0].shape[:2]
+
+    # 1. 拡大（拡大後の画像を重ねた配列に直接書き込む）
+    if width < target_width:
+        scale = target_width / width
+        stack = _resize_each(images, (int(width * scale), int(height * scale)), cv2.INTER_CUBIC)
+        height, width = stack.shape[1:3]
+    else:
+        stack = np.stack(images)
+
+    # 2. グレースケール変換（縦に並べた1枚として）
+    gray = cv2.cvtColor(stack.reshape(count * height, width, 3), cv2.COLOR_BGR2GRAY)
+    gray = gray.reshape(count, height, width)
+
+    # 3. ノイズ除去（bilateralFilterの既定の境界は BORDER_REFLECT_101）
+    diameter = settings.bilateral_diameter
+    radius = bilateral_radius(diameter, settings.bilateral_sigma_space)
+    with ocr.timed('bilateral'):
+        if radius < MIN_STACKED_BILATERAL_RADIUS:
+            denoised = np.empty_like(gray)
+            for index in range(count):
+                cv2.bilateralFilter(gray[index], diameter, settings.bilateral_sigma_color,
+                                    settings.bilateral_sigma_space, dst=denoised[index])
+        else:
+            denoised = _rows(gray, radius, 'reflect', lambda tall: cv2.bilateralFilter(
+                tall, diameter, settings.bilateral_sigma_color, settings.bilateral_sigma_space))
+
+    # 4. ガンマ補正
+    enhanced = cv2.LUT(np.ascontiguousarray(denoised).reshape(count * height, width), ocr.gamma_table)
+    enhanced = enhanced.reshape(count, height, width)
+
+    # 5. シャープニング
+    if settings.sharpen:
+        kernel = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+        enhanced = _rows(enhanced, 1, 'reflect', lambda tall: cv2.filter2D(tall, -1, kernel))
+
+    # 6. 二値化
+    if threshold == 'otsu':
+        # 大津の閾値は画像ごとのヒストグラムで決まるため1枚ずつ（切り出しはコピーしない）
+        binary = np.empty_like(enhanced)
+        for index in range(count):
+            _, binary[index] = cv2.threshold(enhanced[index], 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    else:
+        # adaptiveThresholdは内部で BORDER_REPLICATE のガウシアンぼかしを使う
+        block_size = settings.threshold_block_size
+        binary = _rows(enhanced, block_size // 2, 'edge', lambda tall: cv2.adaptiveThreshold(
+            tall, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, settings.threshold_c))
+
+    # 7. クロージング（膨張→収縮。境界は各演算で影響しない値で埋める）
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (settings.morph_kernel, settings.morph_kernel))
+    radius = settings.morph_kernel // 2
+    dilated = _rows(binary, radius, 'constant', lambda tall: cv2.dilate(tall, kernel), value=0)
+    processed = _rows(dilated, radius, 'constant', lambda tall: cv2.erode(tall, kernel), value=255)
+
+    # 8. 1x1の膨張は画像を変えないため省略
+    return processed
+
+
+def preprocess_batch(ocr: SushidaOCR, images: Sequence[np.ndarray],
+                     threshold: str = 'adaptive') -> List[np.ndarray]:
+    """複数の画像を形ごとにまとめて前処理し、入力と同じ順に二値化済みの画像を返す
+
+    同じ形の画像が1枚しかない場合やデバッグ時（中間画像を保存する）は preprocess_array で処理する
+    """
+    processed: List[np.ndarray] = [None] * len(images)
+    for shape, indices in group_by_shape(images).items():
+        if len(indices) == 1 or ocr.debug or len(shape) != 3 or shape[2] != 3:
+            for index in indices:
+                processed[index] = ocr.preprocess_array(images[index], threshold=threshold)
+            continue
+        group = [images[index] for index in indices]
+        for index, frame in zip(indices, preprocess_stack(ocr, group, threshold)):
+            processed[index] = np.ascontiguousarray(frame)
+    return processed
+
+
+def benchmark_preprocess(ocr: SushidaOCR, images: Sequence[np.ndarray], repeat: int = 3,
+                         threshold: str = 'adaptive', threads: Optional[int] = None) -> Dict[str, float]:
+    """1枚ずつの前処理とまとめた前処理の時間（repeat回の最小値）を比較し、結果が一致するか確認
+
+    threads: OpenCVのスレッド数（省略時はOpenCVの既定値のまま）
+    """
+    if threads:
+        cv2.setNumThreads(threads)
+
+    def best(func) -> Tuple[float, List[np.ndarray]]:
+        times, output = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = func()
+            times.append(time.perf_counter() - started)
+        return min(times), output
+
+    single_seconds, single = best(lambda: [ocr.preprocess_array(img, threshold=threshold) for img in images])
+    batch_seconds, batched = best(lambda: preprocess_batch(ocr, images, threshold))
+    return {
+        'images': len(images),
+        'threads': cv2.getNumThreads(),
+        'groups': len(group_by_shape(images)),
+        'single_seconds': single_seconds,
+        'batch_seconds': batch_seconds,
+        'identical': all(np.array_equal(a, b) for a, b in zip(single, batched)),
+    }
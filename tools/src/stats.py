@@ -0,0 +1,256 @@
+import json
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .storage import extract_date_from_name, score_timestamp, sync_score_files, valid_date
+
+STATE_VERSION = 1
+
+# TPSは0.1刻みのヒストグラムで保持し、パーセンタイルを近似する
+TPS_BIN_WIDTH = 0.1
+TPS_PERCENTILES = (50, 90, 99)
+
+# (date, course, result, payed, gain, correct, avarageTPS, miss)
+ScoreRecord = Tuple[str, str, int, int, int, int, float, int]
+
+
+def score_date(data: Dict, name: str, mtime: Optional[float] = None) -> str:
+    """スコアの日付（保存先のパーティションと同じ storage.score_timestamp の規則）
+
+    実行した日によって結果が変わらないように、今日の日付では補わない
+    """
+    return score_timestamp(data, name, mtime)[:10]
+
+
+def to_record(data: Dict, name: str, mtime: Optional[float] = None) -> ScoreRecord:
+    """スコアJSONを集計用のフラットなレコードに変換（mtime は日付が分からない場合に使う更新日時）"""
+    detail = data.get('detail', {})
+    typing = data.get('typing', {})
+    return (
+        score_date(data, name, mtime),
+        data.get('course', ''),
+        int(data.get('result', 0)),
+        int(detail.get('payed', 0)),
+        int(detail.get('gain', 0)),
+        int(typing.get('correct', 0)),
+        float(typing.get('avarageTPS', 0.0)),
+        int(typing.get('miss', 0)),
+    )
+
+
+def week_of(date_str: str) -> str:
+    """ISO週番号（YYYY-Www）を返す"""
+    year, week, _ = date.fromisoformat(date_str).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class RunningAggregate:
+    """加算・減算の両方がO(1)で行える集計値"""
+
+    __slots__ = (
+        'count', 'result_sum', 'payed_sum', 'gain_sum', 'correct_sum',
+        'miss_sum', 'tps_sum', 'result_counts', 'tps_bins'
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.result_sum = 0
+        self.payed_sum = 0
+        self.gain_sum = 0
+        self.correct_sum = 0
+        self.miss_sum = 0
+        self.tps_sum = 0.0
+        # 最高・最低スコアを取り消し可能にするため値ごとの件数を保持
+        self.result_counts: Dict[str, int] = {}
+        self.tps_bins: Dict[str, int] = {}
+
+    def apply(self, record: ScoreRecord, sign: int = 1):
+        """レコードを加算（sign=-1で取り消し）"""
+        _, _, result, payed, gain, correct, tps, miss = record
+        self.count += sign
+        self.result_sum += sign * result
+        self.payed_sum += sign * payed
+        self.gain_sum += sign * gain
+        self.correct_sum += sign * correct
+        self.miss_sum += sign * miss
+        self.tps_sum += sign * tps
+        self._bump(self.result_counts, str(result), sign)
+        self._bump(self.tps_bins, str(int(round(tps / TPS_BIN_WIDTH))), sign)
+
+    @staticmethod
+    def _bump(counter: Dict[str, int], key: str, sign: int):
+        value = counter.get(key, 0) + sign
+        if value > 0:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
+
+    def tps_percentile(self, percentile: int) -> float:
+        """ヒストグラムからTPSのパーセンタイルを求める"""
+        if self.count <= 0:
+            return 0.0
+        threshold = self.count * percentile / 100.0
+        cumulative = 0
+        for bin_index in sorted(int(k) for k in self.tps_bins):
+            cumulative += self.tps_bins[str(bin_index)]
+            if cumulative >= threshold:
+                return round(bin_index * TPS_BIN_WIDTH, 1)
+        return 0.0
+
+    def summary(self) -> Dict:
+        """フロントエンド向けの統計値（Statistics型に準拠）"""
+        if self.count <= 0:
+            return {'totalGames': 0}
+        results = [int(k) for k in self.result_counts]
+        typed = self.correct_sum + self.miss_sum
+        return {
+            'totalGames': self.count,
+            'totalResult': self.result_sum,
+            'averageScore': round(self.result_sum / self.count, 2),
+            'bestScore': max(results),
+            'worstScore': min(results),
+            'totalPayed': self.payed_sum,
+            'totalGain': self.gain_sum,
+            'averageAccuracy': round(self.correct_sum / typed * 100, 2) if typed else 0.0,
+            'missRate': round(self.miss_sum / typed, 4) if typed else 0.0,
+            'averageTPS': round(self.tps_sum / self.count, 2),
+            'tpsPercentiles': {
+                f"p{p}": self.tps_percentile(p) for p in TPS_PERCENTILES
+            },
+            'totalCorrectTypes': self.correct_sum,
+            'totalMissTypes': self.miss_sum,
+        }
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RunningAggregate':
+        aggregate = cls()
+        for name in cls.__slots__:
+            if name in data:
+                setattr(aggregate, name, data[name])
+        return aggregate
+
+
+class ScoreStatistics:
+    """スコアの日次・週次・コース別集計を状態ファイルで増分管理するクラス"""
+
+    def __init__(self, state_path: Path):
+        self.state_path = Path(state_path)
+        # key（scoreディレクトリからの相対パス） -> [fingerprint, record]
+        self.entries: Dict[str, List] = {}
+        self.buckets: Dict[str, RunningAggregate] = {}
+        self.load()
+
+    def load(self):
+        """状態ファイルを読み込み（存在しない・壊れている場合は空から開始）"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if state.get('version') != STATE_VERSION:
+            return
+        self.entries = state.get('entries', {})
+        self.buckets = {
+            key: RunningAggregate.from_dict(value)
+            for key, value in state.get('buckets', {}).items()
+        }
+
+    def save(self):
+        """状態ファイルをアトミックに保存"""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            'version': STATE_VERSION,
+            'entries': self.entries,
+            'buckets': {key: agg.to_dict() for key, agg in self.buckets.items()},
+        }
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _bucket_keys(record: ScoreRecord) -> Iterable[str]:
+        day, course = record[0], record[1]
+        yield 'total'
+        yield f"daily:{day}"
+        yield f"weekly:{week_of(day)}"
+        yield f"course:{course}"
+
+    def _apply(self, record: ScoreRecord, sign: int):
+        for key in self._bucket_keys(record):
+            aggregate = self.buckets.get(key)
+            if aggregate is None:
+                aggregate = self.buckets[key] = RunningAggregate()
+            aggregate.apply(record, sign)
+            if aggregate.count <= 0:
+                del self.buckets[key]
+
+    def upsert(self, key: str, record: ScoreRecord, fingerprint: str = '') -> bool:
+        """レコードを追加・更新（既存の寄与は取り消してから加算）"""
+        previous = self.entries.get(key)
+        if previous is not None:
+            if previous[0] == fingerprint and fingerprint:
+                return False
+            self._apply(tuple(previous[1]), -1)
+        self._apply(record, 1)
+        self.entries[key] = [fingerprint, list(record)]
+        return True
+
+    def remove(self, key: str) -> bool:
+        """レコードを削除"""
+        previous = self.entries.pop(key, None)
+        if previous is None:
+            return False
+        self._apply(tuple(previous[1]), -1)
+        return True
+
+    def is_current(self, key: str, fingerprint: str) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry[0] == fingerprint
+
+    def sync_directory(self, score_dir: Path) -> Dict[str, int]:
+        """scoreディレクトリと状態を同期（変更があったファイルのみ読み込む）"""
+        score_dir = Path(score_dir)
+        return sync_score_files(
+            score_dir,
+            keys=lambda: iter(self.entries),
+            is_current=self.is_current,
+            upsert=lambda key, data, fingerprint: self.upsert(
+                key, to_record(data, key, (score_dir / key).stat().st_mtime), fingerprint),
+            remove=self.remove,
+        )
+
+    def _series(self, prefix: str) -> List[Dict]:
+        series = []
+        for key in sorted(k for k in self.buckets if k.startswith(prefix)):
+            item = {'period': key[len(prefix):]}
+            item.update(self.buckets[key].summary())
+            series.append(item)
+        return series
+
+    def export(self) -> Dict:
+        """フロントエンドが読み込むコンパクトな集計JSONを生成"""
+        total = self.buckets.get('total', RunningAggregate())
+        return {
+            'version': STATE_VERSION,
+            'generatedAt': datetime.now().isoformat(timespec='seconds'),
+            'total': total.summary(),
+            'courses': {
+                key[len('course:'):]: agg.summary()
+                for key, agg in sorted(self.buckets.items())
+                if key.startswith('course:')
+            },
+            'daily': self._series('daily:'),
+            'weekly': self._series('weekly:'),
+        }
+
+    def write_export(self, output_path: Path, data: Optional[Dict] = None):
+        """集計JSONをミニファイして保存"""
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(data or self.export(), f, ensure_ascii=False, separators=(',', ':'))
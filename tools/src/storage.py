@@ -0,0 +1,285 @@
+import json
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from PIL import Image
+
+from .archives import ArchiveMember, ImageSource
+from .results import ScoreResult, dumps_json
+from .utils import is_score_file
+
+# EXIFのタグ番号
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 36867
+EXIF_DATETIME = 306
+
+# 更新直後のファイルは同じ時刻のまま再び変更される可能性があるため、指紋を記録しない
+RECENT_CHANGE_NS = 2_000_000_000
+
+_PARTITION_YEAR = re.compile(r'^\d{4}$')
+_PARTITION_MONTH = re.compile(r'^(0[1-9]|1[0-2])$')
+
+# ファイル名の日付（YYYYMMDD）と、その直後の時刻（[_-]HHMMSS）
+_NAME_DATE = re.compile(r'(\d{4})(\d{2})(\d{2})')
+_NAME_TIME = re.compile(r'[_-]?(\d{2})(\d{2})(\d{2})(?!\d)')
+_NAME_ISO_DATE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+
+def _exif_timestamp(source: Union[Path, BinaryIO]) -> Optional[str]:
+    """EXIFの撮影日時（なければ更新日時）をISO形式で取得"""
+    try:
+        with Image.open(source) as img:
+            exif = img.getexif()
+            value = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    except Exception:
+        return None
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip('\x00 '), '%Y:%m:%d %H:%M:%S').isoformat()
+    except ValueError:
+        return None
+
+
+def valid_date(value: str) -> Optional[str]:
+    """YYYY-MM-DD の形式で実在する日付ならそのまま、そうでなければNone"""
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        return None
+    return day if day == value else None
+
+
+def filename_timestamp(name: str) -> Optional[str]:
+    """ファイル名の日付（YYYYMMDD[_HHMMSS] または YYYY-MM-DD）をISO形式で取得
+
+    実在しない日付（20251399 など）は飛ばして次の候補を探す。時刻が不正なら日付だけを使う
+    """
+    for match in _NAME_DATE.finditer(name):
+        try:
+            day = datetime(*(int(value) for value in match.groups()))
+        except ValueError:
+            continue
+        clock = _NAME_TIME.match(name, match.end())
+        if clock:
+            try:
+                hour, minute, second = (int(value) for value in clock.groups())
+                return day.replace(hour=hour, minute=minute, second=second).isoformat()
+            except ValueError:
+                pass
+        return day.isoformat()
+    for match in _NAME_ISO_DATE.finditer(name):
+        day = valid_date(match.group(1))
+        if day:
+            return f"{day}T00:00:00"
+    return None
+
+
+def extract_date_from_name(name: str) -> Optional[str]:
+    """ファイル名から日付（YYYY-MM-DD）を抽出（フロントエンドと同じ規則。実在しない日付は除く）"""
+    timestamp = filename_timestamp(name)
+    return timestamp[:10] if timestamp else None
+
+
+def capture_timestamp(image_path: ImageSource) -> Tuple[str, str]:
+    """画像の撮影時刻と取得元（exif / filename / mtime）
+
+    スクリーンショットのコピーで変わる更新日時より、ファイル名の日付を優先する。
+    アーカイブのメンバーはメンバー名と、アーカイブに記録された更新日時を使う
+    """
+    member = isinstance(image_path, ArchiveMember)
+    timestamp = _exif_timestamp(image_path.open() if member else image_path)
+    if timestamp:
+        return timestamp, 'exif'
+    timestamp = filename_timestamp(image_path.name)
+    if timestamp:
+        return timestamp, 'filename'
+    mtime = image_path.mtime if member else image_path.stat().st_mtime
+    return datetime.fromtimestamp(mtime).replace(microsecond=0).isoformat(), 'mtime'
+
+
+def stamp_capture_time(result: Dict, image_path: ImageSource) -> str:
+    """結果の先頭に撮影時刻（timestamp）を設定し、取得元を返す"""
+    timestamp, source = capture_timestamp(image_path)
+    stamped = {'timestamp': timestamp}
+    stamped.update((k, v) for k, v in result.items() if k != 'timestamp')
+    result.clear()
+    result.update(stamped)
+    return source
+
+
+def score_timestamp(data: Union[Dict, ScoreResult], name: str, mtime: Optional[float] = None) -> str:
+    """保存済みスコアの時刻（timestamp → ファイル名 → ファイルの更新日時 mtime の順）
+
+    実在する日付で始まる timestamp だけを使う。実行した日によって保存先や集計が変わらないように、
+    どれからも日付が決まらなければ今日の日付では補わずに ValueError を送出する
+    """
+    if isinstance(data, ScoreResult):
+        timestamp = data.timestamp
+    else:
+        timestamp = data.get('timestamp') if isinstance(data, dict) else None
+    if isinstance(timestamp, str) and valid_date(timestamp[:10]):
+        return timestamp
+    timestamp = filename_timestamp(PurePosixPath(name).name)
+    if timestamp:
+        return timestamp
+    if mtime is None:
+        raise ValueError(f"スコアの日付を決められません: {name}")
+    return datetime.fromtimestamp(mtime).replace(microsecond=0).isoformat()
+
+
+def partition_of(timestamp: str) -> str:
+    """時刻が属するパーティション（YYYY/MM）"""
+    return f"{timestamp[:4]}/{timestamp[5:7]}"
+
+
+def score_key(score_dir: Path, path: Path) -> str:
+    """scoreディレクトリからの相対パス（状態ファイルやbundle.jsonのキー）"""
+    return Path(os.path.relpath(path, score_dir)).as_posix()
+
+
+def score_path(score_dir: Path, filename: str, data: Union[Dict, ScoreResult]) -> Path:
+    """スコアの保存先（score/YYYY/MM/ファイル名。日付が決まらなければ ValueError）"""
+    return Path(score_dir) / partition_of(score_timestamp(data, filename)) / filename
+
+
+def save_score(score_dir: Path, filename: str, data: Union[Dict, ScoreResult]) -> Path:
+    """スコアを年/月のパーティションにアトミックに保存
+
+    同名の旧レイアウト（score直下）のファイルは置き換えたものとして削除する
+    """
+    path = score_path(score_dir, filename, data)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(dumps_json(data))
+    os.replace(tmp_path, path)
+
+    legacy_path = Path(score_dir) / filename
+    if legacy_path.is_file():
+        legacy_path.unlink()
+    return path
+
+
+def iter_partitions(score_dir: Path, since: Optional[str] = None,
+                    until: Optional[str] = None) -> Iterator[Tuple[str, Path]]:
+    """(パーティション名, ディレクトリ) を古い順に列挙
+
+    旧レイアウトのscore直下は '' として最初に返す。since/until（YYYY-MM-DD）を
+    指定すると、範囲と重ならない月のディレクトリは開かない。
+    """
+    score_dir = Path(score_dir)
+    yield '', score_dir
+    first_month = since[:7] if since else None
+    last_month = until[:7] if until else None
+    with os.scandir(score_dir) as it:
+        years = sorted(e.name for e in it if e.is_dir() and _PARTITION_YEAR.match(e.name))
+    for year in years:
+        if (first_month and year < first_month[:4]) or (last_month and year > last_month[:4]):
+            continue
+        with os.scandir(score_dir / year) as it:
+            months = sorted(e.name for e in it if e.is_dir() and _PARTITION_MONTH.match(e.name))
+        for month in months:
+            name = f"{year}-{month}"
+            if (first_month and name < first_month) or (last_month and name > last_month):
+                continue
+            yield f"{year}/{month}", score_dir / year / month
+
+
+def file_fingerprint(stat: os.stat_result) -> str:
+    """ファイルの内容の変更で変わる指紋（更新日時とサイズ）"""
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def iter_score_files(score_dir: Path, since: Optional[str] = None,
+                     until: Optional[str] = None) -> Iterator[Path]:
+    """scoreディレクトリ（旧レイアウトを含む）のスコアファイルを古いパーティションから順に列挙"""
+    for _, directory in iter_partitions(score_dir, since, until):
+        with os.scandir(directory) as it:
+            names = sorted(e.name for e in it if e.is_file() and is_score_file(e.name))
+        for name in names:
+            yield directory / name
+
+
+def sync_score_files(
+    score_dir: Path,
+    keys: Callable[[], Iterator[str]],
+    is_current: Callable[[str, str], bool],
+    upsert: Callable[[str, Dict, str], bool],
+    remove: Callable[[str], bool],
+) -> Dict[str, int]:
+    """スコアファイルと保持しているエントリを同期（変更があったファイルのみ読み込む）
+
+    毎回すべてのパーティションを走査して各ファイルの更新日時とサイズ（stat 1回）を確認し、
+    変わったファイルだけを読み込む。ファイルをその場で書き換えてもディレクトリの更新日時は
+    変わらないため、パーティション単位で走査を省くことはしない（費用はファイル数に比例する stat のみ）。
+    更新直後のファイルは同じ更新日時のまま再び書き換えられる可能性があるため、指紋を記録せず次回も読み込む。
+    """
+    counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+    seen = set()
+    known = set(keys())
+    recent = time.time_ns() - RECENT_CHANGE_NS
+
+    for name, directory in iter_partitions(score_dir):
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file() or not is_score_file(entry.name):
+                    continue
+                key = f"{name}/{entry.name}" if name else entry.name
+                seen.add(key)
+                stat = entry.stat()
+                fingerprint = file_fingerprint(stat)
+                changing = stat.st_mtime_ns >= recent
+                if not changing and is_current(key, fingerprint):
+                    counts['unchanged'] += 1
+                    continue
+                data = load_score(entry.path)
+                if data is None:
+                    continue
+                existed = key in known
+                upsert(key, data, '' if changing else fingerprint)
+                counts['updated' if existed else 'added'] += 1
+
+    for key in known - seen:
+        remove(key)
+        counts['removed'] += 1
+    return counts
+
+
+def migrate_flat_scores(score_dir: Path) -> Dict[str, str]:
+    """score直下の旧レイアウトのスコアファイルを年/月のパーティションに移動
+
+    戻り値: 移動したファイル名 -> 移動先の相対パス
+    """
+    score_dir = Path(score_dir)
+    moved = {}
+    with os.scandir(score_dir) as it:
+        names = sorted(e.name for e in it if e.is_file() and is_score_file(e.name))
+    for name in names:
+        path = score_dir / name
+        data = load_score(path)
+        if data is None:
+            continue
+        try:
+            timestamp = score_timestamp(data, name, path.stat().st_mtime)
+        except (OSError, ValueError):
+            continue
+        destination = score_dir / partition_of(timestamp) / name
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, destination)
+        moved[name] = score_key(score_dir, destination)
+    return moved
+
+
+def load_score(path: Union[str, Path]) -> Optional[Dict]:
+    """スコアJSONを読み込み（読めない場合はNone）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
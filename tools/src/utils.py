@@ -1,19 +1,23 @@
 import json
-import csv
+import glob
+import itertools
+import os
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Dict, Iterable, Iterator, List, Union
 from datetime import datetime
 import click
 
+from .results import ScoreResult, dumps_json, write_csv
+
 
 class OutputFormatter:
     """出力フォーマッターユーティリティ"""
     
     @staticmethod
     def save_json(data: Union[Dict, List[Dict]], output_path: Path, indent: int = 2):
-        """JSON形式で保存"""
+        """JSON形式で保存（orjsonがインストールされていればorjsonで出力）"""
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.write(dumps_json(data, indent))
     
     @staticmethod
     def save_csv(data: Union[Dict, List[Dict]], output_path: Path):
@@ -25,29 +29,8 @@ class OutputFormatter:
         if not data:
             return
         
-        # CSVのヘッダーを定義
-        fieldnames = [
-            'timestamp', 'course', 'result', 'payed', 'gain',
-            'correct', 'avarageTPS', 'miss'
-        ]
-        
         with open(output_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for item in data:
-                # フラットな辞書に変換
-                flat_item = {
-                    'timestamp': item.get('timestamp', ''),
-                    'course': item.get('course', ''),
-                    'result': item.get('result', 0),
-                    'payed': item.get('detail', {}).get('payed', 0),
-                    'gain': item.get('detail', {}).get('gain', 0),
-                    'correct': item.get('typing', {}).get('correct', 0),
-                    'avarageTPS': item.get('typing', {}).get('avarageTPS', 0.0),
-                    'miss': item.get('typing', {}).get('miss', 0)
-                }
-                writer.writerow(flat_item)
+            write_csv((ScoreResult.from_dict(item) for item in data), f)
     
     @staticmethod
     def save_yaml(data: Union[Dict, List[Dict]], output_path: Path):
@@ -82,6 +65,27 @@ def load_json_results(file_path: Path) -> List[Dict]:
         return []
 
 
+def _provenance_manifest_path(output_dir: Path) -> Path:
+    # scoreディレクトリ直下の*.jsonはスコアとして読み込まれるため、隠しディレクトリに置く
+    return output_dir / '.provenance' / 'manifest.json'
+
+
+def load_provenance_manifest(output_dir: Path) -> Dict[str, Dict]:
+    """出力ファイル名ごとの取得元・信頼度の記録を読み込み"""
+    try:
+        with open(_provenance_manifest_path(output_dir), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            return data if isinstance(data, dict) else {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_provenance_manifest(output_dir: Path, manifest: Dict[str, Dict]):
+    """取得元・信頼度の記録を保存"""
+    manifest_path = ensure_directory(_provenance_manifest_path(output_dir))
+    OutputFormatter.save_json(manifest, manifest_path)
+
+
 def append_to_json_file(result: Dict, file_path: Path):
     """JSONファイルに結果を追加（既存のファイルがある場合は配列として追加）"""
     existing_results = load_json_results(file_path)
@@ -103,6 +107,8 @@ def get_output_file_path(output_path: Union[str, Path], format_type: str) -> Pat
             output_path = output_path.with_suffix('.csv')
         elif format_type == 'yaml':
             output_path = output_path.with_suffix('.yaml')
+        elif format_type == 'parquet':
+            output_path = output_path.with_suffix('.parquet')
     
     return output_path
 
@@ -129,11 +135,87 @@ def create_backup_filename(original_path: Path) -> Path:
     return original_path.parent / backup_name
 
 
+# scoreディレクトリに置くフロントエンド用のまとめファイル（個別のスコアファイルではない）
+SCORE_BUNDLE_NAME = 'bundle.json'
+
+
+def is_score_file(name: str) -> bool:
+    """scoreディレクトリ内の個別のスコアJSONか（まとめファイルは除く）"""
+    return name.endswith('.json') and name != SCORE_BUNDLE_NAME
+
+
+# 一般的な画像拡張子
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.gif'}
+
+# 展開せずに読み込めるアーカイブ（tarは圧縮形式を自動判別する）
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+
+def is_archive(file_path: Path) -> bool:
+    """zip/tarアーカイブか（拡張子で判定）"""
+    return file_path.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
 def validate_image_file(file_path: Path) -> bool:
     """画像ファイルが有効かチェック"""
-    if not file_path.exists():
+    # 拡張子を先に確認して、画像以外のファイルではstatを省く
+    if file_path.suffix.lower() not in IMAGE_EXTENSIONS:
         return False
+    return file_path.exists()
+
+
+def iter_image_files(directory: Path) -> Iterator[Path]:
+    """ディレクトリ以下の画像ファイルを再帰的に列挙
+    
+    ディレクトリを1つずつos.scandirで読み、全体の走査を待たずに最初のディレクトリから処理を始められる。
+    ディレクトリ内は名前順に返すため、実行ごとに順序（同じstemの画像のどれが {stem}.json になるか）が変わらない。
+    隠しディレクトリ（.provenance など）は対象外。
+    """
+    pending = [Path(directory)]
+    while pending:
+        current = pending.pop()
+        subdirectories = []
+        files = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(Path(entry.path))
+                    elif entry.is_file() and validate_image_file(Path(entry.path)):
+                        files.append(Path(entry.path))
+        except OSError as e:
+            click.echo(f"⚠️  ディレクトリを読み込めません: {current} ({e})", err=True)
+        yield from sorted(files)
+        # サブディレクトリは名前順に処理する
+        pending.extend(sorted(subdirectories, reverse=True))
+
+
+def iter_glob_files(pattern: str, archives: bool = False) -> Iterator[Path]:
+    """globパターン（** で再帰）に一致する画像ファイル（archivesならアーカイブも）を遅延評価で列挙"""
+    for name in glob.iglob(pattern, recursive=True):
+        path = Path(name)
+        if path.is_file() and (validate_image_file(path) or (archives and is_archive(path))):
+            yield path
+
+
+def iter_input_paths(paths: Iterable[Path], directories: Iterable[Path] = (),
+                     patterns: Iterable[str] = (), archives: bool = False) -> Iterator[Path]:
+    """明示されたパス・ディレクトリ・globパターンの順に入力を列挙（重複は除く）
     
-    # 一般的な画像拡張子をチェック
-    valid_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.gif'}
-    return file_path.suffix.lower() in valid_extensions
+    明示されたパスはそのまま返し、存在や形式の確認は処理側に任せる。
+    archivesを指定するとglobパターンに一致したアーカイブも返す（ディレクトリの走査では返さない）
+    """
+    seen = set()
+    sources = itertools.chain(
+        paths,
+        itertools.chain.from_iterable(iter_image_files(directory) for directory in directories),
+        itertools.chain.from_iterable(iter_glob_files(pattern, archives) for pattern in patterns),
+    )
+    for path in sources:
+        key = os.path.normpath(str(path))
+        if key in seen:
+            continue
+        seen.add(key)
+        yield path
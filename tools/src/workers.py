@@ -0,0 +1,431 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+import cv2
+
+from .archives import load_input
+from .frames import DEFAULT_SLOT_BYTES, FrameReader, SharedFramePool
+from .ocr import SushidaOCR
+from .parser import SushidaResultParser
+from .pipeline import TIERS, TierStats, TieredExtractor
+from .prefetch import ImagePrefetcher, PrefetchStats
+from .profiles import PipelineProfile
+
+# 読み込みスレッド側で計測される処理段階（先読み時は画像ごとの差分から除き、read にまとめる）
+READER_STAGES = ('decode', 'locate')
+
+
+class ExtractionOutcome(NamedTuple):
+    """画像1枚分の処理結果
+
+    stage_seconds: この画像の処理で増えた処理段階ごとの時間
+    """
+    path: Path
+    result: Optional[Dict]
+    provenance: Dict
+    tier: Optional[str]
+    error: Optional[str]
+    stage_seconds: Dict[str, float]
+    seconds: float
+
+
+# batch の --workers を省略したときのワーカープロセス数の上限
+# （コア数ぶん起動すると、他の処理や同時に動かすbatchとコアを奪い合うため）
+MAX_DEFAULT_WORKERS = 2
+
+
+def default_worker_count() -> int:
+    """既定のワーカープロセス数（CPUコア数。ただし MAX_DEFAULT_WORKERS まで）"""
+    return max(1, min(MAX_DEFAULT_WORKERS, os.cpu_count() or 1))
+
+
+def threads_per_worker(workers: int) -> int:
+    """コアをワーカー間で分け合ったときの1ワーカーあたりのスレッド数"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def configure_worker_threads(threads: int):
+    """TesseractのOpenMPスレッド数とOpenCVのスレッド数を制限
+
+    Tesseract（--oem 1）はOpenMPで複数スレッドを使うため、ワーカーを並べると
+    コア数を超えるスレッドが奪い合って遅くなる。OMP_THREAD_LIMITは
+    pytesseractが起動するtesseractプロセスに環境変数として引き継がれる。
+    """
+    os.environ['OMP_THREAD_LIMIT'] = str(threads)
+    cv2.setNumThreads(threads)
+
+
+def stage_deltas(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, float]:
+    """累積値の辞書どうしの差分（増えた項目だけ）"""
+    return {key: value - before.get(key, 0) for key, value in after.items()
+            if value > before.get(key, 0)}
+
+
+def retry_uncropped(extractor: TieredExtractor, outcome: ExtractionOutcome,
+                    stats: Optional[TierStats] = None) -> ExtractionOutcome:
+    """採用できない結果の画像をゲーム画面を切り出さずに再処理（良い結果が得られた場合だけ差し替える）
+
+    stats は outcome を記録した処理段の集計（ProcessExtractionPoolで処理した場合は pool.stats）
+    """
+    if not extractor.ocr.auto_crop or extractor.accepts(outcome.result, outcome.provenance):
+        return outcome
+    started = time.perf_counter()
+    try:
+        retried = extractor.extract_uncropped(load_input(extractor.ocr, outcome.path, crop=False),
+                                              (outcome.result, outcome.provenance, outcome.tier), stats)
+    except Exception:
+        retried = None
+    elapsed = time.perf_counter() - started
+    if not retried:
+        return outcome._replace(seconds=outcome.seconds + elapsed)
+    result, provenance, tier = retried
+    return outcome._replace(result=result, provenance=provenance, tier=tier, error=None,
+                            seconds=outcome.seconds + elapsed)
+
+
+def iter_extract(extractor: TieredExtractor, paths: Iterable[Path]) -> Iterator[ExtractionOutcome]:
+    """現在のプロセスで1枚ずつ処理"""
+    ocr = extractor.ocr
+    for path in paths:
+        started = time.perf_counter()
+        before = dict(ocr.stage_seconds)
+        try:
+            result, provenance, tier = extractor.extract_array(load_input(ocr, path))
+            error = None
+        except Exception as e:
+            result, provenance, tier, error = None, {}, None, str(e)
+        yield ExtractionOutcome(path, result, provenance, tier, error,
+                                stage_deltas(before, ocr.stage_seconds),
+                                time.perf_counter() - started)
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    chunk: List = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _extract_chunk(extractor: TieredExtractor, images: List) -> List[tuple]:
+    """まとめて処理し、失敗した場合は1枚ずつ処理し直して失敗した画像だけをエラーにする"""
+    if len(images) > 1:
+        try:
+            return [result + (None,) for result in extractor.extract_batch(images)]
+        except Exception:
+            pass
+    outcomes = []
+    for img in images:
+        try:
+            outcomes.append(extractor.extract_array(img) + (None,))
+        except Exception as e:
+            outcomes.append((None, {}, None, str(e)))
+    return outcomes
+
+
+def iter_extract_prefetched(extractor: TieredExtractor, prefetcher: ImagePrefetcher,
+                            batch_size: int = 1) -> Iterator[ExtractionOutcome]:
+    """読み込みスレッドが先にデコードした画像を、現在のプロセスで処理
+
+    デコードとゲーム画面の切り出しは読み込みスレッドで並行して進むため、
+    画像ごとの時間は読み込み（read）とOCR側の処理段階に分けて記録する。
+    batch_size が2以上の場合は、先読みした画像を batch_size 枚ずつまとめて
+    extract_batch で処理する（処理段階の時間は枚数で均等に割る）
+    """
+    ocr = extractor.ocr
+    for chunk in _chunks(prefetcher, max(1, batch_size)):
+        started = time.perf_counter()
+        before = ocr.stage_snapshot()
+        loaded = [item for item in chunk if item.error is None]
+        results = iter(_extract_chunk(extractor, [item.image for item in loaded]))
+        outcomes = [next(results) if item.error is None else (None, {}, None, item.error)
+                    for item in chunk]
+        share = 1 / len(chunk)
+        elapsed = (time.perf_counter() - started) * share
+        stage_seconds = {stage: seconds * share
+                         for stage, seconds in stage_deltas(before, ocr.stage_snapshot()).items()
+                         if stage not in READER_STAGES}
+        for item, (result, provenance, tier, error) in zip(chunk, outcomes):
+            yield ExtractionOutcome(item.path, result, provenance, tier, error,
+                                    dict(stage_seconds, read=item.read_seconds),
+                                    item.read_seconds + elapsed)
+
+
+def _extraction_worker(names: List[str], profile: PipelineProfile, start_tier: str,
+                       min_confidence: float, threads: int, tasks, results):
+    """OCRワーカープロセス: 共有メモリ上の画像をコピーせずに参照して段階的に処理"""
+    configure_worker_threads(threads)
+    reader = FrameReader(names)
+    ocr = SushidaOCR(settings=profile.ocr, auto_crop=False)
+    extractor = TieredExtractor(ocr, SushidaResultParser(settings=profile.parser),
+                                min_confidence=min_confidence, start_tier=start_tier)
+    try:
+        while True:
+            waited = time.perf_counter()
+            task = tasks.get()
+            if task is None:
+                break
+            # 画像の到着を待った時間（読み込みが追いついていない）
+            waited = time.perf_counter() - waited
+            job_id, ref = task
+            seconds_before = dict(ocr.stage_seconds)
+            calls_before = dict(ocr.stage_calls)
+            tiers_before = dict(extractor.stats.seconds)
+            try:
+                img = reader.view(ref)
+                result, provenance, tier = extractor.extract_array(img)
+                error = None
+            except Exception as e:
+                result, provenance, tier, error = None, {}, None, str(e)
+            finally:
+                # スロットは返却後に上書きされるので、結果を返す前に参照を手放す
+                img = None
+            tier_seconds = {t: extractor.stats.seconds[t] - tiers_before[t]
+                            for t in TIERS if extractor.stats.seconds[t] > tiers_before[t]}
+            results.put((job_id, ref.slot, result, provenance, tier, error,
+                         stage_deltas(seconds_before, ocr.stage_seconds),
+                         stage_deltas(calls_before, ocr.stage_calls), tier_seconds, waited))
+    finally:
+        reader.close()
+
+
+class ProcessExtractionPool:
+    """画像を共有メモリ経由でOCRワーカープロセスに渡して並列に処理するプール
+
+    読み込み（デコードとゲーム画面の切り出し）は現在のプロセスのスレッドで行い、
+    切り出した画像を共有メモリのスロットに書き込んで参照だけをワーカーに送る。
+    スロットはワーカーの結果を受け取った時点で返却するため、処理中の画像は slots 枚までになる。
+    prefetch を指定すると、ワーカー数に加えて prefetch 枚を先に読み込めるだけのスロットを
+    確保する（max_bytes を超えない範囲で。ただし各ワーカーの分と1枚は必ず確保する）。
+    """
+
+    def __init__(self, ocr: SushidaOCR, profile: PipelineProfile, workers: int = 2,
+                 start_tier: str = 'fast', min_confidence: float = 0.5, readers: int = 2,
+                 slots: Optional[int] = None, slot_bytes: int = DEFAULT_SLOT_BYTES,
+                 threads: Optional[int] = None, prefetch: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.ocr = ocr
+        self.profile = profile
+        self.workers = max(1, workers)
+        self.start_tier = start_tier
+        self.min_confidence = min_confidence
+        self.readers = max(1, readers)
+        if not slots and prefetch:
+            slots = self.workers + prefetch
+            if max_bytes:
+                slots = min(slots, max(self.workers + 1, max_bytes // slot_bytes))
+        self.slots = slots or self.workers * 2
+        # 入力の順に返すために保持する結果の上限（処理中の画像と読み込み待ちの画像の分）
+        self.reorder_window = (self.slots + self.readers * 2) * 2
+        self.slot_bytes = slot_bytes
+        # 1ワーカーあたりのTesseract/OpenCVのスレッド数（省略時はコアをワーカー数で割った数）
+        self.threads = threads or threads_per_worker(self.workers)
+
+        self.stats = TierStats()
+        self.prefetch_stats = PrefetchStats()
+        self.worker_stage_seconds: Dict[str, float] = {}
+        self.worker_stage_calls: Dict[str, int] = {}
+        self.frames: Optional[SharedFramePool] = None
+        self._tasks: Optional['multiprocessing.Queue'] = None
+        self._results: Optional['multiprocessing.Queue'] = None
+        self._processes: List[multiprocessing.Process] = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        """共有メモリを確保してワーカープロセスを起動"""
+        self.frames = SharedFramePool(self.slots, self.slot_bytes)
+        self._tasks = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        for index in range(self.workers):
+            process = multiprocessing.Process(
+                target=_extraction_worker, name=f"ocr-worker-{index}", daemon=True,
+                args=(self.frames.names, self.profile, self.start_tier, self.min_confidence,
+                      self.threads, self._tasks, self._results))
+            process.start()
+            self._processes.append(process)
+
+    def close(self):
+        """ワーカープロセスを停止し、共有メモリを解放"""
+        # 空きスロット待ちの読み込みスレッドを止める
+        self._stopping.set()
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = []
+        if self.frames:
+            self.frames.close()
+            self.frames = None
+
+    def __enter__(self) -> 'ProcessExtractionPool':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def stage_seconds(self) -> Dict[str, float]:
+        """読み込み側とワーカー側を合わせた処理段階ごとの累積時間"""
+        merged = dict(self.ocr.stage_seconds)
+        for stage, seconds in self.worker_stage_seconds.items():
+            merged[stage] = merged.get(stage, 0.0) + seconds
+        return merged
+
+    @property
+    def stage_calls(self) -> Dict[str, int]:
+        merged = dict(self.ocr.stage_calls)
+        for stage, count in self.worker_stage_calls.items():
+            merged[stage] = merged.get(stage, 0) + count
+        return merged
+
+    def format_stage_timings(self) -> str:
+        return ", ".join(f"{stage} {seconds * 1000:.1f}ms"
+                         for stage, seconds in self.stage_seconds.items())
+
+    def _read(self, job_id: int, path: Path, read_seconds: Dict[int, float]):
+        started = time.perf_counter()
+        try:
+            img = load_input(self.ocr, path)
+            read_seconds[job_id] = time.perf_counter() - started
+            # 空きスロットを待った時間（ワーカーのOCRが追いついていない）
+            waited = time.perf_counter()
+            ref = None
+            while ref is None:
+                if self._stopping.is_set():
+                    return
+                try:
+                    ref = self.frames.store(img, timeout=0.5)
+                except TimeoutError:
+                    continue
+            self.prefetch_stats.add_reader_wait(time.perf_counter() - waited)
+            if ref.slot < 0:
+                # スロットに収まらずpickleで送る画像（多ければ slot_bytes を大きくする）
+                self.prefetch_stats.add_inline_frame()
+        except Exception as e:
+            read_seconds[job_id] = time.perf_counter() - started
+            self._results.put((job_id, -1, None, {}, None, str(e), {}, {}, {}, 0.0))
+            return
+        self._tasks.put((job_id, ref))
+
+    def extract_paths(self, paths: Iterable[Path]) -> Iterator[ExtractionOutcome]:
+        """画像を並列に処理し、入力の順に結果を返す（pathsは遅延評価のイテレータでもよい）
+
+        先に終わった後続の画像の結果は、前の画像の結果が揃うまで保持する。保持する件数が
+        増え続けないように、まだ返していない画像が reorder_window 件に達したら投入を待つ
+        """
+        jobs: Dict[int, Path] = {}
+        started_at: Dict[int, float] = {}
+        read_seconds: Dict[int, float] = {}
+        submitted = 0
+        feeding_done = threading.Event()
+        feed_error: List[BaseException] = []
+        # 読み込み待ちの件数を制限して、大量の入力でもメモリを使い切らないようにする
+        pending_reads = threading.BoundedSemaphore(self.readers * 2)
+        window = threading.Semaphore(self.reorder_window)
+
+        def feed():
+            nonlocal submitted
+            try:
+                with ThreadPoolExecutor(self.readers, thread_name_prefix='image-reader') as executor:
+                    for job_id, path in enumerate(paths):
+                        while not window.acquire(timeout=0.5):
+                            if self._stopping.is_set():
+                                return
+                        while not pending_reads.acquire(timeout=0.5):
+                            if self._stopping.is_set():
+                                return
+                        jobs[job_id] = path
+                        started_at[job_id] = time.perf_counter()
+                        future = executor.submit(self._read, job_id, path, read_seconds)
+                        future.add_done_callback(lambda _: pending_reads.release())
+                        submitted += 1
+            except BaseException as e:
+                feed_error.append(e)
+            finally:
+                feeding_done.set()
+
+        feeder = threading.Thread(target=feed, name='image-feeder', daemon=True)
+        feeder.start()
+
+        received = 0
+        # 入力の順番 -> 前の画像の結果待ちの結果
+        ready: Dict[int, ExtractionOutcome] = {}
+        next_job = 0
+        while not (feeding_done.is_set() and received == submitted):
+            try:
+                message = self._results.get(timeout=0.1)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    raise RuntimeError("OCRワーカープロセスが異常終了しました")
+                continue
+
+            (job_id, slot, result, provenance, tier, error,
+             seconds, calls, tier_seconds, waited) = message
+            self.frames.release(slot)
+            received += 1
+            self.prefetch_stats.add_ocr_wait(waited)
+
+            for stage, value in seconds.items():
+                self.worker_stage_seconds[stage] = self.worker_stage_seconds.get(stage, 0.0) + value
+            for stage, value in calls.items():
+                self.worker_stage_calls[stage] = self.worker_stage_calls.get(stage, 0) + value
+            for attempted, elapsed in tier_seconds.items():
+                self.stats.record(attempted, elapsed)
+            if tier:
+                self.stats.resolved[tier] += 1
+
+            stage_seconds = dict(seconds, read=read_seconds.pop(job_id, 0.0))
+            ready[job_id] = ExtractionOutcome(jobs.pop(job_id), result, provenance, tier, error,
+                                              stage_seconds, time.perf_counter() - started_at.pop(job_id))
+            while next_job in ready:
+                outcome = ready.pop(next_job)
+                next_job += 1
+                window.release()
+                yield outcome
+
+        feeder.join()
+        if feed_error:
+            raise feed_error[0]
+
+
+class ScalingResult(NamedTuple):
+    """ワーカー数ごとのスループット"""
+    workers: int
+    threads: int
+    images: int
+    seconds: float
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.seconds if self.seconds else 0.0
+
+
+def benchmark_scaling(ocr: SushidaOCR, profile: PipelineProfile, paths: Sequence[Path],
+                      worker_counts: Sequence[int] = (1, 2, 4, 8), start_tier: str = 'fast',
+                      min_confidence: float = 0.5) -> List[ScalingResult]:
+    """同じ画像群をワーカー数を変えて処理し、枚数/秒を測定
+
+    ワーカーの起動時間は含めず、最初の画像の投入から最後の結果までを測る
+    """
+    results = []
+    for workers in worker_counts:
+        with ProcessExtractionPool(ocr, profile, workers=workers, start_tier=start_tier,
+                                   min_confidence=min_confidence) as pool:
+            started = time.perf_counter()
+            images = sum(1 for _ in pool.extract_paths(paths))
+            elapsed = time.perf_counter() - started
+        results.append(ScalingResult(workers, pool.threads, images, elapsed))
+    return results
@@ -0,0 +1,46 @@
+import random
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from src.ocr import SushidaOCR
+
+# 寿司打の結果画面をきれいに読み取った場合のOCRテキスト
+CLEAN_TEXT = ("お手軽 3,000円コース 1,160円分のお寿司をゲット 正しく打ったキーの数 35回 "
+              "平均キータイプ数 0.6回/秒 ミスタイプ数 20回")
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    """Tesseractを呼ばずに CLEAN_TEXT を返す（処理時間は少しばらつかせる）
+
+    ワーカープロセスはforkで起動するため、差し替えは子プロセスにも引き継がれる
+    """
+    def ocr_image(self, processed_img, config=None):
+        with self.timed('tesseract'):
+            time.sleep(random.random() * 0.01)
+            return CLEAN_TEXT
+
+    monkeypatch.setattr(SushidaOCR, '_find_tesseract', lambda self: '/bin/true')
+    monkeypatch.setattr(SushidaOCR, 'test_ocr_setup', lambda self: True)
+    monkeypatch.setattr(SushidaOCR, 'ocr_image', ocr_image)
+    return CLEAN_TEXT
+
+
+@pytest.fixture
+def screenshot_paths(tmp_path):
+    """白地に文字を描いた小さな画像ファイル（名前に日付を含む）"""
+    def make(count, prefix='202504', directory=None):
+        directory = directory or tmp_path
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for index in range(count):
+            img = np.full((240, 400, 3), 255, np.uint8)
+            cv2.putText(img, f"{index}", (20, 120), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 3)
+            path = directory / f"{prefix}{index % 28 + 1:02d}_{index:04d}.png"
+            cv2.imwrite(str(path), img)
+            paths.append(path)
+        return paths
+    return make
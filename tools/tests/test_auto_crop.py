@@ -0,0 +1,86 @@
+import json
+import multiprocessing
+
+import pytest
+from click.testing import CliRunner
+
+from src.cli import main
+from src.ocr import SushidaOCR
+from src.parser import SushidaResultParser
+from src.pipeline import TieredExtractor
+
+# 切り出しを誤った画像から読めるノイズ（パーサーはデフォルト値で補った結果を返す）
+NOISE_TEXT = "・・・ー×、。 12"
+
+
+@pytest.fixture
+def wrong_crop(fake_tesseract, monkeypatch):
+    """ゲーム画面を誤検出して文字のない右下だけを切り出す状況を再現する
+
+    OCRは文字（黒い画素）が残っている画像からは結果画面のテキストを、それ以外からはノイズを返す
+    """
+    def locate_game_region(self, img):
+        height, width = img.shape[:2]
+        return (width // 2, height // 2, width - width // 2, height - height // 2)
+
+    def ocr_image(self, processed_img, config=None):
+        with self.timed('tesseract'):
+            return fake_tesseract if processed_img.min() < 128 else NOISE_TEXT
+
+    monkeypatch.setattr(SushidaOCR, 'locate_game_region', locate_game_region)
+    monkeypatch.setattr(SushidaOCR, 'ocr_image', ocr_image)
+
+
+def test_extractor_retries_without_crop(wrong_crop, screenshot_paths):
+    path = screenshot_paths(1)[0]
+    ocr = SushidaOCR()
+    extractor = TieredExtractor(ocr, SushidaResultParser(quiet=True))
+
+    # ノイズからも結果は作られるが、検証・信頼度で採用されない
+    cropped = extractor.extract_array(ocr.load_image(path))
+    assert cropped[0] is not None and not extractor.accepts(cropped[0], cropped[1])
+    result, provenance, _ = extractor.extract_uncropped(ocr.load_image(path, crop=False), cropped)
+    assert result['detail'] == {'payed': 3000, 'gain': 1160}
+    assert extractor.accepts(result, provenance)
+
+    # 確定件数は1枚につき1件（採用した切り出さない画像の結果）
+    assert sum(extractor.stats.resolved.values()) == 1
+    assert extractor.stats.resolved['fast'] == 1
+
+    # 採用できる結果や、切り出しが無効な場合は再処理しない
+    uncropped = ocr.load_image(path, crop=False)
+    assert extractor.extract_uncropped(uncropped, (result, provenance, 'fast')) is None
+    ocr.auto_crop = False
+    assert extractor.extract_uncropped(uncropped, cropped) is None
+
+
+def test_batch_falls_back_to_uncropped_image(wrong_crop, screenshot_paths, tmp_path):
+    paths = screenshot_paths(2)
+    output_dir = tmp_path / 'out'
+    result = CliRunner().invoke(main, ['batch', '--workers', '1', '-o', str(output_dir),
+                                       *map(str, paths)])
+    assert result.exit_code == 0, result.output
+    assert '2件成功, 0件失敗' in result.output
+    for path in output_dir.glob('*.json'):
+        assert json.loads(path.read_text(encoding='utf-8'))['detail']['gain'] == 1160
+
+
+def test_analyze_falls_back_to_uncropped_image(wrong_crop, screenshot_paths, tmp_path):
+    output = tmp_path / 'result'
+    result = CliRunner().invoke(main, ['analyze', str(screenshot_paths(1)[0]), '-q', '-o', str(output)])
+    assert result.exit_code == 0, result.output
+    saved = json.loads(output.with_suffix('.json').read_text(encoding='utf-8'))
+    assert saved['detail'] == {'payed': 3000, 'gain': 1160}
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='Tesseractの差し替えをワーカープロセスに引き継ぐためforkが必要')
+def test_pool_batch_counts_uncropped_retries(wrong_crop, screenshot_paths, tmp_path):
+    paths = screenshot_paths(2)
+    result = CliRunner().invoke(main, ['batch', '--workers', '2', '-o', str(tmp_path / 'out'),
+                                       *map(str, paths)])
+    assert result.exit_code == 0, result.output
+    assert '2件成功, 0件失敗' in result.output
+    # ワーカーでの fast 1回と、切り出さずに再処理した fast 1回を1枚ずつ数える（確定は1枚1件）
+    assert 'fast: 2件確定 / 4件試行' in result.output
+    assert '  accurate: 0件確定 / 2件試行' in result.output
@@ -0,0 +1,62 @@
+import json
+import zipfile
+
+from click.testing import CliRunner
+
+from src.cli import main
+from src.archives import OutputNames
+from src.utils import iter_image_files, load_provenance_manifest
+
+
+def run_batch(args):
+    result = CliRunner().invoke(main, ['batch', '--workers', '1', *args])
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def test_recursive_same_stem_in_two_directories(fake_tesseract, screenshot_paths, tmp_path):
+    first = screenshot_paths(1, directory=tmp_path / 'in' / 'a')[0]
+    second = screenshot_paths(1, directory=tmp_path / 'in' / 'b')[0]
+    assert first.name == second.name
+    output_dir = tmp_path / 'out'
+
+    run_batch(['--recursive', str(tmp_path / 'in'), '-o', str(output_dir)])
+
+    written = sorted(path.name for path in output_dir.glob('*.json'))
+    assert len(written) == 2
+    assert f"{first.stem}.json" in written
+    assert set(load_provenance_manifest(output_dir)) == set(written)
+
+
+def test_archive_members_with_same_stem(fake_tesseract, screenshot_paths, tmp_path):
+    image = screenshot_paths(1)[0]
+    archive = tmp_path / 'screens.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.write(image, 'a/001.png')
+        zf.write(image, 'b/001.png')
+    output_dir = tmp_path / 'out'
+
+    run_batch([str(archive), '-o', str(output_dir)])
+    written = sorted(path.name for path in output_dir.glob('*.json'))
+    assert len(written) == 2 and '001.json' in written
+    manifest = load_provenance_manifest(output_dir)
+    assert set(manifest) == set(written)
+
+    # 2回目も同じ入力には同じ名前を使うので、--skip-trusted で両方ともスキップされる
+    result = run_batch([str(archive), '-o', str(output_dir), '--skip-trusted'])
+    assert '信頼済みのためスキップ: 2件' in result.output
+    for name in written:
+        assert json.loads((output_dir / name).read_text(encoding='utf-8'))['course'] == 'お手軽'
+
+
+def test_recursive_names_do_not_depend_on_scan_order(screenshot_paths, tmp_path):
+    for directory in ('b', 'a'):
+        screenshot_paths(3, directory=tmp_path / directory)
+    found = list(iter_image_files(tmp_path))
+    assert found == sorted(found)
+
+    names = OutputNames()
+    first = [names.name_for(path) for path in found]
+    # 同じ入力には同じ名前を返し、同じstemでも別の入力には別の名前を返す
+    assert [names.name_for(path) for path in found] == first
+    assert len(set(first)) == len(found)
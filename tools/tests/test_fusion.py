@@ -0,0 +1,30 @@
+from src.fusion import FusionExtractor, preprocess_variants
+from src.profiles import OCRSettings, get_profile
+
+
+def parsed(course, paid, gain=1160):
+    result = {'course': course, 'result': gain - paid, 'detail': {'payed': paid, 'gain': gain},
+              'typing': {'correct': 35, 'avarageTPS': 0.6, 'miss': 20}}
+    provenance = {field: {'source': 'pattern:test', 'confidence': 1.0}
+                  for field in ('course', 'gain', 'paid', 'correct', 'avarageTPS', 'miss')}
+    return result, provenance
+
+
+def test_course_and_paid_are_voted_together():
+    # フィールドごとの多数決なら コース=普通（2票）・支払額=3000（2票）という存在しない組み合わせになる
+    values, provenance = FusionExtractor.vote([
+        parsed('お手軽', 3000), parsed('普通', 3000), parsed('普通', 5000),
+    ])
+    assert (values['course'], values['paid']) == ('お手軽', 3000)
+    assert provenance['course']['agreement'] == provenance['paid']['agreement'] == round(1 / 3, 3)
+    assert provenance['gain']['agreement'] == 1.0
+
+
+def test_variants_follow_profile_target_width():
+    assert preprocess_variants(OCRSettings()) == (
+        ('adaptive', 1200), ('otsu', 1200), ('adaptive', 1600),
+        ('otsu', 1600), ('adaptive', 900), ('otsu', 2000),
+    )
+    fast = get_profile('fast').ocr
+    widths = {width for _, width in preprocess_variants(fast)}
+    assert fast.target_width in widths and 1200 not in widths
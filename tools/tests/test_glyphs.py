@@ -0,0 +1,162 @@
+import cv2
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from src import pipeline
+from src.cli import main
+from src.glyphs import DigitModel, field_label, load_digit_model, train_digit_model
+from src.ocr import SushidaOCR
+from src.parser import SushidaResultParser
+from src.pipeline import TieredExtractor
+
+# ゲーム画面に対する各フィールドの範囲（x, y, 幅, 高さ）
+FIELDS = {
+    'gain': (0.05, 0.05, 0.9, 0.15),
+    'paid': (0.05, 0.25, 0.9, 0.15),
+    'correct': (0.05, 0.45, 0.9, 0.15),
+    'avarageTPS': (0.05, 0.65, 0.9, 0.15),
+    'miss': (0.05, 0.82, 0.9, 0.15),
+}
+# 学習に使う結果（全ての数字が出てくるようにする）
+TRAINING_VALUES = [
+    (1160, 3000, 35, 0.6, 20),
+    (2480, 5000, 127, 2.9, 4),
+    (9870, 10000, 368, 5.7, 13),
+    (0, 3000, 0, 0.0, 0),
+    (4500, 5000, 249, 3.8, 61),
+]
+
+
+def score(gain, paid, correct, tps, miss):
+    return {'course': '', 'result': gain - paid, 'detail': {'payed': paid, 'gain': gain},
+            'typing': {'correct': correct, 'avarageTPS': tps, 'miss': miss}}
+
+
+def render_text(text, size=(30, 200)):
+    """グレースケールの白地に黒で文字を描く"""
+    img = np.full(size, 255, np.uint8)
+    cv2.putText(img, text, (4, size[0] - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.8, 0, 2)
+    return img
+
+
+def render_screen(texts, size=(200, 320)):
+    """フィールドごとの文字列を範囲の中に描いたゲーム画面（BGR）"""
+    height, width = size
+    img = np.full((height, width, 3), 255, np.uint8)
+    for field, text in texts.items():
+        x, y, _, h = FIELDS[field]
+        origin = (int(width * x) + 4, int(height * (y + h)) - 6)
+        cv2.putText(img, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    return img
+
+
+def screen_for(result, missing=()):
+    # 金額には数字以外のグリフ（「円」の代わり）を付ける
+    return render_screen({field: field_label(result, field) + (' yen' if field in ('gain', 'paid') else '')
+                          for field in FIELDS if field not in missing})
+
+
+@pytest.fixture(scope='module')
+def trained():
+    examples = [(screen_for(score(*values)), score(*values)) for values in TRAINING_VALUES]
+    return train_digit_model(examples, FIELDS)
+
+
+def test_training_on_rendered_digits(trained):
+    model, report = trained
+    # 「yen」付きの金額も正解の並びを見つけて学習に使われる
+    assert report.samples == len(TRAINING_VALUES) * len(FIELDS)
+    assert report.skipped == 0
+    assert sorted(report.class_counts) == list('0123456789')
+    assert report.accuracy == 1.0
+
+    readings = model.read_fields(screen_for(score(3210, 10000, 145, 4.2, 7)))
+    assert {field: reading.text for field, reading in readings.items()} == {
+        'gain': '3210', 'paid': '10000', 'correct': '145', 'avarageTPS': '4.2', 'miss': '7',
+    }
+    assert all(0.5 <= reading.confidence <= 0.95 for reading in readings.values())
+
+    result = SushidaResultParser(quiet=True).from_fields(readings, {})
+    assert result['course'] == '高級' and result['result'] == 3210 - 10000
+
+
+def test_training_without_usable_fields_fails():
+    blank = np.full((200, 320, 3), 255, np.uint8)
+    with pytest.raises(ValueError):
+        train_digit_model([(blank, score(*TRAINING_VALUES[0]))], FIELDS)
+
+
+def test_save_and_load_round_trip(trained, tmp_path):
+    model, _ = trained
+    path = tmp_path / 'digits.npz'
+    model.save(path)
+    loaded = DigitModel.load(path)
+
+    assert np.array_equal(loaded.templates, model.templates)
+    assert loaded.labels.tolist() == model.labels.tolist()
+    assert loaded.fields == model.fields
+    assert (loaded.reject_distance, loaded.k) == (model.reject_distance, model.k)
+    assert loaded.fingerprint == model.fingerprint
+    screen = screen_for(score(*TRAINING_VALUES[1]))
+    assert loaded.read_fields(screen) == model.read_fields(screen)
+
+    assert load_digit_model(path).fingerprint == model.fingerprint
+    assert load_digit_model(tmp_path / 'missing.npz') is None
+
+
+def test_read_takes_longest_digit_run(trained):
+    model, _ = trained
+    # テンプレートから遠いグリフで区切られた並びのうち、最も長いものを採用する
+    assert model.read(render_text('12 ab 3456')).text == '3456'
+    assert model.read(render_text('abc')) is None
+    assert model.read(np.full((30, 200), 255, np.uint8)) is None
+
+
+def test_read_decimal_point(trained):
+    model, _ = trained
+    # 小数のフィールドでは小数点を残し、整数のフィールドでは桁区切りとして読み飛ばす
+    assert model.read(render_text('1.250'), decimal=True).text == '1.250'
+    assert model.read(render_text('1.250')).text == '1250'
+    assert model.read(render_text('0.6'), decimal=True).text == '0.6'
+
+
+def test_missing_field_falls_back_to_tesseract(trained, fake_tesseract):
+    model, _ = trained
+    img = screen_for(score(*TRAINING_VALUES[0]), missing=('miss',))
+    readings = model.read_fields(img)
+    assert 'miss' not in readings and len(readings) == len(FIELDS) - 1
+    parser = SushidaResultParser(quiet=True)
+    assert parser.from_fields(readings, {}) is None
+
+    extractor = TieredExtractor(SushidaOCR(), parser, start_tier='digits', digit_model=model)
+    result, _, tier = extractor.extract_array(img)
+    assert tier == 'fast' and result['typing']['miss'] == 20
+
+    # 全て読めれば Tesseract を使わずに確定する
+    _, provenance, tier = extractor.extract_array(screen_for(score(*TRAINING_VALUES[0])))
+    assert tier == 'digits' and provenance['gain']['source'] == 'glyph:knn'
+
+
+def test_skip_trusted_reprocesses_after_retraining(trained, fake_tesseract, screenshot_paths,
+                                                   tmp_path, monkeypatch):
+    model, _ = trained
+    examples = [(screen_for(score(*values)), score(*values)) for values in TRAINING_VALUES[:3]]
+    retrained, _ = train_digit_model(examples, FIELDS, k=1)
+    assert retrained.fingerprint != model.fingerprint
+
+    current = [model]
+    monkeypatch.setattr(pipeline, 'load_digit_model', lambda: current[0])
+    paths = [str(path) for path in screenshot_paths(2)]
+    output_dir = tmp_path / 'out'
+
+    def run_batch():
+        result = CliRunner().invoke(main, ['batch', '--workers', '1', '--start-tier', 'digits',
+                                           '--skip-trusted', '-o', str(output_dir), *paths])
+        assert result.exit_code == 0, result.output
+        return result.output
+
+    run_batch()
+    assert '信頼済みのためスキップ: 2件' in run_batch()
+    current[0] = retrained
+    assert '信頼済みのためスキップ' not in run_batch()
@@ -0,0 +1,81 @@
+import json
+import multiprocessing
+import random
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from src import cli
+from src.parser import SushidaResultParser
+from src.parser_check import (
+    case_problems, check_invariants, generate_fuzz_text, load_corpus, run_parser_check
+)
+
+CORPUS = load_corpus()
+
+
+def corpus_params():
+    """コーパスの各ケース（既知の誤りは strict な xfail。直ったら xfail を外すよう失敗させる）"""
+    return [
+        pytest.param(case, id=case['id'],
+                     marks=[pytest.mark.xfail(reason=case['xfail'], strict=True)] if case.get('xfail') else [])
+        for case in CORPUS
+    ]
+
+
+@pytest.fixture
+def parser():
+    return SushidaResultParser(quiet=True)
+
+
+@pytest.mark.parametrize('case', corpus_params())
+def test_corpus_case(parser, case):
+    assert case_problems(parser, case) == []
+
+
+def test_corpus_ids_are_unique():
+    ids = [case['id'] for case in CORPUS]
+    assert len(ids) == len(set(ids))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_fuzz_invariants(parser, seed):
+    rng = random.Random(seed)
+    for _ in range(20):
+        text = generate_fuzz_text(rng, 5000)
+        result = parser.parse(text)
+        assert check_invariants(result) is None, text
+
+
+def test_parser_check_with_hang_guard():
+    # 1件ごとの処理時間の上限つきで子プロセスで検証する（破滅的な後戻りでCIが止まらないように）
+    report = run_parser_check(CORPUS, fuzz_count=20, max_length=5000, hang_timeout=10.0)
+    assert report.ok, report.failures or report.hung
+    assert report.cases == len(CORPUS) + 20
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='差し替えたパーサーを子プロセスに引き継ぐにはforkが必要')
+def test_parser_check_reports_hang(monkeypatch):
+    monkeypatch.setattr(SushidaResultParser, 'parse', lambda self, text, provenance=None: time.sleep(60))
+    report = run_parser_check(CORPUS[:1], fuzz_count=0, hang_timeout=0.5)
+    assert not report.ok
+    assert report.hung == (CORPUS[0]['id'], len(CORPUS[0]['text']))
+
+
+def test_record_corpus_refuses_mismatch_without_reason(fake_tesseract, screenshot_paths, tmp_path,
+                                                        monkeypatch):
+    recorded = []
+    monkeypatch.setattr(cli, 'append_corpus_case', recorded.append)
+    expected = tmp_path / 'expected.json'
+    expected.write_text(json.dumps({'course': '高級'}, ensure_ascii=False), encoding='utf-8')
+    image = str(screenshot_paths(1)[0])
+
+    result = CliRunner().invoke(cli.main, ['test', image, '--record-corpus', str(expected)])
+    assert result.exit_code == 1 and recorded == []
+
+    result = CliRunner().invoke(cli.main, ['test', image, '--record-corpus', str(expected),
+                                           '--xfail-reason', 'テスト用の理由'])
+    assert result.exit_code == 0, result.output
+    assert recorded[0]['xfail'] == 'テスト用の理由'
@@ -0,0 +1,45 @@
+import numpy as np
+
+from src.ocr import SushidaOCR
+from src.parser import PROVENANCE_FIELDS, SushidaResultParser
+from src.pipeline import TieredExtractor
+
+
+def candidate(confidence, course='お手軽'):
+    result = {'course': course, 'result': -1840, 'detail': {'payed': 3000, 'gain': 1160},
+              'typing': {'correct': 35, 'avarageTPS': 0.6, 'miss': 20}}
+    provenance = {field: {'source': 'pattern:test', 'confidence': confidence}
+                  for field in PROVENANCE_FIELDS}
+    return result, provenance
+
+
+def escalating_extractor(monkeypatch, outputs):
+    """処理段ごとに決まった結果を返す抽出器（どの段も閾値 0.9 に届かない）"""
+    extractor = TieredExtractor(SushidaOCR(), SushidaResultParser(quiet=True),
+                                min_confidence=0.9, start_tier='fast')
+    monkeypatch.setattr(extractor, '_run_tier', lambda tier, img, processed=None: outputs[tier])
+    return extractor
+
+
+def test_escalation_keeps_best_valid_candidate(fake_tesseract, monkeypatch):
+    # 後の段ほど悪い結果（accurate は低信頼度、fusion は検証を通らない）
+    extractor = escalating_extractor(monkeypatch, {
+        'fast': candidate(0.8),
+        'accurate': candidate(0.5),
+        'fusion': candidate(0.95, course='不明'),
+    })
+    img = np.zeros((10, 10, 3), np.uint8)
+
+    result, provenance, tier = extractor.extract_array(img)
+    assert (tier, result['course']) == ('fast', 'お手軽')
+    assert [outcome[2] for outcome in extractor.extract_batch([img, img])] == ['fast', 'fast']
+
+
+def test_escalation_takes_later_tier_when_it_is_better(fake_tesseract, monkeypatch):
+    extractor = escalating_extractor(monkeypatch, {
+        'fast': (None, {}),
+        'accurate': candidate(0.6),
+        'fusion': candidate(0.85),
+    })
+    _, _, tier = extractor.extract_array(np.zeros((10, 10, 3), np.uint8))
+    assert tier == 'fusion'
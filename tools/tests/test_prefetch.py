@@ -0,0 +1,51 @@
+import random
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.prefetch import ImagePrefetcher
+
+
+def slow_loader(seed: int = 0, shape=(4, 4, 3)):
+    """読み込み時間がばらつくローダー（後の画像が先に読み終わる状況を作る）"""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def load(path: Path) -> np.ndarray:
+        with lock:
+            delay = rng.uniform(0, 0.01)
+        time.sleep(delay)
+        if path.name.startswith('bad'):
+            raise ValueError(f"broken: {path}")
+        return np.full(shape, int(path.stem.rpartition('-')[2]) % 256, dtype=np.uint8)
+
+    return load
+
+
+@pytest.mark.parametrize('depth, readers', [(1, 1), (4, 2), (8, 4)])
+def test_prefetcher_keeps_input_order(depth, readers):
+    paths = [Path(f"img-{index}.png") for index in range(60)]
+    with ImagePrefetcher(slow_loader(depth), paths, depth=depth, readers=readers) as prefetcher:
+        items = list(prefetcher)
+    assert [item.path for item in items] == paths
+    assert prefetcher.stats.peak_depth <= depth
+
+
+def test_prefetcher_keeps_order_of_failed_loads():
+    paths = [Path(f"img-{index}.png") if index % 3 else Path(f"bad-{index}.png") for index in range(20)]
+    with ImagePrefetcher(slow_loader(), paths, depth=4, readers=3) as prefetcher:
+        items = list(prefetcher)
+    assert [item.path for item in items] == paths
+    assert [item.error is not None for item in items] == [path.name.startswith('bad') for path in paths]
+
+
+def test_prefetcher_memory_limit_does_not_block_next_image():
+    # 1枚でも上限を超える画像を、複数スレッドで順不同に読み込んでも止まらない
+    paths = [Path(f"img-{index}.png") for index in range(20)]
+    load = slow_loader(shape=(64, 64, 3))
+    with ImagePrefetcher(load, paths, depth=6, readers=3, max_bytes=1000) as prefetcher:
+        items = list(prefetcher)
+    assert [item.path for item in items] == paths
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+
+import pytest
+
+from src import results
+from src.results import (
+    CSV_COLUMNS, ScoreResult, _legacy_csv, dumps_json, save_results, write_json,
+)
+
+SAMPLES = [
+    ScoreResult('お手軽', -1840, 3000, 1160, 35, 0.6, 20, timestamp='2025-04-07T12:00:00'),
+    ScoreResult('高級', 4210, 10000, 14210, 402, 7.1, 3),
+    # CSVで引用符が必要な文字や、JSONでエスケープが必要な文字を含むコース名
+    ScoreResult('普通, "特上"\n\t\\', 0, 5000, 5000, 0, 12.0, 0, timestamp='2025-04-08T09:30:00'),
+    ScoreResult('', -3000, 3000, 0, 1, 1e-07, 999),
+]
+
+
+@pytest.fixture(params=['json', 'orjson'])
+def json_backend(request, monkeypatch):
+    """orjsonがある場合とない場合の両方で実行する"""
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(results, 'orjson', None)
+    return request.param
+
+
+@pytest.mark.parametrize('indent', [2, 4, None])
+def test_to_json_matches_json_dumps(json_backend, indent):
+    separators = None if indent else (',', ':')
+    for result in SAMPLES + [ScoreResult('お手軽', 0, 3000, 3000, 0, float('inf'), 0)]:
+        expected = json.dumps(result.to_dict(), indent=indent, ensure_ascii=False, separators=separators)
+        assert result.to_json(indent) == expected
+        assert dumps_json(result, indent) == expected
+
+
+def test_dumps_json_matches_json_dumps(json_backend):
+    # 指数表記の小数を含まない（orjsonがそのまま出力する）データ
+    data = {'version': 1, 'scores': [result.to_dict() for result in SAMPLES[:3]], 'empty': {}}
+    assert not results._ORJSON_MISMATCH.search(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+    assert dumps_json(data) == json.dumps(data, indent=2, ensure_ascii=False)
+    assert dumps_json(data, indent=None) == json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    assert dumps_json(data, indent=4) == json.dumps(data, indent=4, ensure_ascii=False)
+    # orjsonが扱えない・orjsonでは表記が変わる値も同じ出力になる
+    for value in (2 ** 70, 1e16, 2.5e-8, float('nan'), float('-inf'), None):
+        assert dumps_json({'value': value}) == json.dumps({'value': value}, indent=2)
+
+
+def test_write_json_is_byte_identical(json_backend, tmp_path):
+    for index, result in enumerate(SAMPLES):
+        path = tmp_path / f"{index}.json"
+        write_json(result, path)
+        expected = json.dumps(result.to_dict(), indent=2, ensure_ascii=False)
+        assert path.read_bytes() == expected.encode('utf-8')
+
+
+def test_ndjson_one_compact_object_per_line(json_backend, tmp_path):
+    path = tmp_path / 'scores.ndjson'
+    assert save_results(SAMPLES, path, 'ndjson') == len(SAMPLES)
+
+    content = path.read_bytes().decode('utf-8')
+    assert content.endswith('\n')
+    lines = content.split('\n')[:-1]
+    assert len(lines) == len(SAMPLES)
+    for line, result in zip(lines, SAMPLES):
+        assert line == json.dumps(result.to_dict(), ensure_ascii=False, separators=(',', ':'))
+        assert ScoreResult.from_dict(json.loads(line)) == result
+
+
+def test_csv_quoting_matches_dict_writer(json_backend, tmp_path):
+    path = tmp_path / 'scores.csv'
+    assert save_results(SAMPLES, path, 'csv') == len(SAMPLES)
+
+    # 従来の辞書経由の出力（csv.DictWriter）とバイト単位で一致する
+    legacy = io.StringIO(newline='')
+    _legacy_csv([result.to_dict() for result in SAMPLES], legacy)
+    assert path.read_bytes() == legacy.getvalue().encode('utf-8')
+
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == list(CSV_COLUMNS)
+    assert rows[3][1] == '普通, "特上"\n\t\\'
+    assert [row[0] for row in rows[1:]] == ['2025-04-07T12:00:00', '', '2025-04-08T09:30:00', '']
+    assert rows[4][6] == '1e-07'
@@ -0,0 +1,113 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from src.ocr import SushidaOCR
+from src.server import ExtractionService, create_server
+
+
+@pytest.fixture
+def serve(fake_tesseract):
+    """空きポートで解析サーバーを起動し、(接続先ポート, サービス) を返す"""
+    servers = []
+
+    def start(timeout=10.0, read_timeout=10.0, **options):
+        service = ExtractionService(workers=1, **options)
+        service.start()
+        server = create_server(service, port=0, timeout=timeout, read_timeout=read_timeout)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append((server, service))
+        return server.server_address[1], service
+
+    yield start
+    for server, service in servers:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+
+
+def request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read().decode('utf-8')
+    finally:
+        conn.close()
+
+
+def test_extract_metrics_and_healthz(serve, screenshot_paths):
+    port, _ = serve()
+    data = screenshot_paths(1)[0].read_bytes()
+
+    status, body = request(port, 'POST', '/extract', data)
+    assert status == 200
+    payload = json.loads(body)
+    assert payload['tier'] == 'fast'
+    assert payload['result']['detail'] == {'payed': 3000, 'gain': 1160}
+
+    status, body = request(port, 'GET', '/healthz')
+    assert (status, json.loads(body)) == (200, {'status': 'ok'})
+
+    status, body = request(port, 'GET', '/metrics')
+    assert status == 200
+    assert 'sushida_requests_total{outcome="success"} 1' in body
+    assert 'sushida_tier_resolved_total{tier="fast"} 1' in body
+
+
+def test_bad_requests_get_json_errors(serve):
+    port, service = serve()
+
+    status, body = request(port, 'POST', '/extract', b'x', {'Content-Length': 'abc'})
+    assert status == 400
+    assert 'error' in json.loads(body)
+
+    status, body = request(port, 'POST', '/extract', b'not an image')
+    assert status == 422
+    assert json.loads(body)['error']
+    assert service.outcomes['error'] == 1
+
+
+def test_timeout_returns_504_and_drops_queued_job(serve, screenshot_paths, monkeypatch):
+    gate = threading.Event()
+    started = threading.Event()
+
+    def blocked_ocr(self, processed_img, config=None):
+        started.set()
+        gate.wait(10)
+        return ''
+
+    monkeypatch.setattr(SushidaOCR, 'ocr_image', blocked_ocr)
+    port, service = serve(timeout=0.3, max_wait=0.0)
+    data = screenshot_paths(1)[0].read_bytes()
+
+    # 1件目がワーカーを塞いでいる間に、2件目はキューに積まれたまま待ち時間切れになる
+    first = threading.Thread(target=request, args=(port, 'POST', '/extract', data))
+    first.start()
+    assert started.wait(5)
+    status, body = request(port, 'POST', '/extract', data)
+    assert status == 504
+    assert json.loads(body)['error']
+
+    gate.set()
+    first.join()
+    service.stop()
+    assert service.outcomes['timeout'] == 2
+    # 取り消された2件目はワーカーが処理しない
+    assert service.batch_sizes.count == 1
+
+
+def test_truncated_body_returns_408(serve):
+    port, service = serve(read_timeout=0.3)
+    with socket.create_connection(('127.0.0.1', port), timeout=10) as sock:
+        # Content-Lengthより少ないデータを送ったまま待つ
+        sock.sendall(b'POST /extract HTTP/1.1\r\nHost: localhost\r\nContent-Length: 1000\r\n\r\npartial')
+        response = sock.makefile('rb').read()
+    assert response.startswith(b'HTTP/1.0 408') or response.startswith(b'HTTP/1.1 408')
+    assert service.outcomes['incomplete'] == 1
+    # キューには積まれない
+    assert service.batch_sizes.count == 0
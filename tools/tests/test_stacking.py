@@ -0,0 +1,41 @@
+import dataclasses
+
+import cv2
+import numpy as np
+import pytest
+
+from src.ocr import SushidaOCR
+from src.profiles import OCRSettings, load_profiles
+from src.stacking import preprocess_batch
+
+
+def screens(count=3, shape=(180, 320)):
+    """同じサイズで内容の違う画像（文字とノイズ入り。四隅も画像ごとに異なる）"""
+    rng = np.random.default_rng(0)
+    images = []
+    for index in range(count):
+        img = rng.integers(150, 256, shape + (3,), dtype=np.uint8)
+        cv2.putText(img, f"{index * 1160}", (10, shape[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+        images.append(img)
+    return images
+
+
+def assert_matches_single(settings, threshold):
+    ocr = SushidaOCR(settings=settings)
+    images = screens()
+    batched = preprocess_batch(ocr, images, threshold)
+    for img, processed in zip(images, batched):
+        assert np.array_equal(processed, ocr.preprocess_array(img, threshold=threshold))
+
+
+@pytest.mark.parametrize('threshold', ['adaptive', 'otsu'])
+@pytest.mark.parametrize('profile_name', sorted(load_profiles()))
+def test_batch_matches_single_for_every_profile(fake_tesseract, profile_name, threshold):
+    assert_matches_single(load_profiles()[profile_name].ocr, threshold)
+
+
+@pytest.mark.parametrize('diameter', [0, 1, 3, 5, 6, 7, 9])
+def test_batch_matches_single_for_bilateral_diameter(fake_tesseract, diameter):
+    settings = dataclasses.replace(OCRSettings(), bilateral_diameter=diameter,
+                                   bilateral_sigma_space=1.0 if diameter == 0 else 75.0)
+    assert_matches_single(settings, 'adaptive')
@@ -0,0 +1,91 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+from click.testing import CliRunner
+
+from src.cli import main
+from src.export import EXPORT_COLUMNS, iter_export_rows
+from src.stats import ScoreStatistics, extract_date_from_name, score_date
+
+SCORE = {
+    "course": "お手軽", "result": -2400,
+    "detail": {"payed": 3000, "gain": 600},
+    "typing": {"correct": 35, "avarageTPS": 0.6, "miss": 20},
+}
+# 日付の分からないファイルに付ける更新日時（実行日と重ならない過去の日付）
+MTIME = datetime(2024, 2, 29, 12, 0, 0).timestamp()
+
+
+def write_score(path, data=SCORE, mtime=MTIME):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('20250407.json', '2025-04-07'),
+    ('score_2025-04-07.json', '2025-04-07'),
+    ('20251399.json', None),
+    ('20251399_20250408.json', '2025-04-08'),
+    ('2025-02-30.json', None),
+    ('result.json', None),
+])
+def test_extract_date_from_name(name, expected):
+    assert extract_date_from_name(name) == expected
+
+
+def test_score_date_prefers_valid_timestamp():
+    assert score_date(dict(SCORE, timestamp='2025-04-07T12:00:00'), '20250101.json') == '2025-04-07'
+    assert score_date(dict(SCORE, timestamp='2025-13-99T12:00:00'), '20250101.json') == '2025-01-01'
+
+
+def test_score_date_falls_back_to_mtime_not_today():
+    assert score_date(SCORE, 'result.json', MTIME) == '2024-02-29'
+    with pytest.raises(ValueError):
+        score_date(SCORE, 'result.json')
+
+
+def test_stats_with_invalid_and_missing_dates(tmp_path):
+    score_dir = tmp_path / 'score'
+    write_score(score_dir / '20251399.json')
+    write_score(score_dir / 'result.json')
+
+    statistics = ScoreStatistics(tmp_path / 'state.json')
+    counts = statistics.sync_directory(score_dir)
+    assert counts['added'] == 2
+
+    exported = statistics.export()
+    assert [day['period'] for day in exported['daily']] == ['2024-02-29']
+    assert [week['period'] for week in exported['weekly']] == ['2024-W09']
+
+
+def test_export_rows_use_mtime_for_undated_files(tmp_path):
+    score_dir = tmp_path / 'score'
+    write_score(score_dir / '20251399.json')
+    rows = list(iter_export_rows([score_dir]))
+    assert [row[0] for row in rows] == ['2024-02-29']
+
+
+def test_export_csv_with_date_range(tmp_path):
+    score_dir = tmp_path / 'score'
+    write_score(score_dir / '20250331.json')
+    write_score(score_dir / '20250401_120000.json', dict(SCORE, course='普通'))
+    output = tmp_path / 'scores.csv'
+
+    result = CliRunner().invoke(main, ['export', str(score_dir), '-o', str(output),
+                                       '--since', '2025-04-01', '--until', '2025-04-30'])
+    assert result.exit_code == 0, result.output
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert lines == [','.join(EXPORT_COLUMNS),
+                     '2025-04-01,普通,-2400,3000,600,35,0.6,20,20250401_120000']
+
+
+@pytest.mark.parametrize('value', ['2025-13-01', '2025/04/01', 'yesterday'])
+def test_export_rejects_invalid_dates(tmp_path, value):
+    result = CliRunner().invoke(main, ['export', str(tmp_path), '-o', str(tmp_path / 'out.csv'),
+                                       '--since', value])
+    assert result.exit_code == 2
+    assert not (tmp_path / 'out.csv').exists()
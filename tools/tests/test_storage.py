@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+import pytest
+
+from src.bundle import ScoreBundle
+from src.export import iter_export_rows
+from src.stats import ScoreStatistics
+from src.storage import filename_timestamp, iter_score_files, save_score, score_key
+
+SCORE = {
+    "timestamp": "2025-04-07T12:00:00",
+    "course": "お手軽", "result": -2400,
+    "detail": {"payed": 3000, "gain": 600},
+    "typing": {"correct": 35, "avarageTPS": 0.6, "miss": 20},
+}
+# 更新直後のファイルは毎回読み直されるため、書き込み時刻を過去にずらして「落ち着いた」状態にする
+PAST = time.time() - 3600
+
+
+def write_score(path, data, mtime):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+
+def edit_in_place(path, data, mtime):
+    """ディレクトリの更新日時を変えずにファイルの内容だけを書き換える"""
+    directory = path.parent
+    directory_stat = directory.stat()
+    write_score(path, data, mtime)
+    os.utime(directory, ns=(directory_stat.st_atime_ns, directory_stat.st_mtime_ns))
+    assert directory.stat().st_mtime_ns == directory_stat.st_mtime_ns
+
+
+def make_score_dir(tmp_path):
+    score_dir = tmp_path / 'score'
+    write_score(score_dir / '2025' / '04' / '20250407.json', SCORE, PAST)
+    write_score(score_dir / '2025' / '04' / '20250408.json', dict(SCORE, result=-1000), PAST)
+    os.utime(score_dir / '2025' / '04', (PAST, PAST))
+    return score_dir
+
+
+def test_stats_picks_up_in_place_edit(tmp_path):
+    score_dir = make_score_dir(tmp_path)
+    statistics = ScoreStatistics(tmp_path / 'state.json')
+    assert statistics.sync_directory(score_dir)['added'] == 2
+    statistics.save()
+
+    statistics = ScoreStatistics(tmp_path / 'state.json')
+    assert statistics.sync_directory(score_dir) == {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 2}
+
+    edit_in_place(score_dir / '2025' / '04' / '20250407.json', dict(SCORE, result=500), PAST + 60)
+    counts = statistics.sync_directory(score_dir)
+    assert counts['updated'] == 1
+    assert statistics.export()['total']['bestScore'] == 500
+
+
+def test_bundle_picks_up_in_place_edit(tmp_path):
+    score_dir = make_score_dir(tmp_path)
+    bundle = ScoreBundle(score_dir)
+    bundle.sync_directory()
+    first_hash = bundle.save()
+
+    edit_in_place(score_dir / '2025' / '04' / '20250408.json', dict(SCORE, result=777), PAST + 60)
+    bundle = ScoreBundle(score_dir)
+    assert bundle.load()
+    assert bundle.sync_directory()['updated'] == 1
+    assert bundle.save() != first_hash
+    assert bundle.entries['2025/04/20250408.json']['result'] == 777
+
+
+def test_recently_written_files_are_reread(tmp_path):
+    score_dir = make_score_dir(tmp_path)
+    statistics = ScoreStatistics(tmp_path / 'state.json')
+    statistics.sync_directory(score_dir)
+
+    # 同じ更新日時・同じサイズのまま書き換わっても、更新直後のファイルは指紋を信用せず読み直す
+    now = time.time()
+    path = score_dir / '2025' / '04' / '20250407.json'
+    write_score(path, dict(SCORE, result=-2300), now)
+    statistics.sync_directory(score_dir)
+    write_score(path, dict(SCORE, result=-2200), now)
+    assert statistics.sync_directory(score_dir)['updated'] == 1
+    assert statistics.export()['total']['worstScore'] == -2200
+
+
+def test_partition_uses_validated_dates(tmp_path):
+    score_dir = tmp_path / 'score'
+    undated = {key: value for key, value in SCORE.items() if key != 'timestamp'}
+
+    # ファイル名の最初の日付が実在しなくても、次の候補（統計の日付と同じ）で保存先を決める
+    path = save_score(score_dir, '20251399_20250408.json', undated)
+    assert score_key(score_dir, path) == '2025/04/20251399_20250408.json'
+    # 実在しない timestamp は使わずファイル名の日付に従う
+    path = save_score(score_dir, '20250409.json', dict(SCORE, timestamp='2025-13-01T00:00:00'))
+    assert score_key(score_dir, path) == '2025/04/20250409.json'
+    # 日付が決まらない場合は今日の月に保存せず失敗させる
+    with pytest.raises(ValueError):
+        save_score(score_dir, 'result.json', dict(SCORE, timestamp='2025-13-01T00:00:00'))
+    assert sorted(score_key(score_dir, p) for p in iter_score_files(score_dir)) == [
+        '2025/04/20250409.json', '2025/04/20251399_20250408.json',
+    ]
+
+    rows = list(iter_export_rows([score_dir], since='2025-04-01'))
+    assert sorted(row[0] for row in rows) == ['2025-04-08', '2025-04-09']
+
+
+def test_filename_timestamp_skips_invalid_candidates():
+    assert filename_timestamp('20251399_20250408.json') == '2025-04-08T00:00:00'
+    assert filename_timestamp('20250408_123456.png') == '2025-04-08T12:34:56'
+    assert filename_timestamp('20250408_996099.png') == '2025-04-08T00:00:00'
+    assert filename_timestamp('shot_2025-02-30_2025-03-01.png') == '2025-03-01T00:00:00'
+    assert filename_timestamp('result.png') is None
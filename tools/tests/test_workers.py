@@ -0,0 +1,31 @@
+import multiprocessing
+
+import pytest
+
+from src.ocr import SushidaOCR
+from src.profiles import PipelineProfile
+from src.workers import ProcessExtractionPool
+
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                                reason='Tesseractの差し替えをワーカープロセスに引き継ぐためforkが必要')
+
+
+def test_pool_returns_results_in_input_order(fake_tesseract, screenshot_paths):
+    paths = screenshot_paths(24)
+    ocr = SushidaOCR(auto_crop=False)
+    with ProcessExtractionPool(ocr, PipelineProfile(), workers=3, readers=2) as pool:
+        outcomes = list(pool.extract_paths(iter(paths)))
+    assert [outcome.path for outcome in outcomes] == paths
+    assert all(outcome.error is None and outcome.tier == 'fast' for outcome in outcomes)
+
+
+def test_frames_larger_than_slot_are_counted(fake_tesseract, screenshot_paths):
+    paths = screenshot_paths(3)
+    ocr = SushidaOCR(auto_crop=False)
+    # 240x400のBGR画像はスロットに収まらないので、pickleで送られる
+    with ProcessExtractionPool(ocr, PipelineProfile(), workers=2, slot_bytes=1024) as pool:
+        outcomes = list(pool.extract_paths(iter(paths)))
+    assert all(outcome.error is None and outcome.tier == 'fast' for outcome in outcomes)
+    assert pool.prefetch_stats.inline_frames == 3
+    assert pool.prefetch_stats.to_dict()['inlineFrames'] == 3
+    assert 'pickleで送った画像 3枚' in pool.prefetch_stats.report_line()
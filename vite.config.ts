@@ -1,10 +1,11 @@
 import react from '@vitejs/plugin-react';
-import { existsSync, readFileSync, readdirSync } from 'fs';
-import { join } from 'path';
+import { existsSync, readFileSync, readdirSync, statSync } from 'fs';
+import { basename, join, relative, sep } from 'path';
 import { defineConfig } from 'vite';
 
 // CLIスコアデータの型定義
 interface CLIScoreData {
+  timestamp?: string;
   course: string;
   result: number;
   detail: {
@@ -18,11 +19,36 @@ interface CLIScoreData {
   };
 }
 
+// pathはscoreディレクトリからの相対パス（区切りは常に /）
 interface ScoreFileData {
   data: CLIScoreData;
   filename: string;
+  path: string;
 }
 
+// tools の `bundle` コマンド（batch/analyze も自動更新）が生成する事前結合済みのスコア一覧
+interface ScoreBundleData {
+  count: number;
+  hash: string;
+  scores: ScoreFileData[];
+  version: number;
+}
+
+const SCORE_BUNDLE_NAME = 'bundle.json';
+
+// scoreディレクトリ直下（旧レイアウト）と年/月のパーティション（score/YYYY/MM）のスコアファイル
+const listScoreFiles = (scoreDir: string): string[] => {
+  const isScoreFile = (file: string) => file.endsWith('.json') && file !== SCORE_BUNDLE_NAME;
+  const files = readdirSync(scoreDir).filter(isScoreFile).map((file: string) => join(scoreDir, file));
+  for (const year of readdirSync(scoreDir).filter((name: string) => /^\d{4}$/.test(name)).sort()) {
+    for (const month of readdirSync(join(scoreDir, year)).filter((name: string) => /^\d{2}$/.test(name)).sort()) {
+      const partition = join(scoreDir, year, month);
+      files.push(...readdirSync(partition).filter(isScoreFile).map((file: string) => join(partition, file)));
+    }
+  }
+  return files;
+};
+
 // ビルド時にscoreディレクトリからJSONファイルを読み込む
 const loadScoreData = (): ScoreFileData[] => {
   const scoreDir = join(__dirname, 'score');
@@ -32,18 +58,41 @@ const loadScoreData = (): ScoreFileData[] => {
       return [];
     }
     
-    const files = readdirSync(scoreDir).filter((file: string) => file.endsWith('.json'));
-    const scores = files.map((file: string) => {
-      const content = readFileSync(join(scoreDir, file), 'utf-8');
-      return {
-        data: JSON.parse(content) as CLIScoreData,
-        filename: file
-      };
-    });
+    const files = listScoreFiles(scoreDir);
+    
+    // bundle.json があればファイル1つだけを読み込む（パーティション・ファイル名順に並べ済み）
+    // ただしbundle.jsonより新しいスコアファイルや件数の違いがあれば、古いとみなして各ファイルを読み込む
+    const bundlePath = join(scoreDir, SCORE_BUNDLE_NAME);
+    if (existsSync(bundlePath)) {
+      const bundle = JSON.parse(readFileSync(bundlePath, 'utf-8')) as ScoreBundleData;
+      const bundleTime = statSync(bundlePath).mtimeMs;
+      const newer = files.filter((file: string) => statSync(file).mtimeMs > bundleTime).length;
+      if (newer === 0 && bundle.count === files.length) {
+        console.log(`Loaded ${bundle.count} scores from ${SCORE_BUNDLE_NAME} (hash ${bundle.hash.slice(0, 12)})`);
+        return bundle.scores;
+      }
+      console.warn(`${SCORE_BUNDLE_NAME} is stale (${newer} newer score files, ${files.length} files vs ${bundle.count} bundled); ` +
+        'reading score files directly. Run `python run.py bundle` in tools/ to refresh it.');
+    }
+    
+    // 読み込めないファイルは（bundleコマンドと同じく）飛ばす
+    const scores: ScoreFileData[] = [];
+    for (const file of files) {
+      try {
+        scores.push({
+          data: JSON.parse(readFileSync(file, 'utf-8')) as CLIScoreData,
+          filename: basename(file),
+          path: relative(scoreDir, file).split(sep).join('/')
+        });
+      } catch (error) {
+        console.warn(`Skipping unreadable score file ${file}:`, error);
+      }
+    }
     
     console.log(`Loaded ${scores.length} score files for build`);
+    // bundle.json と同じ相対パス順に並べる
     return scores.sort((a: ScoreFileData, b: ScoreFileData) => 
-      a.filename.localeCompare(b.filename)
+      a.path < b.path ? -1 : a.path > b.path ? 1 : 0
     );
   } catch (error) {
     console.warn('Error loading score data:', error);